@@ -0,0 +1,47 @@
+"""
+Microbenchmark: brand matcher vs. the old per-competitor substring loop
+
+Run from the repository root:
+    python -m benchmarks.bench_brand_matcher
+"""
+
+import timeit
+
+from src.utils.brand_matcher import get_brand_matcher
+
+# The list and loop ConversationAgent used before the shared matcher
+LEGACY_COMPETITORS = ['JD Sports', 'ASOS', 'Zalando', 'Nike.com', 'Adidas.com', 'Foot Locker',
+                      'H&M', 'Zara', 'Uniqlo', 'Amazon', 'Nordstrom', 'Bloomingdale', 'Forever 21',
+                      'Revolve', 'Depop', 'Poshmark', 'Mango', 'Lululemon', 'Nike', 'Adidas',
+                      'Gap', 'Old Navy', 'Target', 'Walmart', 'Primark', 'Topshop', 'River Island',
+                      'eBay', 'Etsy', 'Dick', 'Decathlon']
+
+CLEAN = (
+    "For a smart casual wedding look, try a navy linen blazer from House of Fraser (£149), "
+    "tailored chinos from Flannels (£89) and white leather trainers from Sports Direct (£45). "
+    "Finish with a knitted polo from Jack Wills for a relaxed British feel. "
+) * 4
+WITH_COMPETITOR = CLEAN + "You could also look at similar pieces on ASOS."
+
+def legacy_find(text):
+    for competitor in LEGACY_COMPETITORS:
+        if competitor.lower() in text.lower():
+            return competitor
+    return None
+
+def main(number: int = 5000):
+    matcher = get_brand_matcher()
+    cases = [
+        ("legacy loop, clean text", lambda: legacy_find(CLEAN)),
+        ("matcher.first, clean text", lambda: matcher.first(CLEAN, "competitor")),
+        ("legacy loop, competitor at end", lambda: legacy_find(WITH_COMPETITOR)),
+        ("matcher.first, competitor at end", lambda: matcher.first(WITH_COMPETITOR, "competitor")),
+        ("matcher.find_all, all brands + spans", lambda: matcher.find_all(WITH_COMPETITOR)),
+    ]
+    print(f"text length: {len(WITH_COMPETITOR)} chars, {number} iterations per case")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print(f"{name:40s} {seconds / number * 1e6:8.2f} µs/call")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Microbenchmark: filtered retrieval from the local product catalog
+
+Scales the sample feed up to N products (name/price/colour variations) and
+times CatalogQuery searches with occasion, style and price filters.
+
+Run from the repository root:
+    python -m benchmarks.bench_catalog [N]
+"""
+
+import random
+import sys
+import time
+import timeit
+
+from src.catalog import CatalogQuery, ProductCatalog, load_products
+
+SAMPLE_FEED = "data/catalog/frasers_sample.csv"
+COLOURS = ["black", "navy", "white", "grey", "olive", "camel", "burgundy", "pink", "blue", "green"]
+
+QUERIES = [
+    CatalogQuery.from_request("what should I wear to a wedding under £300", "formal", "classic"),
+    CatalogQuery.from_request("gym gear for running", "workout"),
+    CatalogQuery.from_request("date night outfit between £50 and £100", "date"),
+    CatalogQuery.from_request("casual weekend look with white trainers", "casual", "minimalist"),
+]
+
+def synthetic_products(count: int):
+    rng = random.Random(42)
+    base = load_products(SAMPLE_FEED)
+    for i in range(count):
+        product = base[i % len(base)]
+        yield product._replace(
+            id=f"{product.id}-{i}",
+            price=round(product.price * rng.uniform(0.6, 1.6), 2),
+            colours=tuple(rng.sample(COLOURS, 2)),
+        )
+
+def main(count: int = 100_000, number: int = 200):
+    started = time.perf_counter()
+    catalog = ProductCatalog(synthetic_products(count))
+    print(f"indexed {len(catalog)} products in {time.perf_counter() - started:.2f}s, "
+          f"vector index {catalog.vector_index_bytes / 1e6:.0f} MB")
+    for query in QUERIES:
+        seconds = min(timeit.repeat(lambda: catalog.search(query), number=number, repeat=3))
+        label = f"{query.text[:45]!r} ({query.occasion}/{query.style})"
+        print(f"{label:70s} {seconds / number * 1e3:8.2f} ms/query")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
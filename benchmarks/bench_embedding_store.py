@@ -0,0 +1,56 @@
+"""
+Microbenchmark: wardrobe-item to catalog-product matching on the embedding store
+
+Builds an N-row product item matrix (default 1M random unit vectors, the
+shape real catalog vectors have), saves it as .npy and reopens it
+memory-mapped, then times top-k matching for a wardrobe of W items:
+one batched matrix product vs. one product per item.
+
+Run from the repository root:
+    python -m benchmarks.bench_embedding_store [N] [W]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from src.utils.embedding_store import ITEM_EMBEDDING_DIM, EmbeddingStore, embed_texts, normalize_rows
+
+WARDROBE = ["navy linen blazer", "white oxford shirt", "dark slim jeans", "brown suede boots",
+            "grey cable-knit jumper", "black tailored trousers", "white leather trainers", "camel wool coat"]
+
+def main(count: int = 1_000_000, wardrobe_size: int = 8, number: int = 5):
+    rng = np.random.default_rng(42)
+    started = time.perf_counter()
+    store = EmbeddingStore(capacity=count)
+    for start in range(0, count, 100_000):
+        rows = min(100_000, count - start)
+        store.add(normalize_rows(rng.standard_normal((rows, ITEM_EMBEDDING_DIM), dtype=np.float32)))
+    print(f"built {len(store)} x {ITEM_EMBEDDING_DIM} item matrix "
+          f"({store.matrix.nbytes / 1e6:.0f} MB) in {time.perf_counter() - started:.2f}s")
+
+    texts = (WARDROBE * (wardrobe_size // len(WARDROBE) + 1))[:wardrobe_size]
+    seconds = min(timeit.repeat(lambda: embed_texts(texts), number=100, repeat=3)) / 100
+    print(f"embed {wardrobe_size} wardrobe items: {seconds * 1e3:.3f} ms")
+    queries = embed_texts(texts)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "items.npy")
+        store.save(path)
+        mapped = EmbeddingStore.open(path)
+        mapped.top_k(queries, 5)  # fault the pages in once, as a warm server would have
+        for label, target in (("in-memory", store), ("memory-mapped", mapped)):
+            batched = min(timeit.repeat(lambda: target.top_k(queries, 5), number=number, repeat=3)) / number
+            looped = min(timeit.repeat(lambda: [target.top_k(q, 5) for q in queries],
+                                       number=number, repeat=3)) / number
+            print(f"{label:14s} batched {batched * 1e3:8.1f} ms   per-item loop {looped * 1e3:8.1f} ms   "
+                  f"({looped / batched:.1f}x)")
+        del mapped
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 8)
@@ -0,0 +1,285 @@
+"""
+Load benchmark: full chat turns against the mock providers
+
+Drives GroupChatOrchestrator.process_message directly and/or the FastAPI app
+(POST /api/chat, in process over ASGI) with N concurrent simulated shoppers,
+each holding its own session and sending a scripted mix of turns (outfit
+requests, wardrobe photos, visualizations, small talk). Model calls go to the
+mock providers (src/providers/mock.py), so no API key or quota is used; their
+latencies are scaled down by --latency-scale so a run takes seconds while the
+relative cost of each agent stays realistic.
+
+Reports turn latency p50/p95/p99, per-agent p50/p95/p99, turns/s, errors and
+RSS growth, and compares them with the stored baseline (exit status 1 on a
+regression beyond --tolerance). Refresh the baseline with --save-baseline
+when a change is expected to move the numbers, and commit it with the change.
+
+Run from the repository root:
+    python -m benchmarks.bench_orchestrator [--target orchestrator|api|both]
+        [--users 20] [--turns 6] [--latency-scale 0.02] [--error-rate 0]
+        [--save-baseline]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from collections import defaultdict
+from io import BytesIO
+from typing import Dict, List, Optional
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "bench_orchestrator.json")
+# Sub-millisecond timings (rule-matched intents) jitter far more than any tolerance
+LATENCY_SLACK_MS = 2.0
+
+SCRIPT = [
+    ("I need an outfit for a business meeting next week", False),
+    ("How does this look for a date?", True),
+    ("Can you suggest something for a party on Saturday?", False),
+    ("Show me what that outfit would look like", False),
+    ("Thanks, what colours go with navy?", False),
+    ("Recommend some workout gear under £60", False),
+]
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+    return {"count": len(ordered), "p50": round(pick(50) * 1e3, 2), "p95": round(pick(95) * 1e3, 2),
+            "p99": round(pick(99) * 1e3, 2)}
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        # No procfs (macOS): peak RSS is the closest portable figure
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+def _photo_data_url() -> str:
+    from PIL import Image
+    out = BytesIO()
+    Image.new("RGB", (640, 480), (40, 60, 110)).save(out, format="JPEG")
+    return "data:image/jpeg;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
+class AgentTimings:
+    """Wraps each agent's entry point as the orchestrator sees it and records call durations."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, module, attribute: str, agent: str):
+        original = getattr(module, attribute)
+
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.samples[agent].append(time.perf_counter() - started)
+        setattr(module, attribute, timed)
+
+    def install(self):
+        from src.agents import group_chat_orchestrator as orchestrator, imagegen_agent
+        self.wrap(orchestrator, "parse_intent", "IntentAgent")
+        self.wrap(orchestrator, "analyze_wardrobe", "VisionAgent")
+        self.wrap(orchestrator, "recommend_outfit", "RecommendationAgent")
+        self.wrap(orchestrator, "generate_response", "ConversationAgent")
+        self.wrap(orchestrator, "summarize_conversation", "SummaryAgent")
+        self.wrap(imagegen_agent, "generate_outfit_image", "ImageGenAgent")
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {agent: _percentiles(samples) for agent, samples in sorted(self.samples.items())}
+
+async def _drain_background(orchestrators):
+    # Let queued image jobs and summaries finish so their latencies are counted
+    from src.agents.imagegen_agent import get_image_jobs
+    jobs = get_image_jobs()
+    while any(job.status in ("queued", "running") for job in list(jobs._jobs.values())):
+        await asyncio.sleep(0.05)
+    pending = [o._summary_task for o in orchestrators() if o._summary_task is not None]
+    await asyncio.gather(*pending, return_exceptions=True)
+
+async def _run_users(users: int, turns: int, turn, photo: str, orchestrators) -> Dict:
+    """
+    Runs `users` concurrent shoppers for `turns` turns each; `turn(user, message, image_url)`
+    sends one, `orchestrators()` lists the live sessions afterwards.
+    """
+    latencies: List[float] = []
+    errors = 0
+
+    async def shopper(user: int):
+        nonlocal errors
+        for i in range(turns):
+            text, with_photo = SCRIPT[(user + i) % len(SCRIPT)]
+            # Unique wording per shopper and turn so response caches and coalescing never kick in
+            message = f"{text} (shopper {user}, turn {i})"
+            started = time.perf_counter()
+            try:
+                await turn(user, message, photo if with_photo else None)
+            except Exception as e:
+                errors += 1
+                print(f"shopper {user} turn {i} failed: {e!r}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(shopper(user) for user in range(users)))
+    elapsed = time.perf_counter() - started
+    await _drain_background(orchestrators)
+    rss_after = _rss_mb()
+    return {
+        "turns": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "turns_per_second": round(len(latencies) / elapsed, 2),
+        "turn_ms": _percentiles(latencies),
+        "rss_mb": round(rss_after, 1),
+        "rss_growth_mb": round(rss_after - rss_before, 1),
+    }
+
+async def bench_orchestrator(users: int, turns: int, photo: str) -> Dict:
+    from src.agents.group_chat_orchestrator import GroupChatOrchestrator
+    sessions = [GroupChatOrchestrator() for _ in range(users)]
+
+    async def turn(user: int, message: str, image_url: Optional[str]):
+        await sessions[user].process_message(message, image_url)
+    return await _run_users(users, turns, turn, photo, lambda: sessions)
+
+async def bench_api(users: int, turns: int, photo: str) -> Dict:
+    import httpx
+    from src.api.main import app, sessions
+
+    session_ids: Dict[int, str] = {}
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            async def turn(user: int, message: str, image_url: Optional[str]):
+                headers = {"X-Session-ID": session_ids[user]} if user in session_ids else {}
+                response = await client.post("/api/chat", json={"message": message, "image_url": image_url},
+                                             headers=headers)
+                response.raise_for_status()
+                session_ids[user] = response.headers["X-Session-ID"]
+            return await _run_users(users, turns, turn, photo,
+                                    lambda: [session.orchestrator for session in sessions._sessions.values()])
+    finally:
+        await app.router.shutdown()
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lists metrics that moved the wrong way by more than `tolerance` (a fraction) since the baseline."""
+    regressions = []
+
+    def check(label: str, current: float, previous: float, higher_is_worse: bool = True, slack: float = 0.0):
+        if not previous:
+            return
+        if higher_is_worse and current > previous * (1 + tolerance) + slack:
+            regressions.append(f"{label}: {current} vs baseline {previous}")
+        elif not higher_is_worse and current < previous * (1 - tolerance):
+            regressions.append(f"{label}: {current} vs baseline {previous}")
+
+    for target, result in results["targets"].items():
+        previous = baseline.get("targets", {}).get(target)
+        if previous is None:
+            continue
+        check(f"{target} turns/s", result["turns_per_second"], previous["turns_per_second"], higher_is_worse=False)
+        for q in ("p50", "p95", "p99"):
+            check(f"{target} turn {q} ms", result["turn_ms"][q], previous["turn_ms"][q], slack=LATENCY_SLACK_MS)
+        # RSS moves by a few MB between runs on its own
+        check(f"{target} RSS growth MB", result["rss_growth_mb"], previous["rss_growth_mb"], slack=5.0)
+        if result["errors"] > previous["errors"]:
+            regressions.append(f"{target} errors: {result['errors']} vs baseline {previous['errors']}")
+    for agent, timing in results["agents_ms"].items():
+        previous = baseline.get("agents_ms", {}).get(agent)
+        if previous is None:
+            continue
+        for q in ("p50", "p95", "p99"):
+            check(f"{agent} {q} ms", timing[q], previous[q], slack=LATENCY_SLACK_MS)
+    return regressions
+
+def print_report(results: Dict):
+    for target, result in results["targets"].items():
+        turn_ms = result["turn_ms"]
+        print(f"{target:12s} {result['turns']} turns in {result['seconds']}s = {result['turns_per_second']} turns/s, "
+              f"p50 {turn_ms['p50']} / p95 {turn_ms['p95']} / p99 {turn_ms['p99']} ms, "
+              f"{result['errors']} errors, RSS {result['rss_mb']} MB (+{result['rss_growth_mb']})")
+    print(f"{'agent':22s} {'calls':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for agent, timing in results["agents_ms"].items():
+        print(f"{agent:22s} {timing['count']:6d} {timing['p50']:9.2f} {timing['p95']:9.2f} {timing['p99']:9.2f}")
+
+async def run(args) -> Dict:
+    timings = AgentTimings()
+    timings.install()
+    photo = _photo_data_url()
+    targets = {}
+    if args.target in ("orchestrator", "both"):
+        targets["orchestrator"] = await bench_orchestrator(args.users, args.turns, photo)
+    if args.target in ("api", "both"):
+        targets["api"] = await bench_api(args.users, args.turns, photo)
+    return {
+        "config": {"target": args.target, "users": args.users, "turns": args.turns,
+                   "latency_scale": args.latency_scale, "error_rate": args.error_rate, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "targets": targets,
+        "agents_ms": timings.report(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--target", choices=("orchestrator", "api", "both"), default="both")
+    parser.add_argument("--users", type=int, default=20, help="concurrent shoppers")
+    parser.add_argument("--turns", type=int, default=6, help="turns per shopper")
+    parser.add_argument("--latency-scale", type=float, default=0.02, help="multiplier on mock model latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock model calls that fail")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression as a fraction")
+    args = parser.parse_args()
+
+    # Everything local: mock providers, no response cache, no warm-up calls
+    os.environ["PROVIDER_MOCK"] = "1"
+    os.environ["MOCK_LATENCY_SCALE"] = str(args.latency_scale)
+    os.environ["MOCK_ERROR_RATE"] = str(args.error_rate)
+    os.environ["MOCK_SEED"] = str(args.seed)
+    os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+    os.environ.setdefault("PROVIDER_WARMUP", "0")
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    # Image jobs are rate limited for quota reasons that don't apply here
+    os.environ.setdefault("IMAGE_GEN_PER_MINUTE", "0")
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare with; run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != results["config"]:
+        print(f"baseline was recorded with {baseline.get('config')}; comparison skipped")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"no regressions beyond {args.tolerance:.0%} of the baseline")
+
+if __name__ == "__main__":
+    main()
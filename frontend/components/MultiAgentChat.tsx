@@ -6,7 +6,7 @@ interface Message {
   sender: string;
   content: string;
   timestamp: string | Date;
-  imageBase64?: string;
+  imageUrl?: string;
   products?: Product[];
 }
 
@@ -25,6 +25,8 @@ interface JourneyStop {
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+const newSessionId = () => crypto.randomUUID().replace(/-/g, '');
+
 const FRASERS_BRANDS = [
   { name: 'House of Fraser', url: 'https://www.houseoffraser.co.uk' },
   { name: 'Sports Direct', url: 'https://www.sportsdirect.com' },
@@ -53,6 +55,7 @@ const MultiAgentChat: React.FC = () => {
   const [showWishlist, setShowWishlist] = useState(false);
   const [journey, setJourney] = useState<JourneyStop[]>([]);
   const [showTimeline, setShowTimeline] = useState(false);
+  const sessionIdRef = useRef<string>(newSessionId());
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
@@ -80,38 +83,105 @@ const MultiAgentChat: React.FC = () => {
     setMessages(prev => [...prev, userMessage]);
     setInput('');
     setIsLoading(true);
-    setThinkingAgents(['IntentAgent', 'ConversationAgent', 'RecommendationAgent']);
+    setThinkingAgents(['IntentAgent']);
+
+    const turnId = Date.now().toString();
+    const toMessage = (r: any): Message => {
+      const msg: Message = {
+        id: `${turnId}-${r.agent}`,
+        sender: r.agent,
+        content: r.message,
+        timestamp: r.timestamp,
+        imageUrl: r.image_url
+      };
+
+      // Products from RecommendationAgent: structured from the API, else parsed from the text
+      if (r.agent === 'RecommendationAgent') {
+        msg.products = r.products?.length
+          ? r.products.map((p: any) => ({ name: p.name, price: p.price ?? '', brand: p.brand || p.store, url: p.url }))
+          : extractProducts(r.message);
+      }
+
+      return msg;
+    };
+
+    // Drafts grow from token deltas and are replaced by the agent's final message
+    const upsertMessage = (msg: Message, appendContent = false) => {
+      setMessages(prev => {
+        const index = prev.findIndex(m => m.id === msg.id);
+        if (index === -1) return [...prev, msg];
+        const next = [...prev];
+        next[index] = appendContent ? { ...prev[index], content: prev[index].content + msg.content } : msg;
+        return next;
+      });
+    };
+
+    // Outfit images render in the background; the job's event stream says when one is ready
+    const watchImageJob = (jobId: string) => {
+      const source = new EventSource(`${API_URL}/api/jobs/${jobId}/events`);
+      const finish = (e: MessageEvent) => {
+        source.close();
+        const job = JSON.parse(e.data);
+        setMessages(prev => [...prev, {
+          id: `${jobId}-image`,
+          sender: 'ImageGenAgent',
+          content: job.status === 'done' ? "Here's how the outfit could look." : "I couldn't create the outfit image this time.",
+          timestamp: new Date(job.finished * 1000),
+          imageUrl: job.result?.image_url
+        }]);
+      };
+      source.addEventListener('done', finish);
+      source.addEventListener('failed', finish);
+      source.onerror = () => source.close();
+    };
+
+    const handleEvent = (event: any) => {
+      if (event.event === 'agent_start') {
+        setThinkingAgents(prev => prev.includes(event.agent) ? prev : [...prev, event.agent]);
+      } else if (event.event === 'delta') {
+        upsertMessage({
+          id: `${turnId}-${event.agent}`,
+          sender: event.agent,
+          content: event.text,
+          timestamp: new Date()
+        }, true);
+      } else if (event.event === 'message') {
+        setThinkingAgents(prev => prev.filter(a => a !== event.agent));
+        upsertMessage(toMessage(event));
+        if (event.job_id) watchImageJob(event.job_id);
+      } else if (event.event === 'error') {
+        throw new Error(event.message);
+      }
+    };
 
     try {
-      const response = await fetch(`${API_URL}/api/chat`, {
+      const response = await fetch(`${API_URL}/api/chat/stream`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', 'X-Session-ID': sessionIdRef.current },
         body: JSON.stringify({
           message: input,
           image_url: uploadedImage
         })
       });
+      if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
 
-      const data = await response.json();
-      
-      const agentMessages: Message[] = data.responses.map((r: any) => {
-        const msg: Message = {
-          id: `${Date.now()}-${r.agent}`,
-          sender: r.agent,
-          content: r.message,
-          timestamp: r.timestamp,
-          imageBase64: r.image_base64
-        };
-        
-        // Extract products from RecommendationAgent
-        if (r.agent === 'RecommendationAgent') {
-          msg.products = extractProducts(r.message);
+      // Parse Server-Sent Events: blank-line separated blocks with a `data:` line
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const data = block.split('\n').find(line => line.startsWith('data: '));
+          if (data) handleEvent(JSON.parse(data.slice(6)));
         }
-        
-        return msg;
-      });
+      }
 
-      setMessages(prev => [...prev, ...agentMessages]);
       setUploadedImage(null);
       setThinkingAgents([]);
     } catch (error) {
@@ -213,8 +283,12 @@ const MultiAgentChat: React.FC = () => {
             <button
               onClick={async () => {
                 try {
-                  await fetch(`${API_URL}/api/clear`, { method: 'POST' });
+                  await fetch(`${API_URL}/api/clear`, {
+                    method: 'POST',
+                    headers: { 'X-Session-ID': sessionIdRef.current }
+                  });
                 } catch (e) {}
+                sessionIdRef.current = newSessionId();
                 setMessages([{
                   id: '0',
                   sender: 'System',
@@ -378,9 +452,9 @@ const MultiAgentChat: React.FC = () => {
                     {msg.content}
                   </ReactMarkdown>
                 </div>
-                {msg.imageBase64 && (
+                {msg.imageUrl && (
                   <img 
-                    src={`data:image/png;base64,${msg.imageBase64}`} 
+                    src={`${API_URL}${msg.imageUrl}`} 
                     alt="Generated outfit" 
                     className="mt-3 rounded-lg max-w-md w-full"
                   />
@@ -0,0 +1,87 @@
+"""
+Agent DAG Scheduler
+
+Runs orchestrator steps as a dependency graph instead of a fixed sequence.
+Each AgentStep declares the steps it consumes (`requires`); a step starts as
+soon as all of those have settled, so independent agents run concurrently.
+
+- `when` decides from upstream results whether the step runs at all
+- `timeout` bounds the step; a timed-out or failed step yields `fallback(results)`
+  (or no result) and never takes the rest of the graph down
+- Cancelling `run_dag` cancels every step still in flight
+- Each step that runs gets a `step.<name>` span noting timeouts, errors and fallbacks
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.utils.tracing import span
+
+@dataclass
+class AgentStep:
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    requires: Tuple[str, ...] = ()
+    when: Optional[Callable[[Dict[str, Any]], bool]] = None
+    timeout: Optional[float] = None
+    fallback: Optional[Callable[[Dict[str, Any]], Any]] = None
+
+def _topological_order(steps: List[AgentStep]) -> List[AgentStep]:
+    by_name = {step.name: step for step in steps}
+    ordered: List[AgentStep] = []
+    visiting, visited = set(), set()
+
+    def visit(step: AgentStep):
+        if step.name in visited:
+            return
+        if step.name in visiting:
+            raise ValueError(f"Cycle in agent graph at step '{step.name}'")
+        visiting.add(step.name)
+        for dep in step.requires:
+            if dep not in by_name:
+                raise ValueError(f"Step '{step.name}' requires unknown step '{dep}'")
+            visit(by_name[dep])
+        visiting.discard(step.name)
+        visited.add(step.name)
+        ordered.append(step)
+
+    for step in steps:
+        visit(step)
+    return ordered
+
+async def _run_step(step: AgentStep, upstream: List[asyncio.Task], results: Dict[str, Any]):
+    if upstream:
+        await asyncio.gather(*upstream)
+    if step.when is not None and not step.when(results):
+        return
+    with span(f"step.{step.name}") as step_span:
+        try:
+            results[step.name] = await asyncio.wait_for(step.run(results), step.timeout)
+            return
+        except asyncio.TimeoutError:
+            print(f"AgentDAG: step '{step.name}' timed out after {step.timeout}s")
+            step_span.set(outcome="timeout")
+        except Exception as e:
+            print(f"AgentDAG: step '{step.name}' failed: {e}")
+            step_span.set(outcome="error", error=repr(e)[:300])
+        if step.fallback is not None:
+            step_span.set(fallback=True)
+            results[step.name] = step.fallback(results)
+
+async def run_dag(steps: List[AgentStep]) -> Dict[str, Any]:
+    """Executes the graph and returns {step name: result} for every step that produced one."""
+    results: Dict[str, Any] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    for step in _topological_order(steps):
+        upstream = [tasks[dep] for dep in step.requires]
+        tasks[step.name] = asyncio.create_task(
+            _run_step(step, upstream, results), name=f"agent-step:{step.name}"
+        )
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+    return results
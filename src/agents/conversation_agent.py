@@ -1,143 +1,171 @@
-import os
-import google.generativeai as genai
-from openai import AsyncOpenAI
+import time
+from typing import List
+from google.genai import types
+from openai import NOT_GIVEN
 from src.utils.prometheus_metrics import competitor_blocks, brand_mentions
+from src.providers import get_gemini_client, get_openai_client, provider_slot, ProviderRoute, NoProviderAvailable, get_router
+from src.utils.llm_streaming import collect_gemini_stream, collect_openai_stream
+from src.utils.response_cache import get_cache
+from src.utils.brand_matcher import get_brand_matcher
+from src.utils.context_builder import ContextBuilder, ContextItem, count_tokens, record_prompt_tokens
+from src.utils.tracing import span
+from src.providers.telemetry import record_usage
+from src.providers.tiers import record_quality, route_model
 
-_gemini_configured = False
-_openai_client = None
+FRASERS_ONLY_RESPONSE = (
+    "You can find great clothes at Frasers Group stores! Check out:\n\n"
+    "- **Sports Direct** for activewear and casual clothing\n"
+    "- **House of Fraser** for premium fashion and formal wear\n"
+    "- **Flannels** for luxury designer brands\n"
+    "- **USC** for trendy streetwear\n"
+    "- **Jack Wills** for British heritage style\n\n"
+    "What style are you looking for? I can help you find the perfect Frasers store!"
+)
 
-def configure_gemini():
-    global _gemini_configured
-    if not _gemini_configured:
-        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            _gemini_configured = True
-    return _gemini_configured
+def find_competitor(text: str):
+    match = get_brand_matcher().first(text, "competitor")
+    return match.brand if match else None
 
-def get_openai_client():
-    global _openai_client
-    if _openai_client is None:
-        key = os.getenv("OPENAI_API_KEY")
-        if key:
-            _openai_client = AsyncOpenAI(api_key=key)
-    return _openai_client
+class _CompetitorSafe:
+    """Wraps on_delta so streaming stops before any competitor mention reaches the client."""
+    
+    def __init__(self, on_delta):
+        self.on_delta = on_delta
+        # Streamed text this close to the end is held back until we know it
+        # doesn't complete a competitor mention
+        self.holdback = get_brand_matcher().max_length
+        self.text = ""
+        self.sent = 0
+        self.blocked = False
+    
+    def __call__(self, delta: str):
+        if self.blocked:
+            return
+        # Only the new tail (plus one brand length of overlap) can hold a new match
+        scan_from = max(0, len(self.text) - self.holdback - 1)
+        self.text += delta
+        if find_competitor(self.text[scan_from:]):
+            self.blocked = True
+            return
+        safe_end = len(self.text) - self.holdback
+        if safe_end > self.sent:
+            self.on_delta(self.text[self.sent:safe_end])
+            self.sent = safe_end
+    
+    def flush(self):
+        """Sends the held-back tail once the stream has ended (every delta was already checked)."""
+        if not self.blocked and len(self.text) > self.sent:
+            self.on_delta(self.text[self.sent:])
+            self.sent = len(self.text)
 
-async def generate_response(conversation_history: list, user_message: str) -> str:
+async def generate_response(conversation_history: list, user_message: str, on_delta=None) -> str:
     """
-    Generates natural conversational responses using Gemini 3 Pro.
+    Generates natural conversational responses using Gemini 2.5 Flash, or
+    Gemini 3 Pro for long conversations (model tier policy, src/providers/tiers.py).
     Maintains conversation context and enforces Frasers Group brand loyalty.
     
     Features:
-    - Uses last 10 messages for context
+    - Packs as much recent history as fits the conversation token budget
     - Actively filters competitor brand mentions (25+ brands)
     - Replaces competitor mentions with Frasers alternatives
     - Tracks competitor blocks via Prometheus metrics
-    - Falls back to OpenAI GPT-4o-mini if Gemini unavailable
+    - Falls back to OpenAI (GPT-4o-mini, GPT-4o on the pro tier) via the provider router (adaptive timeouts, hedging)
+    - Streams text chunks to `on_delta` when given (held back once a competitor appears)
+    - Serves repeats of the same message over the same context from the response cache
     """
-    # Try Gemini first (FREE tier)
-    if configure_gemini():
-        try:
-            model = genai.GenerativeModel("gemini-3-pro-preview")
-            
-            # Build conversation context with Frasers reminder
-            context = "You're a helpful fashion assistant. When suggesting stores, prefer: Sports Direct, House of Fraser, Flannels, USC, Jack Wills.\n\n"
-            
-            for msg in conversation_history[-10:]:
-                role = msg["role"]
-                content = msg["content"]
-                context += f"{role}: {content}\n"
-            
-            # Add explicit constraint in the prompt itself
-            context += f"\nUser: {user_message}\n\nRespond helpfully:"
-            
-            response = model.generate_content(
-                context,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "max_output_tokens": 512,
-                }
-            )
-            
-            # Post-process to filter out competitor mentions
-            text = response.text
-            print(f"ConversationAgent raw response: {text[:100]}...")
-            
-            competitors = ['JD Sports', 'ASOS', 'Zalando', 'Nike.com', 'Adidas.com', 'Foot Locker', 
-                          'H&M', 'Zara', 'Uniqlo', 'Amazon', 'Nordstrom', 'Bloomingdale', 'Forever 21',
-                          'Revolve', 'Depop', 'Poshmark', 'Mango', 'Lululemon', 'Nike', 'Adidas',
-                          'Gap', 'Old Navy', 'Target', 'Walmart', 'Primark', 'Topshop', 'River Island']
-            
-            found_competitor = False
-            for competitor in competitors:
-                if competitor.lower() in text.lower():
-                    found_competitor = True
-                    print(f"ConversationAgent: Found competitor '{competitor}' - replacing response")
-                    break
-            
-            if found_competitor:
-                # Replace entire response with Frasers-only version
-                competitor_blocks.inc()
-                text = "You can find great clothes at Frasers Group stores! Check out:\n\n"
-                text += "- **Sports Direct** for activewear and casual clothing\n"
-                text += "- **House of Fraser** for premium fashion and formal wear\n"
-                text += "- **Flannels** for luxury designer brands\n"
-                text += "- **USC** for trendy streetwear\n"
-                text += "- **Jack Wills** for British heritage style\n\n"
-                text += "What style are you looking for? I can help you find the perfect Frasers store!"
-                print("ConversationAgent: Response replaced with Frasers-only content")
-            
-            return text
-            
-        except Exception as e:
-            print(f"Gemini conversation error: {e}")
+    # History is packed once so the cache key covers exactly what the model would see
+    with span("prompt.build", agent="conversation"):
+        turns = ContextBuilder("conversation").add_turns(conversation_history).pack()
+    cache = get_cache("conversation")
+    cache_key = cache.key(user_message, "\n".join(turn.text for turn in turns))
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    forward = _CompetitorSafe(on_delta) if on_delta else None
     
-    # Fallback to OpenAI
+    # Long conversations can be routed to a stronger tier (model_tiers.json)
+    prompt_tokens = count_tokens(user_message) + sum(count_tokens(turn.text) for turn in turns)
+    routes = []
+    gemini = get_gemini_client()
+    if gemini:
+        gemini_model = route_model("conversation", "gemini", "gemini-2.5-flash", prompt_tokens)
+        routes.append(ProviderRoute("gemini", gemini_model,
+                                    lambda: _gemini_response(gemini, gemini_model, turns, user_message, forward)))
     client = get_openai_client()
     if client:
-        try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a friendly fashion assistant in a multi-agent chat. Help users with outfit advice, style tips, and fashion recommendations. Be conversational, helpful, and build on what other agents say."
-                }
-            ]
-            
-            for msg in conversation_history[-10:]:
-                role = "assistant" if msg["role"] != "User" else "user"
-                messages.append({"role": role, "content": msg["content"]})
-            
-            response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.7
+        openai_model = route_model("conversation", "openai", "gpt-4o-mini", prompt_tokens)
+        routes.append(ProviderRoute("openai", openai_model,
+                                    lambda: _openai_response(client, openai_model, turns, forward)))
+    
+    try:
+        # Streamed calls don't hedge: two streams would interleave their deltas
+        text = await get_router().call("conversation", routes, hedge=forward is None)
+    except NoProviderAvailable as e:
+        print(f"ConversationAgent: {e}")
+        return "I'm here to help with fashion advice! Ask me anything about outfits, style, or trends. (no API key configured)"
+    
+    # Post-process to filter out competitor mentions
+    print(f"ConversationAgent raw response: {text[:100]}...")
+    with span("postprocess.competitor_filter", agent="conversation") as check:
+        competitor = find_competitor(text)
+        check.set(blocked=bool(competitor))
+    if competitor:
+        # Replace entire response with Frasers-only version
+        print(f"ConversationAgent: Found competitor '{competitor}' - replacing response")
+        competitor_blocks.inc()
+        text = FRASERS_ONLY_RESPONSE
+    
+    await cache.set(cache_key, text, time.perf_counter() - started)
+    return text
+
+async def _gemini_response(gemini, model: str, turns: List[ContextItem], user_message: str, forward) -> str:
+    # Frasers reminder up front, explicit ask at the end, packed history between
+    context = "\n".join([
+        "You're a helpful fashion assistant. When suggesting stores, prefer: Sports Direct, House of Fraser, Flannels, USC, Jack Wills.\n",
+        *(turn.text for turn in turns),
+        f"\nUser: {user_message}\n\nRespond helpfully:",
+    ])
+    record_prompt_tokens("conversation", context)
+    
+    config = types.GenerateContentConfig(temperature=0.7, top_p=0.95, max_output_tokens=512)
+    async with provider_slot("gemini"):
+        if forward:
+            stream = await gemini.aio.models.generate_content_stream(
+                model=model, contents=context, config=config
             )
-            
-            text = response.choices[0].message.content
-            
-            # Apply same filter to OpenAI responses
-            competitors = ['JD Sports', 'ASOS', 'Zalando', 'Nike.com', 'Adidas.com', 'Foot Locker', 
-                          'H&M', 'Zara', 'Uniqlo', 'Amazon', 'Nordstrom', 'Bloomingdale', 'Forever 21',
-                          'Revolve', 'Depop', 'Poshmark', 'Mango', 'Lululemon', 'Nike', 'Adidas',
-                          'Gap', 'Old Navy', 'Target', 'Walmart', 'Primark', 'Topshop', 'River Island',
-                          'eBay', 'Etsy', 'Dick', 'Decathlon']
-            
-            for competitor in competitors:
-                if competitor.lower() in text.lower():
-                    print(f"ConversationAgent (OpenAI): Found competitor '{competitor}' - replacing")
-                    competitor_blocks.inc()
-                    text = "You can find great clothes at Frasers Group stores! Check out:\n\n"
-                    text += "- **Sports Direct** for activewear and casual clothing\n"
-                    text += "- **House of Fraser** for premium fashion and formal wear\n"
-                    text += "- **Flannels** for luxury designer brands\n"
-                    text += "- **USC** for trendy streetwear\n"
-                    text += "- **Jack Wills** for British heritage style\n\n"
-                    text += "What style are you looking for? I can help you find the perfect Frasers store!"
-                    break
-            
-            return text
-        except Exception as e:
-            print(f"OpenAI conversation error: {e}")
+            text, _ = await collect_gemini_stream(stream, forward, forward.flush)
+        else:
+            response = await gemini.aio.models.generate_content(
+                model=model, contents=context, config=config
+            )
+            record_usage(response)
+            text = response.text
+    _score(text)
+    return text
+
+async def _openai_response(client, model: str, turns: List[ContextItem], forward) -> str:
+    system = "You are a friendly fashion assistant in a multi-agent chat. Help users with outfit advice, style tips, and fashion recommendations. Be conversational, helpful, and build on what other agents say."
+    record_prompt_tokens("conversation", system, *(turn.text for turn in turns))
+    messages = [{"role": "system", "content": system}]
+    messages.extend({"role": "user" if turn.role == "User" else "assistant", "content": turn.text} for turn in turns)
     
-    return "I'm here to help with fashion advice! Ask me anything about outfits, style, or trends. (no API key configured)"
+    async with provider_slot("openai"):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            stream=forward is not None,
+            stream_options={"include_usage": True} if forward else NOT_GIVEN
+        )
+        if forward:
+            text = await collect_openai_stream(response, forward, forward.flush)
+        else:
+            record_usage(response)
+            text = response.choices[0].message.content
+    _score(text)
+    return text
+
+def _score(text: str):
+    # A reply that has to be swapped for the Frasers-only fallback is as good as none
+    record_quality(0.0 if not text or find_competitor(text) else 1.0)
@@ -1,21 +1,42 @@
 import asyncio
+import hashlib
+import os
 import time
-from typing import List, Dict
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, List, Dict, Optional
 from datetime import datetime
 
 try:
     from .vision_agent import analyze_wardrobe
     from .recommendation_agent import recommend_outfit
     from .conversation_agent import generate_response
-    from .imagegen_agent import generate_outfit_image
-    from .intent_agent import parse_intent
+    from .imagegen_agent import get_image_jobs
+    from .intent_agent import parse_intent, keyword_intent
+    from .agent_dag import AgentStep, run_dag
+    from .summary_agent import summarize_conversation
     from ..utils.prometheus_metrics import agent_calls, total_requests, response_time
+    from ..utils.blob_store import image_ref_url
+    from ..utils.job_queue import Job, JobQueueFull
+    from ..utils.tracing import span
+    from ..catalog import CatalogQuery, WardrobeItem, describe_items, extract_wardrobe_items
+    from ..utils.embedding_store import EmbeddingStore, embed_texts
+    from ..utils.context_builder import (ContextBuilder, context_budget, count_tokens,
+                                         LATEST_USER_TURN, LAST_RECOMMENDATION, SUMMARY_ROLE)
 except ImportError:
     from vision_agent import analyze_wardrobe
     from recommendation_agent import recommend_outfit
     from conversation_agent import generate_response
-    from imagegen_agent import generate_outfit_image
-    from intent_agent import parse_intent
+    from imagegen_agent import get_image_jobs
+    from intent_agent import parse_intent, keyword_intent
+    from agent_dag import AgentStep, run_dag
+    from summary_agent import summarize_conversation
+    from utils.blob_store import image_ref_url
+    from utils.job_queue import Job, JobQueueFull
+    from utils.tracing import span
+    from catalog import CatalogQuery, WardrobeItem, describe_items, extract_wardrobe_items
+    from utils.embedding_store import EmbeddingStore, embed_texts
+    from utils.context_builder import (ContextBuilder, context_budget, count_tokens,
+                                       LATEST_USER_TURN, LAST_RECOMMENDATION, SUMMARY_ROLE)
     try:
         from utils.prometheus_metrics import agent_calls, total_requests, response_time
     except:
@@ -27,11 +48,27 @@ except ImportError:
         agent_calls = total_requests = response_time = MockMetric()
 
 class Message:
-    def __init__(self, sender: str, content: str, timestamp: datetime = None, image_base64: str = None):
+    __slots__ = ("sender", "content", "timestamp", "image_ref", "seq", "_serialized")
+
+    def __init__(self, sender: str, content: str, timestamp: datetime = None, image_ref: str = None):
         self.sender = sender
         self.content = content
         self.timestamp = timestamp or datetime.now()
-        self.image_base64 = image_base64
+        # Content hash of a generated image in the blob store, never the image itself
+        self.image_ref = image_ref
+        # Per-session sequence number, assigned when the message joins the history
+        self.seq = 0
+        self._serialized = None
+
+    def to_dict(self) -> Dict:
+        # Messages never change once recorded, so serialize once and reuse
+        if self._serialized is None:
+            self._serialized = {"seq": self.seq, "sender": self.sender, "content": self.content,
+                                "time": self.timestamp.isoformat(), "image_url": image_ref_url(self.image_ref)}
+        return self._serialized
+
+def _seq(msg: Message) -> int:
+    return msg.seq
 
 class GroupChatOrchestrator:
     """
@@ -44,28 +81,177 @@ class GroupChatOrchestrator:
     - ConversationAgent: Maintains dialogue
     - ImageGenAgent: Generates outfit visualizations
     
-    Maintains conversation history (last 20 messages) and tracks metrics via Prometheus.
+    Maintains conversation history (at most `max_messages` retained per session;
+    each agent packs what fits its token budget) and tracks metrics via Prometheus.
+    
+    Long sessions are bounded by a rolling summary: once more than
+    SUMMARY_TRIGGER_MESSAGES (default 16) messages are unsummarized, all but the
+    newest SUMMARY_KEEP_RECENT (default 8) are folded into `summary` in the
+    background, and agents get the summary plus the turns after it. The
+    summary in flight is recorded in the session state, so a worker restoring
+    the session doesn't start another one (for up to SUMMARY_PENDING_SECONDS,
+    default 120, in case the worker running it died). A summary is only applied
+    while it is still the one in flight, so one finishing after the session
+    was cleared never reaches the next conversation.
+    
+    Wardrobe photos are kept as structured items (type, colour, style) with one
+    embedding row each in `wardrobe_vectors`; prompts get the compact item list
+    and RecommendationAgent matches the rows against the catalog in one batch.
+    
+    Outfit images are rendered in the background image job queue: the turn
+    returns with a `job_id` on ImageGenAgent's message, and the finished image
+    is appended to the history as a new ImageGenAgent message.
+    
+    export_state()/restore_state() round-trip everything a session needs, so a
+    shared session store can move it between workers. Updates that land after
+    the turn (summaries, finished images) go through `apply_later` when the
+    store sets it, so they reach the stored session rather than this copy.
     """
-    def __init__(self):
+    # Per-step time limits in seconds; a step that overruns is cancelled
+    step_timeouts = {
+        "intent": float(os.getenv("INTENT_TIMEOUT_SECONDS", "20")),
+        "vision": float(os.getenv("VISION_TIMEOUT_SECONDS", "45")),
+        "recommendation": float(os.getenv("RECOMMENDATION_TIMEOUT_SECONDS", "60")),
+        "conversation": float(os.getenv("CONVERSATION_TIMEOUT_SECONDS", "30")),
+        "image_gen": float(os.getenv("IMAGE_GEN_TIMEOUT_SECONDS", "90")),
+    }
+    
+    def __init__(self, max_messages: int = None):
+        self.max_messages = max_messages or int(os.getenv("MAX_SESSION_MESSAGES", "60"))
         self.messages: List[Message] = []
+        self.last_seq = 0
         self.wardrobe_context = ""
+        self.wardrobe_items: List[WardrobeItem] = []
+        # One embedding row per wardrobe item, in the same order
+        self.wardrobe_vectors = EmbeddingStore()
         self.outfit_recommendation = ""
         self.user_preferences = {}
         self.conversation_state = "initial"
+        # Rolling summary of every message up to and including `summarized_seq`
+        self.summary = ""
+        self.summarized_seq = 0
+        self.summary_trigger = min(int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "16")), self.max_messages // 2)
+        # Fewer than the trigger, or a due summary would have nothing to fold
+        self.summary_keep_recent = max(0, min(int(os.getenv("SUMMARY_KEEP_RECENT", "8")), self.summary_trigger - 1))
+        self.summary_pending_seconds = float(os.getenv("SUMMARY_PENDING_SECONDS", "120"))
+        self._summary_task = None
+        # [through_seq, wall-clock start] of a summary in flight, possibly on another worker
+        self.summary_pending: Optional[List] = None
+        # Image jobs started by this session that haven't reported back yet
+        self._image_jobs = set()
+        # Set by a shared session store: takes an update fn and applies it to the session's current state
+        self.apply_later: Optional[Callable[[Callable[["GroupChatOrchestrator"], None]], None]] = None
     
-    async def process_message(self, user_message: str, image_url: str = None) -> List[Dict]:
-        total_requests.inc()
-        self.messages.append(Message("User", user_message))
-        
-        agent_conversation = []
-        
-        # Build full conversation context
-        full_history = [{"role": m.sender, "content": m.content} for m in self.messages[-20:]]
-        
-        # Step 0: Parse intent using IntentAgent
-        intent = await parse_intent(user_message, full_history)
+    async def process_message(self, user_message: str, image_url: str = None,
+                              on_event: Callable[[Dict], None] = None) -> List[Dict]:
+        """
+        Runs one user turn through the agent graph.
         
-        # IntentAgent announces its analysis
+        If `on_event` is given it receives streaming events as they happen:
+        {"event": "agent_start"}, {"event": "delta"} token chunks from
+        ConversationAgent/RecommendationAgent, and {"event": "message"} with
+        each agent's final response.
+        """
+        # One span per turn: agent steps, provider calls and the background summary nest under it
+        with span("orchestrator.turn", has_image=bool(image_url)) as turn:
+            total_requests.inc()
+            self._append(Message("User", user_message))
+            
+            # Agents pack what fits their own token budget, so hand them the whole retained history
+            full_history = self._history()
+            
+            async def classify_intent(results):
+                return await parse_intent(user_message, full_history, has_image=bool(image_url))
+            
+            async def announce_intent(results):
+                return await self._agent_speak("IntentAgent", self._format_intent(results["intent"]), on_event=on_event)
+            
+            async def analyze_image(results):
+                # Starts immediately: the uploaded photo doesn't depend on intent
+                vision_response = await self._agent_speak("VisionAgent",
+                    f"Analyzing wardrobe: {user_message}", image_url, on_event=on_event)
+                self._add_wardrobe(vision_response["message"])
+                return vision_response
+            
+            async def recommend(results):
+                intent = results["intent"]
+                # RecommendationAgent adds the wardrobe itself, so leave room for it (up to half the budget)
+                budget = context_budget("recommendation")
+                context = ContextBuilder("recommendation", max(budget - count_tokens(self.wardrobe_context), budget // 2))
+                context.add_turns(full_history[:-1])
+                if self.outfit_recommendation:
+                    context.add(f"Previous recommendation: {self.outfit_recommendation}", LAST_RECOMMENDATION)
+                context.add(f"CURRENT REQUEST: {user_message}\nOccasion: {intent['occasion']}\nStyle: {intent['style_preference']}",
+                            LATEST_USER_TURN)
+                with span("prompt.build", agent="recommendation"):
+                    packed = context.pack()
+                    rec_context = "\n".join(item.text for item in packed)
+                # Cache on what shapes the answer. Earlier turns, the summary and the previous
+                # recommendation are in the prompt too, so a digest of them scopes the entry to
+                # this conversation; only requests with no prior context share entries across sessions
+                prior = "\n".join(item.text for item in packed if item.priority != LATEST_USER_TURN)
+                context_digest = hashlib.sha256(prior.encode("utf-8")).hexdigest() if prior else ""
+                cache_key = (user_message, intent['occasion'], intent['style_preference'], self.wardrobe_context,
+                             context_digest)
+                catalog_query = CatalogQuery.from_request(user_message, intent['occasion'], intent['style_preference'],
+                                                          self.wardrobe_vectors.matrix if self.wardrobe_items else None)
+                rec_response = await self._agent_speak("RecommendationAgent", rec_context, on_event=on_event,
+                                                       cache_key=cache_key, catalog_query=catalog_query)
+                self.outfit_recommendation = rec_response["message"]
+                return rec_response
+            
+            async def review(results):
+                # The recommendation is the newest turn in the history ConversationAgent packs
+                conv_context = f"User said '{user_message}'. Continue the conversation naturally, building on the outfit suggested above."
+                return await self._agent_speak("ConversationAgent", conv_context, on_event=on_event)
+            
+            async def visualize(results):
+                description = self.outfit_recommendation if self.outfit_recommendation else user_message
+                return await self._agent_speak("ImageGenAgent", description, on_event=on_event)
+            
+            async def chat(results):
+                return await self._agent_speak("ConversationAgent", user_message, on_event=on_event)
+            
+            speaking_steps = ["announce_intent", "vision", "recommendation", "review", "image_gen", "chat"]
+            timeouts = self.step_timeouts
+            steps = [
+                AgentStep("intent", classify_intent, timeout=timeouts["intent"],
+                          fallback=lambda results: keyword_intent(user_message)),
+                AgentStep("announce_intent", announce_intent, requires=("intent",)),
+                AgentStep("vision", analyze_image, when=lambda results: bool(image_url),
+                          timeout=timeouts["vision"]),
+                AgentStep("recommendation", recommend, requires=("announce_intent", "vision"),
+                          when=lambda results: bool(results["intent"].get("needs_recommendation")),
+                          timeout=timeouts["recommendation"]),
+                # Review and visualization both consume the recommendation, so they run side by side
+                AgentStep("review", review, requires=("recommendation",),
+                          when=lambda results: "recommendation" in results,
+                          timeout=timeouts["conversation"]),
+                AgentStep("image_gen", visualize, requires=("recommendation",),
+                          when=lambda results: bool(results["intent"].get("needs_image_gen")),
+                          timeout=timeouts["image_gen"]),
+                # If no specific task produced output, just converse
+                AgentStep("chat", chat, requires=("vision", "review", "image_gen"),
+                          when=lambda results: not any(name in results for name in speaking_steps[1:5]),
+                          timeout=timeouts["conversation"]),
+            ]
+            results = await run_dag(steps)
+            agent_conversation = [results[name] for name in speaking_steps if name in results]
+            turn.set(agents=[response["agent"] for response in agent_conversation])
+            
+            # Update conversation state
+            intent = results["intent"]
+            self.conversation_state = intent['primary_intent']
+            if intent.get('occasion') != 'unknown':
+                self.user_preferences['last_occasion'] = intent['occasion']
+            if intent.get('style_preference') != 'unknown':
+                self.user_preferences['style'] = intent['style_preference']
+            
+            self._schedule_summary()
+            return agent_conversation
+    
+    @staticmethod
+    def _format_intent(intent: Dict) -> str:
         intent_parts = []
         intent_parts.append(f"**Intent Classification**")
         intent_parts.append(f"- Primary Intent: {intent['primary_intent'].replace('_', ' ').title()}")
@@ -81,104 +267,218 @@ class GroupChatOrchestrator:
         if actions:
             intent_parts.append(f"- Actions: {', '.join(actions)}")
         
-        intent_msg = "\n".join(intent_parts)
-        intent_response = await self._agent_speak("IntentAgent", intent_msg)
-        agent_conversation.append(intent_response)
-        
-        # Step 1: If image provided or vision needed, VisionAgent analyzes
-        if image_url or intent.get("needs_vision"):
-            if image_url:
-                vision_response = await self._agent_speak("VisionAgent", 
-                    f"Analyzing wardrobe for {intent['occasion']} occasion: {user_message}", image_url)
-                agent_conversation.append(vision_response)
-                self.wardrobe_context = vision_response["message"]
-        
-        # Step 2: If recommendation needed
-        if intent.get("needs_recommendation"):
-            # Include full conversation context
-            context_summary = "\n".join([f"{m['role']}: {m['content'][:100]}" for m in full_history[-10:]])
-            rec_context = f"CONVERSATION HISTORY:\n{context_summary}\n\nCURRENT REQUEST: {user_message}\nOccasion: {intent['occasion']}\nStyle: {intent['style_preference']}"
-            if self.wardrobe_context:
-                rec_context += f"\nWardrobe: {self.wardrobe_context}"
-            
-            rec_response = await self._agent_speak("RecommendationAgent", rec_context)
-            agent_conversation.append(rec_response)
-            self.outfit_recommendation = rec_response["message"]
-            
-            # ConversationAgent with full context
-            conv_context = f"CONVERSATION:\n{context_summary}\n\nLATEST: User said '{user_message}'. Outfit suggested: {self.outfit_recommendation[:200]}. Continue the conversation naturally."
-            conv_review = await self._agent_speak("ConversationAgent", conv_context)
-            agent_conversation.append(conv_review)
-        
-        # Step 3: If visualization needed
-        if intent.get("needs_image_gen"):
-            description = self.outfit_recommendation if self.outfit_recommendation else user_message
-            
-            # ImageGenAgent generates
-            img_response = await self._agent_speak("ImageGenAgent", description)
-            agent_conversation.append(img_response)
-        
-        # Step 4: If no specific task, just conversation
-        if len(agent_conversation) <= 1:  # Only IntentAgent spoke
-            conv_response = await self._agent_speak("ConversationAgent", user_message)
-            agent_conversation.append(conv_response)
-        
-        # Update conversation state
-        self.conversation_state = intent['primary_intent']
-        if intent.get('occasion') != 'unknown':
-            self.user_preferences['last_occasion'] = intent['occasion']
-        if intent.get('style_preference') != 'unknown':
-            self.user_preferences['style'] = intent['style_preference']
-        
-        return agent_conversation
-    
-    async def _agent_speak(self, agent_name: str, message: str, image_url: str = None) -> Dict:
+        return "\n".join(intent_parts)
+
+    def _add_wardrobe(self, description: str):
+        """Adds the items VisionAgent found to the session wardrobe and its embedding matrix."""
+        new_items = [item for item in extract_wardrobe_items(description) if item not in self.wardrobe_items]
+        if new_items:
+            self.wardrobe_items.extend(new_items)
+            self.wardrobe_vectors.add(embed_texts([item.describe() for item in new_items]))
+        # Nothing recognisable in the description: fall back to the text itself
+        self.wardrobe_context = describe_items(self.wardrobe_items) if self.wardrobe_items else description
+
+    async def _agent_speak(self, agent_name: str, message: str, image_url: str = None,
+                           on_event: Callable[[Dict], None] = None, cache_key: tuple = None,
+                           catalog_query: CatalogQuery = None) -> Dict:
         start_time = time.time()
         agent_calls.labels(agent_name=agent_name).inc()
         
-        history = [{"role": m.sender, "content": m.content} for m in self.messages[-10:]]
+        on_delta = None
+        if on_event:
+            on_event({"event": "agent_start", "agent": agent_name})
+            on_delta = lambda text: on_event({"event": "delta", "agent": agent_name, "text": text})
         
         result = ""
-        image_base64 = None
+        job_id = None
+        reply = None
         
         if agent_name == "IntentAgent":
             result = message
         elif agent_name == "VisionAgent" and image_url:
             result = await analyze_wardrobe(image_url, message)
         elif agent_name == "RecommendationAgent":
-            # Pass full context including what other agents said
-            context = f"{message}\n\nPrevious agent insights:\n"
-            for msg in self.messages[-5:]:
-                if msg.sender in ["VisionAgent", "IntentAgent"]:
-                    context += f"{msg.sender}: {msg.content[:200]}\n"
-            result = await recommend_outfit(context, self.wardrobe_context)
+            # Intent and wardrobe (VisionAgent's findings) are already part of the packed context
+            reply = await recommend_outfit(message, self.wardrobe_context, on_delta=on_delta,
+                                          cache_key=cache_key, catalog_query=catalog_query)
+            result = reply["text"]
         elif agent_name == "ImageGenAgent":
-            image_base64 = await generate_outfit_image(message)
-            result = "I've generated a visual representation of the outfit."
+            # Rendering is slow, so it runs in the background and the turn doesn't wait for it
+            try:
+                job_id = get_image_jobs().submit(message, on_done=self._image_ready).id
+                self._image_jobs.add(job_id)
+                result = "I'm creating a visual representation of the outfit - it will appear here when it's ready."
+            except JobQueueFull:
+                result = "Image generation is busy right now - ask me to show the outfit again in a minute."
         elif agent_name == "ConversationAgent":
-            # Pass what other agents said in the prompt - include full agent messages
-            full_history = []
-            for msg in self.messages[-10:]:
-                full_history.append({"role": msg.sender, "content": msg.content})
-            result = await generate_response(full_history, message)
+            # Include what other agents said this turn; the agent trims to its token budget
+            result = await generate_response(self._history(), message, on_delta=on_delta)
         
-        msg = Message(agent_name, result, image_base64=image_base64)
-        self.messages.append(msg)
+        msg = Message(agent_name, result)
+        self._append(msg)
         
         response_time.labels(agent_name=agent_name).observe(time.time() - start_time)
         
-        return {
+        response = {
+            "seq": msg.seq,
             "agent": agent_name,
             "message": result,
             "timestamp": msg.timestamp.isoformat(),
-            "image_base64": image_base64
+            "image_url": None
+        }
+        if job_id:
+            response["job_id"] = job_id
+        if reply is not None:
+            # Structured products and grounding citations for product cards (not kept in the history)
+            response["products"] = reply["products"]
+            response["citations"] = reply["citations"]
+        if on_event:
+            on_event({"event": "message", **response})
+        return response
+    
+    def _apply_background(self, update: Callable[["GroupChatOrchestrator"], None]):
+        if self.apply_later is None:
+            update(self)
+        else:
+            self.apply_later(update)
+    
+    def _image_ready(self, job: Job):
+        self._apply_background(lambda orchestrator: orchestrator._post_image(job))
+    
+    def _post_image(self, job: Job):
+        """Posts a finished image job to the history, unless the session was cleared meanwhile."""
+        if job.id not in self._image_jobs:
+            return
+        self._image_jobs.discard(job.id)
+        if job.result:
+            self._append(Message("ImageGenAgent", "Here's how the outfit could look.", image_ref=job.result["image_ref"]))
+        else:
+            self._append(Message("ImageGenAgent", "I couldn't create the outfit image this time."))
+    
+    def _history(self) -> List[Dict]:
+        """The rolling summary (if any) followed by the messages it doesn't cover yet."""
+        start = bisect_right(self.messages, self.summarized_seq, key=_seq)
+        history = [{"role": SUMMARY_ROLE, "content": self.summary}] if self.summary else []
+        history.extend({"role": m.sender, "content": m.content} for m in self.messages[start:])
+        return history
+    
+    def _schedule_summary(self):
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        if self.summary_pending and time.time() - self.summary_pending[1] < self.summary_pending_seconds:
+            return
+        start = bisect_right(self.messages, self.summarized_seq, key=_seq)
+        if len(self.messages) - start <= self.summary_trigger:
+            return
+        fold = self.messages[start:len(self.messages) - self.summary_keep_recent]
+        if not fold:
+            return
+        # Intent announcements only restate the user's message, so they aren't worth summarizing
+        turns = [{"role": m.sender, "content": m.content} for m in fold if m.sender != "IntentAgent"]
+        # Runs after the reply has gone out; the next turn uses whichever summary is ready
+        self.summary_pending = [fold[-1].seq, time.time()]
+        self._summary_task = asyncio.create_task(self._update_summary(turns, self.summary_pending))
+    
+    async def _update_summary(self, turns: List[Dict], marker: List):
+        summary = None
+        try:
+            with span("summary.update", turns=len(turns)):
+                summary = await summarize_conversation(self.summary, turns)
+        except Exception as e:
+            print(f"Summary update failed: {e}")
+        # Applied even without a summary, to clear the in-flight marker
+        self._apply_background(lambda orchestrator: orchestrator._set_summary(summary, marker))
+    
+    def _set_summary(self, summary: Optional[str], marker: List):
+        """Applies a finished summary if the session still waits for it (`marker` is its summary_pending)."""
+        # A different marker means the session was cleared (and maybe started again under the same ID)
+        # or another summary superseded this one: the result belongs to a conversation that's gone
+        if self.summary_pending != marker:
+            return
+        self.summary_pending = None
+        through_seq = marker[0]
+        # Another worker may have folded further meanwhile; never move the summary backwards
+        if summary and through_seq > self.summarized_seq:
+            self.summary = summary
+            self.summarized_seq = through_seq
+    
+    def _append(self, msg: Message):
+        self.last_seq += 1
+        msg.seq = self.last_seq
+        self.messages.append(msg)
+        if len(self.messages) > self.max_messages:
+            del self.messages[:len(self.messages) - self.max_messages]
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Plain, JSON-serializable session state (wardrobe embeddings are recomputed on restore)."""
+        return {
+            "seq": self.last_seq,
+            "messages": [[m.seq, m.sender, m.content, m.timestamp.timestamp(), m.image_ref] for m in self.messages],
+            "wardrobe": self.wardrobe_context,
+            "items": [list(item) for item in self.wardrobe_items],
+            "recommendation": self.outfit_recommendation,
+            "preferences": self.user_preferences,
+            "state": self.conversation_state,
+            "summary": self.summary,
+            "summarized_seq": self.summarized_seq,
+            "summary_pending": self.summary_pending,
+            "image_jobs": sorted(self._image_jobs),
         }
     
-    def get_conversation_history(self) -> List[Dict]:
-        return [{"sender": m.sender, "content": m.content, "time": m.timestamp.isoformat()} 
-                for m in self.messages]
+    def restore_state(self, state: Dict[str, Any]):
+        self.last_seq = state["seq"]
+        self.messages = []
+        for seq, sender, content, timestamp, image_ref in state["messages"]:
+            msg = Message(sender, content, datetime.fromtimestamp(timestamp), image_ref)
+            msg.seq = seq
+            self.messages.append(msg)
+        self.wardrobe_context = state["wardrobe"]
+        self.wardrobe_items = [WardrobeItem(*item) for item in state["items"]]
+        self.wardrobe_vectors.clear()
+        if self.wardrobe_items:
+            self.wardrobe_vectors.add(embed_texts([item.describe() for item in self.wardrobe_items]))
+        self.outfit_recommendation = state["recommendation"]
+        self.user_preferences = state["preferences"]
+        self.conversation_state = state["state"]
+        self.summary = state["summary"]
+        self.summarized_seq = state["summarized_seq"]
+        self.summary_pending = state.get("summary_pending")
+        self._image_jobs = set(state["image_jobs"])
+    
+    def get_conversation_history(self, after: int = None, before: int = None, limit: int = None) -> List[Dict]:
+        """
+        Returns retained messages as dicts, oldest first.
+        
+        `after`/`before` are exclusive sequence-number cursors. With `limit`, paging
+        forward from `after` returns the oldest matches; paging back from `before`
+        alone returns the newest.
+        """
+        start, end = 0, len(self.messages)
+        if after is not None:
+            start = bisect_right(self.messages, after, key=_seq)
+        if before is not None:
+            end = bisect_left(self.messages, before, key=_seq)
+        if limit is not None:
+            if before is not None and after is None:
+                start = max(start, end - limit)
+            else:
+                end = min(end, start + limit)
+        return [m.to_dict() for m in self.messages[start:end]]
     
     def clear_history(self):
+        """Forgets the conversation and stops its background work (pending summary, queued images)."""
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
+        # Emptied first: a cancelled job reports back straight away and must not be posted
+        jobs, self._image_jobs = self._image_jobs, set()
+        for job_id in jobs:
+            get_image_jobs().cancel(job_id)
         self.messages = []
         self.wardrobe_context = ""
+        self.wardrobe_items = []
+        self.wardrobe_vectors.clear()
         self.outfit_recommendation = ""
+        self.summary = ""
+        self.summarized_seq = 0
+        self.summary_pending = None
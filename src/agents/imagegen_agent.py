@@ -1,27 +1,21 @@
 import os
-from dotenv import load_dotenv
-from google import genai
+from typing import Dict, Optional, Tuple
+from src.providers import get_gemini_client, provider_slot
+from src.providers.telemetry import provider_call, record_usage
+from src.providers.usage import select_model
+from src.utils.blob_store import get_blob_store, image_ref_url
+from src.utils.job_queue import JobQueue
 
-load_dotenv()
+_image_jobs: Optional[JobQueue] = None
 
-_client = None
-
-def get_client():
-    global _client
-    if _client is None:
-        key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if key:
-            _client = genai.Client(api_key=key)
-    return _client
-
-async def generate_outfit_image(description: str) -> str:
+async def generate_outfit_image(description: str) -> Optional[Tuple[bytes, str]]:
     """
     Generates outfit visualization images using Gemini 3 Pro Image.
     Creates realistic fashion photography with professional studio lighting.
     
-    Returns base64-encoded image data for immediate display, or None if generation fails.
+    Returns (raw image bytes, mime type) for the blob store, or None if generation fails.
     """
-    client = get_client()
+    client = get_gemini_client()
     if not client:
         print("ImageGenAgent: No client configured")
         return None
@@ -30,19 +24,22 @@ async def generate_outfit_image(description: str) -> str:
         prompt = f"A realistic fashion photography shot of a mannequin wearing: {description}. Neutral studio background, professional lighting, high resolution."
         print(f"ImageGenAgent: Generating image...")
         
-        response = client.models.generate_content(
-            model="gemini-3-pro-image-preview",
-            contents={"parts": [{"text": prompt}]}
-        )
+        model = select_model("image_gen", "gemini-3-pro-image-preview")
+        with provider_call("image_gen", "gemini", model):
+            async with provider_slot("gemini"):
+                response = await client.aio.models.generate_content(
+                    model=model,
+                    contents={"parts": [{"text": prompt}]}
+                )
+            record_usage(response)
         
         # Extract image from response
         if response.candidates:
             for part in response.candidates[0].content.parts:
                 if hasattr(part, 'inline_data') and part.inline_data:
-                    import base64
-                    img_data = base64.b64encode(part.inline_data.data).decode('utf-8')
-                    print(f"ImageGenAgent: Generated {len(img_data)} chars")
-                    return img_data
+                    img_data = part.inline_data.data
+                    print(f"ImageGenAgent: Generated {len(img_data)} bytes")
+                    return img_data, part.inline_data.mime_type or "image/png"
         
         print("ImageGenAgent: No image in response")
         return None
@@ -50,3 +47,39 @@ async def generate_outfit_image(description: str) -> str:
     except Exception as e:
         print(f"ImageGenAgent error: {e}")
         return None
+
+async def _render_job(description: str) -> Dict:
+    image = await generate_outfit_image(description)
+    if not image:
+        raise RuntimeError("no image generated")
+    digest = await get_blob_store().put_async(*image)
+    return {"image_ref": digest, "image_url": image_ref_url(digest)}
+
+def get_image_jobs() -> JobQueue:
+    """
+    Shared queue for outfit image generation, so slow renders never hold up
+    the chat response.
+    
+    Features:
+    - IMAGE_GEN_WORKERS concurrent renders (default 2)
+    - IMAGE_GEN_PER_MINUTE render starts per minute (default 20, 0 = unlimited)
+    - IMAGE_GEN_MAX_QUEUED waiting jobs before new ones are rejected (default 50)
+    - IMAGE_GEN_TIMEOUT_SECONDS per render (default 90)
+    - IMAGE_GEN_JOB_TTL_SECONDS to keep finished jobs for status lookups (default 3600)
+    """
+    global _image_jobs
+    if _image_jobs is None:
+        _image_jobs = JobQueue(
+            "image_gen",
+            _render_job,
+            workers=int(os.getenv("IMAGE_GEN_WORKERS", "2")),
+            per_minute=float(os.getenv("IMAGE_GEN_PER_MINUTE", "20")),
+            max_queued=int(os.getenv("IMAGE_GEN_MAX_QUEUED", "50")),
+            timeout=float(os.getenv("IMAGE_GEN_TIMEOUT_SECONDS", "90")),
+            ttl=float(os.getenv("IMAGE_GEN_JOB_TTL_SECONDS", "3600")),
+        )
+    return _image_jobs
+
+async def close_image_jobs():
+    if _image_jobs is not None:
+        await _image_jobs.close()
@@ -1,33 +1,29 @@
-import os
-import json
-import google.generativeai as genai
-from openai import AsyncOpenAI
+import time
 from typing import Dict, List
+from google.genai import types
+from src.providers import get_gemini_client, get_openai_client, provider_slot, ProviderRoute, NoProviderAvailable, get_router
+from src.utils.prometheus_metrics import intent_classifications
+from src.agents.intent_fastpath import classify_fast, fastpath_threshold, log_intent
+from src.agents.intent_schema import Intent, OPENAI_RESPONSE_FORMAT, normalize_intent, parse_intent_json
+from src.utils.response_cache import get_cache
+from src.utils.single_flight import get_single_flight
+from src.utils.context_builder import ContextBuilder
+from src.providers.telemetry import record_usage
+from src.providers.tiers import route_model
 
-_gemini_configured = False
-_openai_client = None
-
-def configure_gemini():
-    global _gemini_configured
-    if not _gemini_configured:
-        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            _gemini_configured = True
-    return _gemini_configured
-
-def get_openai_client():
-    global _openai_client
-    if _openai_client is None:
-        key = os.getenv("OPENAI_API_KEY")
-        if key:
-            _openai_client = AsyncOpenAI(api_key=key)
-    return _openai_client
-
-async def parse_intent(user_message: str, conversation_history: List[Dict] = None) -> Dict:
+async def parse_intent(user_message: str, conversation_history: List[Dict] = None, has_image: bool = False) -> Dict:
     """
     Analyzes user message to determine intent and required agent actions.
-    Uses Gemini 3 Pro for classification, with OpenAI GPT-4o-mini as fallback.
+    Obvious messages are answered by the local fast path (intent_fastpath.py);
+    the rest use a small Gemini model for classification (Flash-Lite, or Flash
+    when it misses the intent latency SLO; see src/providers/tiers.py), with
+    OpenAI GPT-4o-mini as fallback (routed, hedged and timed out by the provider
+    router). Identical messages
+    classified concurrently share one model call.
+    
+    Both providers answer in structured output mode against the `Intent`
+    schema (intent_schema.py); malformed replies are repaired locally rather
+    than retried, and every returned dict has all of the keys below.
     
     Returns structured intent with:
     - primary_intent: Type of request (wardrobe_analysis, outfit_recommendation, etc.)
@@ -38,17 +34,66 @@ async def parse_intent(user_message: str, conversation_history: List[Dict] = Non
     - style_preference: User's style (classic, trendy, minimalist, etc.)
     - urgency: Timeline (immediate, normal, planning)
     """
-    # Try Gemini first (FREE tier)
-    if configure_gemini():
-        try:
-            model = genai.GenerativeModel("gemini-3-pro-preview")
-            
-            context = ""
-            if conversation_history:
-                recent = conversation_history[-3:]
-                context = "\n".join([f"{m['role']}: {m['content']}" for m in recent])
-            
-            prompt = f"""You are an intent classifier for a fashion AI system. Analyze the user's message and return ONLY a JSON object with this exact structure:
+    fast_intent, confidence, tier = classify_fast(user_message, has_image)
+    if confidence >= fastpath_threshold():
+        intent_classifications.labels(tier=tier).inc()
+        return normalize_intent(fast_intent)
+    
+    cache = get_cache("intent")
+    # The turn before this message disambiguates it; the orchestrator's history already ends with the message itself
+    history = _earlier_turns(conversation_history, user_message)
+    last_turn = history[-1]["content"] if history else ""
+    cache_key = cache.key(user_message, has_image, last_turn)
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return normalize_intent(cached)
+    started = time.perf_counter()
+    
+    # Identical messages already being classified share one model call
+    intent = await get_single_flight("intent").do(
+        (user_message, has_image, last_turn),
+        lambda _: _classify_uncached(user_message, history, cache, cache_key, started),
+    )
+    # Callers may annotate their intent, so coalesced waiters each get their own copy
+    return dict(intent)
+
+def _earlier_turns(conversation_history: List[Dict], user_message: str) -> List[Dict]:
+    history = conversation_history or []
+    # The message goes in the prompt on its own, so it's dropped from the end of the history
+    if history and history[-1]["content"] == user_message:
+        history = history[:-1]
+    return history
+
+async def _classify_uncached(user_message: str, history: List[Dict], cache, cache_key, started: float) -> Dict:
+    context = ContextBuilder("intent").add_turns(history)
+    
+    routes = []
+    gemini = get_gemini_client()
+    if gemini:
+        gemini_model = route_model("intent", "gemini", "gemini-2.5-flash-lite")
+        routes.append(ProviderRoute("gemini", gemini_model,
+                                    lambda: _gemini_intent(gemini, gemini_model, user_message, context)))
+    client = get_openai_client()
+    if client:
+        openai_model = route_model("intent", "openai", "gpt-4o-mini")
+        routes.append(ProviderRoute("openai", openai_model,
+                                    lambda: _openai_intent(client, openai_model, user_message, context)))
+    
+    try:
+        intent = await get_router().call("intent", routes)
+    except NoProviderAvailable as e:
+        print(f"IntentAgent: {e}")
+        # Fallback to keyword-based intent
+        intent_classifications.labels(tier="keyword").inc()
+        return keyword_intent(user_message)
+    
+    intent_classifications.labels(tier="llm").inc()
+    log_intent(user_message, intent)
+    await cache.set(cache_key, intent, time.perf_counter() - started)
+    return intent
+
+async def _gemini_intent(gemini, model: str, user_message: str, context: ContextBuilder) -> Dict:
+    instructions = f"""You are an intent classifier for a fashion AI system. Analyze the user's message and return ONLY a JSON object with this exact structure:
 
 {{
     "primary_intent": "wardrobe_analysis" or "outfit_recommendation" or "style_advice" or "image_generation" or "general_chat",
@@ -65,79 +110,62 @@ Rules:
 - If user uploads image or asks "how does this look" → set needs_vision=true and primary_intent="wardrobe_analysis"
 - If user asks for outfit advice → set needs_recommendation=true and primary_intent="outfit_recommendation"
 
-Recent conversation:
-{context}
-
+Recent conversation:"""
+    prompt = context.build(prefix=instructions, suffix=f"""
 New message: {user_message}
 
-Return ONLY the JSON, no other text:"""
-            
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.3,
-                    "top_p": 0.95,
-                    "max_output_tokens": 256,
-                }
-            )
-            
-            # Extract JSON from response
-            text = response.text.strip()
-            # Remove markdown code blocks if present
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-            
-            return json.loads(text)
-            
-        except Exception as e:
-            print(f"Gemini intent parsing error: {e}")
+Return ONLY the JSON, no other text:""")
     
-    # Fallback to OpenAI
-    client = get_openai_client()
-    if client:
-        try:
-            context = ""
-            if conversation_history:
-                recent = conversation_history[-3:]
-                context = "\n".join([f"{m['role']}: {m['content']}" for m in recent])
-            
-            response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{
-                    "role": "system",
-                    "content": """You are an intent classifier for a fashion AI system. Analyze the user's message and return a JSON object with:
-                    {
-                        "primary_intent": "wardrobe_analysis" | "outfit_recommendation" | "style_advice" | "image_generation" | "general_chat",
-                        "needs_vision": true/false,
-                        "needs_recommendation": true/false,
-                        "needs_image_gen": true/false,
-                        "occasion": "casual" | "formal" | "business" | "party" | "date" | "workout" | "unknown",
-                        "style_preference": "classic" | "trendy" | "minimalist" | "bold" | "unknown",
-                        "urgency": "immediate" | "normal" | "planning"
-                    }"""
-                }, {
-                    "role": "user",
-                    "content": f"Recent conversation:\n{context}\n\nNew message: {user_message}\n\nClassify this intent:"
-                }],
-                response_format={"type": "json_object"}
+    async with provider_slot("gemini"):
+        response = await gemini.aio.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=0.3,
+                top_p=0.95,
+                max_output_tokens=256,
+                response_mime_type="application/json",
+                response_schema=Intent,
             )
-            
-            return json.loads(response.choices[0].message.content)
-        except Exception as e:
-            print(f"OpenAI intent parsing error: {e}")
-    
-    # Fallback to keyword-based intent
-    return {
+        )
+    record_usage(response)
+    return parse_intent_json(response.text, fallback=keyword_intent(user_message))
+
+async def _openai_intent(client, model: str, user_message: str, context: ContextBuilder) -> Dict:
+    request = context.build(prefix="Recent conversation:", suffix=f"\nNew message: {user_message}\n\nClassify this intent:")
+    async with provider_slot("openai"):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[{
+                "role": "system",
+                "content": """You are an intent classifier for a fashion AI system. Analyze the user's message and return a JSON object with:
+                {
+                    "primary_intent": "wardrobe_analysis" | "outfit_recommendation" | "style_advice" | "image_generation" | "general_chat",
+                    "needs_vision": true/false,
+                    "needs_recommendation": true/false,
+                    "needs_image_gen": true/false,
+                    "occasion": "casual" | "formal" | "business" | "party" | "date" | "workout" | "unknown",
+                    "style_preference": "classic" | "trendy" | "minimalist" | "bold" | "unknown",
+                    "urgency": "immediate" | "normal" | "planning"
+                }"""
+            }, {
+                "role": "user",
+                "content": request
+            }],
+            response_format=OPENAI_RESPONSE_FORMAT
+        )
+    record_usage(response)
+    return parse_intent_json(response.choices[0].message.content, fallback=keyword_intent(user_message))
+
+def keyword_intent(user_message: str) -> Dict:
+    """Cheap keyword classification used when no model is available or in time."""
+    text = user_message.lower()
+    return normalize_intent({
         "primary_intent": "general_chat",
-        "needs_vision": "image" in user_message.lower() or "wardrobe" in user_message.lower(),
-        "needs_recommendation": any(w in user_message.lower() for w in ["recommend", "suggest", "outfit", "wear"]),
-        "needs_image_gen": any(w in user_message.lower() for w in ["show", "visualize", "generate", "create"]),
+        "needs_vision": "image" in text or "wardrobe" in text,
+        "needs_recommendation": any(w in text for w in ["recommend", "suggest", "outfit", "wear"]),
+        "needs_image_gen": any(w in text for w in ["show", "visualize", "generate", "create"]),
         "occasion": "casual",
         "style_preference": "unknown",
         "urgency": "normal"
-    }
+    })
@@ -0,0 +1,219 @@
+"""
+Fast-path intent classification for IntentAgent
+
+Answers obvious messages ("hi", "show me the outfit", "what should I wear to a
+wedding?") locally so parse_intent only escalates to the LLM when unsure.
+
+Tiers, cheapest first:
+1. rules       - compiled keyword/regex matcher
+2. local_model - optional naive Bayes token scorer trained from logged LLM intents
+                 (INTENT_MODEL_PATH); see `python -m src.agents.intent_fastpath train`
+
+Each tier returns the usual intent dict plus a confidence in [0, 1]; parse_intent
+trusts it when confidence >= INTENT_FASTPATH_THRESHOLD (default 0.85). LLM
+decisions can be appended to INTENT_LOG_PATH (JSONL) to grow the training set.
+"""
+
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Tuple
+
+_GREETING = re.compile(
+    r"^\s*(hi|hello|hey|hiya|yo|thanks|thank you|thx|cheers|ok|okay|cool|great|bye|goodbye|"
+    r"good (morning|afternoon|evening))\b[\s!.,:)]*(there|again|so much|a lot)?[\s!.,:)]*$",
+    re.IGNORECASE,
+)
+_IMAGE_GEN = re.compile(
+    r"\b(show me|visuali[sz]e|picture|render|draw|generate (an? )?(image|picture|photo)|"
+    r"what (would|will|does) (it|that|this|the outfit) look like|let me see)\b",
+    re.IGNORECASE,
+)
+_RECOMMEND = re.compile(
+    r"\b(recommend|suggest|what (should|can|could) i wear|what to wear|outfit (for|ideas?)|"
+    r"need (an? )?(outfit|something to wear|look)|dress (me )?for|find me|looking for)\b",
+    re.IGNORECASE,
+)
+_VISION = re.compile(
+    r"\b(how (does|do) (this|these|it|they) look|my wardrobe|this (photo|picture|image)|"
+    r"what do you think of (this|my))\b",
+    re.IGNORECASE,
+)
+_STYLE_ADVICE = re.compile(
+    r"\b(does .+ go with|match(es)? with|tips?|how (do|should) i (style|wear)|is it ok to wear)\b",
+    re.IGNORECASE,
+)
+
+_OCCASIONS = [
+    ("formal", re.compile(r"\b(wedding|gala|black tie|funeral|ball|christening|ceremony|opera)\b", re.I)),
+    ("business", re.compile(r"\b(meeting|interview|office|work|conference|presentation|business)\b", re.I)),
+    ("party", re.compile(r"\b(party|club|clubbing|birthday|festival|night out|wimbledon|races)\b", re.I)),
+    ("date", re.compile(r"\b(date|dinner|anniversary|romantic)\b", re.I)),
+    ("workout", re.compile(r"\b(gym|run|running|workout|training|yoga|football|hike|hiking)\b", re.I)),
+    ("casual", re.compile(r"\b(casual|weekend|brunch|everyday|relaxed|shopping)\b", re.I)),
+]
+_STYLES = [
+    ("minimalist", re.compile(r"\b(minimal|minimalist|simple|clean|understated)\b", re.I)),
+    ("bold", re.compile(r"\b(bold|statement|bright|loud|colou?rful|edgy)\b", re.I)),
+    ("trendy", re.compile(r"\b(trendy|trending|fashionable|streetwear|modern|latest)\b", re.I)),
+    ("classic", re.compile(r"\b(classic|timeless|smart|tailored|traditional|preppy)\b", re.I)),
+]
+_IMMEDIATE = re.compile(r"\b(today|tonight|now|asap|right away|this (morning|afternoon|evening))\b", re.I)
+_PLANNING = re.compile(r"\b(next (week|month|year)|planning|in a few (weeks|months)|later this (month|year))\b", re.I)
+
+_TOKEN = re.compile(r"[a-z']+")
+
+def _first_label(patterns, text: str, default: str) -> str:
+    for label, pattern in patterns:
+        if pattern.search(text):
+            return label
+    return default
+
+def _build_intent(primary_intent: str, text: str, has_image: bool) -> Dict:
+    return {
+        "primary_intent": primary_intent,
+        "needs_vision": has_image or primary_intent == "wardrobe_analysis",
+        "needs_recommendation": primary_intent == "outfit_recommendation",
+        "needs_image_gen": primary_intent == "image_generation",
+        "occasion": _first_label(_OCCASIONS, text, "unknown"),
+        "style_preference": _first_label(_STYLES, text, "unknown"),
+        "urgency": "immediate" if _IMMEDIATE.search(text) else "planning" if _PLANNING.search(text) else "normal",
+    }
+
+def classify_rules(user_message: str, has_image: bool = False) -> Tuple[Dict, float]:
+    text = user_message.strip()
+    if _GREETING.match(text) and not has_image:
+        return _build_intent("general_chat", text, has_image), 0.95
+
+    matched = []
+    if has_image or _VISION.search(text):
+        matched.append("wardrobe_analysis")
+    if _IMAGE_GEN.search(text):
+        matched.append("image_generation")
+    if _RECOMMEND.search(text):
+        matched.append("outfit_recommendation")
+    if _STYLE_ADVICE.search(text):
+        matched.append("style_advice")
+
+    if len(matched) == 1:
+        return _build_intent(matched[0], text, has_image), 0.9
+    if matched:
+        # Mixed signals: keep the first match as a guess but let the LLM decide
+        return _build_intent(matched[0], text, has_image), 0.4
+    return _build_intent("general_chat", text, has_image), 0.2
+
+class NaiveBayesIntentModel:
+    """Multinomial naive Bayes over lowercase word tokens, stored as plain JSON."""
+
+    def __init__(self, log_priors: Dict[str, float], log_likelihoods: Dict[str, Dict[str, float]],
+                 log_unseen: Dict[str, float]):
+        self.log_priors = log_priors
+        self.log_likelihoods = log_likelihoods
+        self.log_unseen = log_unseen
+
+    @classmethod
+    def train(cls, examples) -> "NaiveBayesIntentModel":
+        label_counts = Counter()
+        token_counts = defaultdict(Counter)
+        vocabulary = set()
+        for text, label in examples:
+            tokens = _TOKEN.findall(text.lower())
+            label_counts[label] += 1
+            token_counts[label].update(tokens)
+            vocabulary.update(tokens)
+        total = sum(label_counts.values())
+        vocab_size = len(vocabulary) + 1
+        log_priors, log_likelihoods, log_unseen = {}, {}, {}
+        for label, count in label_counts.items():
+            denominator = sum(token_counts[label].values()) + vocab_size
+            log_priors[label] = math.log(count / total)
+            log_likelihoods[label] = {t: math.log((c + 1) / denominator) for t, c in token_counts[label].items()}
+            log_unseen[label] = math.log(1 / denominator)
+        return cls(log_priors, log_likelihoods, log_unseen)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        tokens = _TOKEN.findall(text.lower())
+        scores = {}
+        for label, prior in self.log_priors.items():
+            likelihoods = self.log_likelihoods[label]
+            unseen = self.log_unseen[label]
+            scores[label] = prior + sum(likelihoods.get(t, unseen) for t in tokens)
+        best = max(scores, key=scores.get)
+        # Softmax over log scores gives the posterior of the best label
+        top = scores[best]
+        normalizer = sum(math.exp(s - top) for s in scores.values())
+        return best, 1 / normalizer
+
+    def to_json(self) -> Dict:
+        return {"log_priors": self.log_priors, "log_likelihoods": self.log_likelihoods, "log_unseen": self.log_unseen}
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "NaiveBayesIntentModel":
+        return cls(data["log_priors"], data["log_likelihoods"], data["log_unseen"])
+
+_model: Optional[NaiveBayesIntentModel] = None
+_model_loaded = False
+
+def get_local_model() -> Optional[NaiveBayesIntentModel]:
+    global _model, _model_loaded
+    if not _model_loaded:
+        _model_loaded = True
+        path = os.getenv("INTENT_MODEL_PATH")
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    _model = NaiveBayesIntentModel.from_json(json.load(f))
+            except Exception as e:
+                print(f"IntentAgent: could not load local intent model: {e}")
+    return _model
+
+def fastpath_threshold() -> float:
+    return float(os.getenv("INTENT_FASTPATH_THRESHOLD", "0.85"))
+
+def classify_fast(user_message: str, has_image: bool = False) -> Tuple[Dict, float, str]:
+    """Returns (intent, confidence, tier) from the cheapest tier that is confident."""
+    intent, confidence = classify_rules(user_message, has_image)
+    if confidence >= fastpath_threshold():
+        return intent, confidence, "rules"
+
+    model = get_local_model()
+    if model is not None:
+        label, probability = model.predict(user_message)
+        if probability > confidence:
+            return _build_intent(label, user_message, has_image), probability, "local_model"
+    return intent, confidence, "rules"
+
+def log_intent(user_message: str, intent: Dict):
+    """Appends an LLM-classified example to INTENT_LOG_PATH for retraining."""
+    path = os.getenv("INTENT_LOG_PATH")
+    if not path:
+        return
+    try:
+        with open(path, "a") as f:
+            f.write(json.dumps({"message": user_message, "primary_intent": intent.get("primary_intent")}) + "\n")
+    except OSError as e:
+        print(f"IntentAgent: could not log intent: {e}")
+
+def train_from_log(log_path: str, model_path: str) -> int:
+    examples = []
+    with open(log_path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                if record.get("primary_intent"):
+                    examples.append((record["message"], record["primary_intent"]))
+    model = NaiveBayesIntentModel.train(examples)
+    with open(model_path, "w") as f:
+        json.dump(model.to_json(), f)
+    return len(examples)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "train":
+        print("Usage: python -m src.agents.intent_fastpath train <intent_log.jsonl> <model.json>")
+        sys.exit(1)
+    count = train_from_log(sys.argv[2], sys.argv[3])
+    print(f"Trained local intent model on {count} examples -> {sys.argv[3]}")
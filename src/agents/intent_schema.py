@@ -0,0 +1,115 @@
+"""
+Intent schema and tolerant parsing for IntentAgent
+
+`Intent` is the single definition of the intent dict: it is sent to Gemini as
+response_schema and to OpenAI as a strict json_schema response_format, so both
+providers are constrained to valid output, and every intent the orchestrator
+sees (model, fast path, cache, keyword fallback) is normalized through it, so
+all keys are always present.
+
+If a model still returns something malformed (code fences, prose around the
+object, trailing commas, single quotes, Python literals, truncation),
+parse_intent_json() repairs what it can and fills the rest with defaults
+instead of raising - a bad response never costs a second round-trip. How
+much repair a reply needed is its quality score for model tier comparisons.
+"""
+
+import json
+import re
+from typing import Dict, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+from src.providers.tiers import record_quality
+
+PRIMARY_INTENTS = ("wardrobe_analysis", "outfit_recommendation", "style_advice", "image_generation", "general_chat")
+OCCASIONS = ("casual", "formal", "business", "party", "date", "workout", "unknown")
+STYLES = ("classic", "trendy", "minimalist", "bold", "unknown")
+URGENCIES = ("immediate", "normal", "planning")
+
+class Intent(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    primary_intent: Literal[PRIMARY_INTENTS] = "general_chat"
+    needs_vision: bool = False
+    needs_recommendation: bool = False
+    needs_image_gen: bool = False
+    occasion: Literal[OCCASIONS] = "unknown"
+    style_preference: Literal[STYLES] = "unknown"
+    urgency: Literal[URGENCIES] = "normal"
+
+    @field_validator("primary_intent", "occasion", "style_preference", "urgency", mode="before")
+    @classmethod
+    def _known_value(cls, value, info):
+        # Out-of-vocabulary labels fall back to the field default instead of failing the whole intent
+        allowed = {"primary_intent": PRIMARY_INTENTS, "occasion": OCCASIONS,
+                   "style_preference": STYLES, "urgency": URGENCIES}[info.field_name]
+        value = str(value).strip().lower().replace(" ", "_").replace("-", "_")
+        return value if value in allowed else cls.model_fields[info.field_name].default
+
+    @field_validator("needs_vision", "needs_recommendation", "needs_image_gen", mode="before")
+    @classmethod
+    def _flag(cls, value):
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "yes", "1", "y")
+        return bool(value)
+
+def _strict_schema() -> Dict:
+    """Intent's JSON schema in the form OpenAI strict mode accepts: every field required, nothing extra."""
+    schema = Intent.model_json_schema()
+    properties = {}
+    for name, field in schema["properties"].items():
+        properties[name] = {key: value for key, value in field.items() if key in ("type", "enum")}
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+INTENT_JSON_SCHEMA = _strict_schema()
+OPENAI_RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "intent", "strict": True, "schema": INTENT_JSON_SCHEMA}}
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PYTHON_LITERALS = re.compile(r"\b(True|False|None)\b")
+_FIELD = re.compile(r"""["']?(\w+)["']?\s*[:=]\s*["']?([\w-]+)""")
+
+def normalize_intent(intent: Dict) -> Dict:
+    """Intent dict with every field present and in vocabulary."""
+    return Intent.model_validate(intent).model_dump()
+
+def _repair(text: str) -> Optional[Dict]:
+    start = text.find("{")
+    if start < 0:
+        return None
+    body = text[start:text.rfind("}") + 1] if text.rfind("}") > start else text[start:]
+    body = _TRAILING_COMMA.sub(r"\1", body)
+    body = _PYTHON_LITERALS.sub(lambda m: {"True": "true", "False": "false", "None": "null"}[m.group(1)], body)
+    if '"' not in body:
+        body = body.replace("'", '"')
+    # Truncated output: close an open string and the object
+    if body.count('"') % 2:
+        body += '"'
+    if not body.rstrip().endswith("}"):
+        body = body.rstrip().rstrip(",") + "}"
+    try:
+        parsed = json.loads(body)
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def parse_intent_json(text: str, fallback: Optional[Dict] = None) -> Dict:
+    """
+    Parses a model's intent reply, repairing malformed JSON. Fields that can't
+    be recovered come from `fallback` (e.g. keyword_intent) or the defaults.
+    """
+    text = (text or "").strip()
+    try:
+        intent = Intent.model_validate_json(text).model_dump()
+        record_quality(1.0)
+        return intent
+    except ValidationError:
+        pass
+    text = _FENCE.sub("", text)
+    parsed = _repair(text)
+    record_quality(0.5 if parsed is not None else 0.0)
+    if parsed is None:
+        # Last resort: any key: value pairs that name Intent fields
+        parsed = {key: value for key, value in _FIELD.findall(text) if key in Intent.model_fields}
+    return Intent.model_validate({**(fallback or {}), **parsed}).model_dump()
@@ -1,62 +1,129 @@
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-from openai import AsyncOpenAI
+import re
+import time
+from typing import Dict
+from google.genai import types
+from openai import NOT_GIVEN
 from src.utils.prometheus_metrics import brand_mentions, product_recommendations
+from src.providers import get_gemini_client, get_openai_client, provider_slot, ProviderRoute, NoProviderAvailable, get_router
+from src.utils.llm_streaming import collect_gemini_stream, collect_openai_stream
+from src.utils.response_cache import get_cache
+from src.utils.single_flight import get_single_flight
+from src.utils.context_builder import ContextBuilder, LATEST_USER_TURN, PRODUCTS, WARDROBE, record_prompt_tokens
+from src.utils.brand_matcher import get_brand_matcher
+from src.utils.citations import catalog_links, render_citations
+from src.catalog import CatalogQuery, get_catalog, grounding_mode
+from src.utils.tracing import span
+from src.providers.telemetry import record_usage
+from src.providers.tiers import record_quality, route_model
 
-load_dotenv()
-
-_gemini_configured = False
-_openai_client = None
-
-def configure_gemini():
-    global _gemini_configured
-    if not _gemini_configured:
-        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            _gemini_configured = True
-    return _gemini_configured
-
-def get_openai_client():
-    global _openai_client
-    if _openai_client is None:
-        key = os.getenv("OPENAI_API_KEY")
-        if key:
-            _openai_client = AsyncOpenAI(api_key=key)
-    return _openai_client
-
-async def recommend_outfit(user_request: str, wardrobe_context: str = "") -> str:
+async def recommend_outfit(user_request: str, wardrobe_context: str = "", on_delta=None, cache_key: tuple = None,
+                           catalog_query: CatalogQuery = None) -> Dict:
     """
-    Recommends outfits using Gemini 2.5 Flash with Google Search grounding.
+    Recommends outfits using Gemini 3 Pro (the pro model tier) with Google Search grounding.
     Searches exclusively on Frasers Group websites for real products.
     
     Features:
+    - With a local catalog (CATALOG_PATH), retrieves matching products for
+      `catalog_query` (or the request text) and grounds the answer in them; see
+      RECOMMENDATION_GROUNDING in src/catalog/__init__.py
+    - Adds the catalogue product closest to each wardrobe item in the query
+      (batched embedding match, src/utils/embedding_store.py)
     - Restricts search to Frasers domains (sportsdirect.com, houseoffraser.co.uk, etc.)
-    - Returns actual product names, prices, and clickable links
+    - Returns actual product names, prices, and clickable links, as
+      {"text", "products", "citations"}: the markdown reply plus the products it
+      links and the grounding citations behind them (src/utils/citations.py)
     - Tracks brand mentions and product recommendations via Prometheus
-    - Adds inline citations to product pages when available
-    - Falls back to OpenAI GPT-4o-mini if Gemini unavailable
+    - Adds inline citations to product pages when available (byte offsets from
+      grounding converted to characters, links added in one pass)
+    - Falls back to OpenAI GPT-4o if Gemini is slow or unavailable (provider router)
+    - Streams raw text chunks to `on_delta` when given; citations are added to the final text
+    - Serves repeated requests from the response cache; `cache_key` overrides the key parts
+      (the orchestrator passes request, occasion, style, wardrobe and a digest of the
+      conversation context in the prompt)
+    - Coalesces identical concurrent requests (same key) into one upstream call
     """
-    if configure_gemini():
-        try:
-            from google import genai
-            from google.genai import types
-            
-            client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY"))
-            
-            grounding_tool = types.Tool(
-                google_search=types.GoogleSearch()
-            )
-            
-            config = types.GenerateContentConfig(
-                tools=[grounding_tool],
-                temperature=0.7,
-                top_p=0.95,
-                max_output_tokens=512,
-            )
-            
-            prompt = f"""You are a fashion stylist for Frasers Group. ONLY recommend products available on these Frasers websites:
+    cache = get_cache("recommendation")
+    key = cache.key(*(cache_key or (user_request, wardrobe_context)))
+    cached = await cache.get(key)
+    if isinstance(cached, str):
+        # Cached before replies carried products and citations
+        cached = _reply(cached, ())
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    
+    # Identical requests already in flight share one grounded search
+    return await get_single_flight("recommendation").do(
+        cache_key or (user_request, wardrobe_context),
+        lambda forward: _recommend_uncached(user_request, wardrobe_context, catalog_query, forward, cache, key, started),
+        on_delta,
+    )
+
+async def _recommend_uncached(user_request: str, wardrobe_context: str, catalog_query: CatalogQuery,
+                             on_delta, cache, key, started: float) -> Dict:
+    products = []
+    catalog = get_catalog()
+    if catalog is not None and grounding_mode() != "search":
+        query = catalog_query or CatalogQuery.from_request(user_request)
+        with span("catalog.search") as search:
+            products = catalog.search(query)
+            if query.wardrobe is not None and len(query.wardrobe):
+                # Closest product to each wardrobe item, all items scored in one batch
+                for matches in catalog.match_items(query.wardrobe, k=1, query=query):
+                    products.extend(p for p in matches if p not in products)
+            search.set(products=len(products))
+    
+    routes = []
+    gemini = get_gemini_client()
+    if gemini:
+        gemini_model = route_model("recommendation", "gemini", "gemini-3-pro-preview")
+        routes.append(ProviderRoute("gemini", gemini_model,
+                                    lambda: _gemini_recommendation(gemini, gemini_model, user_request, wardrobe_context, products, on_delta)))
+    client = get_openai_client()
+    if client:
+        openai_model = route_model("recommendation", "openai", "gpt-4o")
+        routes.append(ProviderRoute("openai", openai_model,
+                                    lambda: _openai_recommendation(client, openai_model, user_request, wardrobe_context, products, on_delta)))
+    
+    try:
+        # Streamed calls don't hedge: two streams would interleave their deltas
+        reply = await get_router().call("recommendation", routes, hedge=on_delta is None)
+    except NoProviderAvailable as e:
+        print(f"RecommendationAgent: {e}")
+        return _reply("RecommendationAgent: Try pairing a blazer with dark jeans and boots (no API key configured)", ())
+    
+    await cache.set(key, reply, time.perf_counter() - started)
+    return reply
+
+def _products_block(products) -> str:
+    if not products:
+        return ""
+    return "\n".join(["Frasers catalogue matches:", *(product.prompt_line() for product in products)])
+
+async def _gemini_recommendation(gemini, model: str, user_request: str, wardrobe_context: str, products, on_delta) -> Dict:
+    # Catalogue matches replace the live web search unless grounding mode asks for both
+    use_search = not products or grounding_mode() == "both"
+    config = types.GenerateContentConfig(
+        tools=[types.Tool(google_search=types.GoogleSearch())] if use_search else None,
+        temperature=0.7,
+        top_p=0.95,
+        max_output_tokens=512,
+    )
+    
+    context = ContextBuilder("recommendation")
+    context.add(f"User request: {user_request}", LATEST_USER_TURN)
+    context.add(_products_block(products), PRODUCTS)
+    context.add(f"Wardrobe: {wardrobe_context if wardrobe_context else 'None'}", WARDROBE)
+    if not use_search:
+        prompt = context.build(prefix="You are a fashion stylist for Frasers Group. ONLY recommend products from the Frasers catalogue matches below.\n", suffix="""
+IMPORTANT RULES:
+1. Recommend 2-3 products from the catalogue matches, with their prices
+2. Link each product you mention with its URL as a markdown link
+3. If nothing fits exactly, say "Frasers Group offers similar items like..." and suggest the closest matches
+
+Keep response under 150 words.""")
+    else:
+        prompt = context.build(prefix="""You are a fashion stylist for Frasers Group. ONLY recommend products available on these Frasers websites:
 
 SEARCH ONLY THESE SITES:
 - site:sportsdirect.com
@@ -64,102 +131,97 @@ SEARCH ONLY THESE SITES:
 - site:flannels.com
 - site:usc.co.uk
 - site:jackwills.com
-
-User request: {user_request}
-Wardrobe: {wardrobe_context if wardrobe_context else "None"}
-
+""", suffix="""
 IMPORTANT RULES:
 1. Search ONLY the Frasers sites listed above
 2. If a product doesn't exist on Frasers sites, suggest the closest alternative that DOES exist
 3. Recommend 2-3 real products with prices
 4. If you can't find exact items, say "Frasers Group offers similar items like..." and suggest alternatives
 
-Keep response under 150 words."""
-            
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
+Keep response under 150 words.""")
+    
+    async with provider_slot("gemini"):
+        if on_delta:
+            stream = await gemini.aio.models.generate_content_stream(
+                model=model,
                 contents=prompt,
                 config=config,
             )
-            
+            text, chunks = await collect_gemini_stream(stream, on_delta)
+            # Grounding metadata arrives with the closing chunks
+            response = next(
+                (c for c in reversed(chunks) if c.candidates and c.candidates[0].grounding_metadata),
+                chunks[-1]
+            )
+        else:
+            response = await gemini.aio.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=config,
+            )
+            record_usage(response)
             text = response.text
-            
-            # Track Frasers brand mentions
-            frasers_brands = ['Sports Direct', 'House of Fraser', 'Flannels', 'USC', 'Jack Wills']
-            for brand in frasers_brands:
-                if brand.lower() in text.lower():
-                    brand_mentions.labels(brand_name=brand).inc()
-            
-            # Track product recommendations (rough estimate by counting price mentions)
-            import re
-            price_count = len(re.findall(r'[£€$]\d+', text))
-            if price_count > 0:
-                product_recommendations.inc(price_count)
-            
-            # Check if grounding found Frasers products
-            has_frasers_links = False
-            if response.candidates and response.candidates[0].grounding_metadata:
-                metadata = response.candidates[0].grounding_metadata
-                
-                if hasattr(metadata, 'grounding_chunks') and metadata.grounding_chunks:
-                    # Check if any links are from Frasers domains
-                    frasers_domains = ['sportsdirect.com', 'houseoffraser.co.uk', 'flannels.com', 'usc.co.uk', 'jackwills.com']
-                    for chunk in metadata.grounding_chunks:
-                        if hasattr(chunk, 'web') and chunk.web and hasattr(chunk.web, 'uri'):
-                            if any(domain in chunk.web.uri for domain in frasers_domains):
-                                has_frasers_links = True
-                                break
-                
-                if has_frasers_links and hasattr(metadata, 'grounding_supports') and metadata.grounding_supports:
-                    chunks = metadata.grounding_chunks
-                    
-                    # Sort by end_index descending to avoid shifting
-                    sorted_supports = sorted(
-                        metadata.grounding_supports,
-                        key=lambda s: s.segment.end_index,
-                        reverse=True
-                    )
-                    
-                    for support in sorted_supports:
-                        end_index = support.segment.end_index
-                        if support.grounding_chunk_indices:
-                            citation_links = []
-                            for i in support.grounding_chunk_indices:
-                                if i < len(chunks) and hasattr(chunks[i], 'web'):
-                                    uri = chunks[i].web.uri
-                                    # Only add Frasers links
-                                    if any(domain in uri for domain in frasers_domains):
-                                        citation_links.append(f"[Link]({uri})")
-                            
-                            if citation_links:
-                                citation_string = " " + " ".join(citation_links)
-                                text = text[:end_index] + citation_string + text[end_index:]
-            
-            # If no Frasers products found, add disclaimer
-            if not has_frasers_links:
-                text += "\n\n*Note: Visit Frasers Group stores (Sports Direct, House of Fraser, Flannels, USC, Jack Wills) to find similar items.*"
-            
-            return text
-            
-        except Exception as e:
-            print(f"Gemini recommendation error: {e}")
     
-    # Fallback to OpenAI
-    client = get_openai_client()
-    if client:
-        try:
-            response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{
-                    "role": "system",
-                    "content": "You are a fashion stylist. Suggest outfits based on occasion, weather, and available wardrobe."
-                }, {
-                    "role": "user",
-                    "content": f"Request: {user_request}\nWardrobe: {wardrobe_context}\nSuggest an outfit."
-                }]
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"OpenAI recommendation error: {e}")
+    with span("postprocess.citations", agent="recommendation") as post:
+        # Track Frasers brand mentions
+        for brand in get_brand_matcher().counts(text, "frasers"):
+            brand_mentions.labels(brand_name=brand).inc()
+        
+        # Track product recommendations (rough estimate by counting price mentions)
+        price_count = len(re.findall(r'[£€$]\d+', text))
+        if price_count > 0:
+            product_recommendations.inc(price_count)
+        
+        # Citation links after each segment grounded in a Frasers page
+        metadata = response.candidates[0].grounding_metadata if response.candidates else None
+        rendered = render_citations(text, metadata)
+        text = rendered.text
+        
+        # If no Frasers products found, add disclaimer
+        if not rendered.frasers_links and not products:
+            text += "\n\n*Note: Visit Frasers Group stores (Sports Direct, House of Fraser, Flannels, USC, Jack Wills) to find similar items.*"
+        
+        post.set(frasers_links=rendered.frasers_links, citations=len(rendered.citations))
     
-    return "RecommendationAgent: Try pairing a blazer with dark jeans and boots (no API key configured)"
+    _score(text, price_count)
+    return _reply(text, rendered.products + catalog_links(text, products), rendered.citations)
+
+async def _openai_recommendation(client, model: str, user_request: str, wardrobe_context: str, products, on_delta) -> Dict:
+    system = "You are a fashion stylist. Suggest outfits based on occasion, weather, and available wardrobe."
+    if products:
+        system += " Recommend only from the Frasers catalogue matches given, linking each product you mention with its URL."
+    context = ContextBuilder("recommendation")
+    context.add(f"Request: {user_request}", LATEST_USER_TURN)
+    context.add(_products_block(products), PRODUCTS)
+    context.add(f"Wardrobe: {wardrobe_context}", WARDROBE)
+    request = "\n".join([*(item.text for item in context.pack()), "Suggest an outfit."])
+    record_prompt_tokens("recommendation", system, request)
+    async with provider_slot("openai"):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[{
+                "role": "system",
+                "content": system
+            }, {
+                "role": "user",
+                "content": request
+            }],
+            stream=on_delta is not None,
+            stream_options={"include_usage": True} if on_delta else NOT_GIVEN
+        )
+        if on_delta:
+            text = await collect_openai_stream(response, on_delta)
+        else:
+            record_usage(response)
+            text = response.choices[0].message.content
+    _score(text, len(re.findall(r'[£€$]\d+', text or "")))
+    return _reply(text, catalog_links(text or "", products))
+
+def _reply(text: str, products, citations=()) -> Dict:
+    # Plain JSON, so the response cache and the API can pass it on unchanged
+    return {"text": text, "products": [p._asdict() for p in products],
+            "citations": [c._asdict() for c in citations]}
+
+def _score(text: str, price_count: int):
+    # Half for quoting prices, half for linking the products (citations or catalogue URLs)
+    record_quality(0.5 * (price_count > 0) + 0.5 * ("](http" in (text or "")))
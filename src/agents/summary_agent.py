@@ -0,0 +1,100 @@
+import os
+import re
+from typing import Dict, List
+from google.genai import types
+from src.providers import get_gemini_client, get_openai_client, provider_slot, ProviderRoute, NoProviderAvailable, get_router
+from src.utils.prometheus_metrics import conversation_summaries
+from src.utils.context_builder import ContextBuilder, count_tokens, record_prompt_tokens
+from src.providers.telemetry import record_usage
+from src.providers.tiers import record_quality, route_model
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s|\n")
+
+def summary_max_tokens() -> int:
+    return int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+
+async def summarize_conversation(previous_summary: str, turns: List[Dict]) -> str:
+    """
+    Folds older conversation turns into the running session summary using
+    Gemini 2.5 Flash-Lite or Flash (model tier policy), with OpenAI GPT-4o-mini
+    as fallback.
+
+    Keeps what later agents need: the shopper's occasions, style, sizes and
+    budget, wardrobe items, and outfits or products already suggested. Without
+    a model it falls back to an extractive summary (first sentence per turn).
+    """
+    # Older turns can carry long recommendations with citation links; a few hundred tokens each is plenty
+    context = ContextBuilder("summary").add_turns(turns, max_tokens=300)
+    instructions = f"""Update the running summary of a fashion shopping chat. Keep the shopper's occasions, style preferences, sizes, budget and wardrobe items, and the outfits/products already suggested (names and prices, no links). Drop greetings and repetition. Reply with the updated summary only, under {summary_max_tokens()} tokens.
+
+Current summary:
+{previous_summary or "(none)"}
+
+New turns:"""
+
+    routes = []
+    gemini = get_gemini_client()
+    if gemini:
+        gemini_model = route_model("summary", "gemini", "gemini-2.5-flash-lite")
+        routes.append(ProviderRoute("gemini", gemini_model,
+                                    lambda: _gemini_summary(gemini, gemini_model, context, instructions)))
+    client = get_openai_client()
+    if client:
+        openai_model = route_model("summary", "openai", "gpt-4o-mini")
+        routes.append(ProviderRoute("openai", openai_model,
+                                    lambda: _openai_summary(client, openai_model, context, instructions)))
+
+    try:
+        summary = await get_router().call("summary", routes)
+        conversation_summaries.labels(tier="llm").inc()
+        return summary.strip()
+    except NoProviderAvailable as e:
+        print(f"SummaryAgent: {e}")
+
+    conversation_summaries.labels(tier="extractive").inc()
+    return extractive_summary(previous_summary, turns)
+
+def extractive_summary(previous_summary: str, turns: List[Dict]) -> str:
+    """First sentence of each turn appended to the summary, oldest lines dropped past the cap."""
+    lines = previous_summary.splitlines() if previous_summary else []
+    for turn in turns:
+        first = _SENTENCE_END.split(turn["content"].strip(), 1)[0]
+        lines.append(f"{turn['role']}: {first[:200]}")
+    limit = summary_max_tokens()
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > limit:
+        lines.pop(0)
+    return "\n".join(lines)
+
+async def _gemini_summary(gemini, model: str, context: ContextBuilder, instructions: str) -> str:
+    prompt = context.build(prefix=instructions)
+    async with provider_slot("gemini"):
+        response = await gemini.aio.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=types.GenerateContentConfig(temperature=0.2, max_output_tokens=summary_max_tokens() * 2)
+        )
+    record_usage(response)
+    _score(response.text)
+    return response.text
+
+async def _openai_summary(client, model: str, context: ContextBuilder, instructions: str) -> str:
+    turns = "\n".join(item.text for item in context.pack())
+    record_prompt_tokens("summary", instructions, turns)
+    async with provider_slot("openai"):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": instructions}, {"role": "user", "content": turns}],
+            temperature=0.2,
+            max_tokens=summary_max_tokens() * 2
+        )
+    record_usage(response)
+    text = response.choices[0].message.content
+    _score(text)
+    return text
+
+def _score(summary: str):
+    # Empty is useless; over the length cap still works but crowds later prompts
+    if not summary or not summary.strip():
+        record_quality(0.0)
+    else:
+        record_quality(1.0 if count_tokens(summary) <= summary_max_tokens() else 0.5)
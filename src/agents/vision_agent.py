@@ -1,83 +1,84 @@
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-from openai import AsyncOpenAI
-import requests
-from PIL import Image
-from io import BytesIO
-
-load_dotenv()
-
-_gemini_configured = False
-_openai_client = None
-
-def configure_gemini():
-    global _gemini_configured
-    if not _gemini_configured:
-        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            _gemini_configured = True
-    return _gemini_configured
-
-def get_openai_client():
-    global _openai_client
-    if _openai_client is None:
-        key = os.getenv("OPENAI_API_KEY")
-        if key:
-            _openai_client = AsyncOpenAI(api_key=key)
-    return _openai_client
+import time
+from google.genai import types
+from src.providers import get_gemini_client, get_openai_client, provider_slot, ProviderRoute, NoProviderAvailable, get_router
+from src.utils.image_pipeline import prepare_image
+from src.utils.response_cache import get_cache
+from src.providers.telemetry import record_usage
+from src.providers.tiers import record_quality, route_model
 
 async def analyze_wardrobe(image_url: str, context: str = "") -> str:
     """
     Analyzes wardrobe/outfit images using Gemini 3 Pro Vision.
     Supports both base64 data URLs and HTTP URLs.
-    Falls back to OpenAI GPT-4o Vision if Gemini is unavailable.
+    Falls back to OpenAI GPT-4o Vision if Gemini is slow or unavailable (provider router).
     
     Returns detailed description of clothing items, colors, styles, and how they work together.
+    
+    Images go through the ingestion pipeline (async fetch, byte cap, off-loop
+    downscale) and results are cached by image content hash, so a re-uploaded
+    photo skips both decoding and inference.
     """
-    # Try Gemini first (FREE tier)
-    if configure_gemini():
-        try:
-            # Handle base64 data URL or HTTP URL
-            if image_url.startswith('data:image'):
-                # Extract base64 data
-                import base64
-                header, encoded = image_url.split(',', 1)
-                img_data = base64.b64decode(encoded)
-                img = Image.open(BytesIO(img_data))
-            else:
-                # Download from URL
-                response = requests.get(image_url)
-                img = Image.open(BytesIO(response.content))
-            
-            # Use Gemini 2.0 Flash for vision (FREE)
-            model = genai.GenerativeModel("gemini-3-pro-preview")
-            
-            prompt = f"Analyze this wardrobe/outfit image. Describe the clothing items, colors, style, and how they work together. Be specific. {context}"
-            
-            response = model.generate_content([prompt, img])
-            return response.text
-            
-        except Exception as e:
-            print(f"Gemini vision error: {e}")
+    try:
+        image = await prepare_image(image_url)
+    except Exception as e:
+        print(f"VisionAgent: could not load image: {e}")
+        image = None
     
-    # Fallback to OpenAI GPT-4 Vision
+    if image:
+        cache = get_cache("vision")
+        cache_key = cache.key(image.content_hash)
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+    
+    routes = []
+    gemini = get_gemini_client()
+    if image and gemini:
+        gemini_model = route_model("vision", "gemini", "gemini-3-pro-preview")
+        routes.append(ProviderRoute("gemini", gemini_model,
+                                    lambda: _gemini_vision(gemini, gemini_model, image, context)))
     client = get_openai_client()
     if client:
-        try:
-            response = await client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": f"Analyze this wardrobe image. List clothing items, colors, and styles. {context}"},
-                        {"type": "image_url", "image_url": {"url": image_url}}
-                    ]
-                }]
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"OpenAI vision error: {e}")
+        openai_model = route_model("vision", "openai", "gpt-4o")
+        routes.append(ProviderRoute("openai", openai_model,
+                                    lambda: _openai_vision(client, openai_model, image.data_url() if image else image_url, context)))
+    
+    try:
+        text = await get_router().call("vision", routes)
+    except NoProviderAvailable as e:
+        print(f"VisionAgent: {e}")
+        return "VisionAgent: Found casual shirts, jeans, jackets in wardrobe (no API key configured)"
     
-    return "VisionAgent: Found casual shirts, jeans, jackets in wardrobe (no API key configured)"
+    if image:
+        await cache.set(cache_key, text, time.perf_counter() - started)
+    return text
+
+async def _gemini_vision(gemini, model: str, image, context: str) -> str:
+    prompt = f"Analyze this wardrobe/outfit image. Describe the clothing items, colors, style, and how they work together. Be specific. {context}"
+    
+    async with provider_slot("gemini"):
+        response = await gemini.aio.models.generate_content(
+            model=model,
+            contents=[prompt, types.Part.from_bytes(data=image.jpeg_bytes, mime_type="image/jpeg")]
+        )
+    record_usage(response)
+    record_quality(1.0 if response.text and response.text.strip() else 0.0)
+    return response.text
+
+async def _openai_vision(client, model: str, image_url: str, context: str) -> str:
+    async with provider_slot("openai"):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": f"Analyze this wardrobe image. List clothing items, colors, and styles. {context}"},
+                    {"type": "image_url", "image_url": {"url": image_url}}
+                ]
+            }]
+        )
+    record_usage(response)
+    text = response.choices[0].message.content
+    record_quality(1.0 if text and text.strip() else 0.0)
+    return text
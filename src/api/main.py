@@ -6,24 +6,46 @@ Provides REST API for frontend communication and Prometheus metrics endpoint.
 
 Endpoints:
 - POST /api/chat: Send message to multi-agent system
+- POST /api/chat/stream: Same as /api/chat, streamed as Server-Sent Events
 - GET /api/history: Retrieve conversation history
 - POST /api/clear: Clear conversation and start new session
+- GET /api/images/{hash}: Generated outfit image from the blob store
+- GET /api/jobs/{job_id}: Status of a background outfit image job
+- GET /api/jobs/{job_id}/events: Server-Sent Events stream that reports when the job finishes
+- GET /api/usage: Token usage and estimated cost per agent and model, plus the
+  session's usage and budget when X-Session-ID is sent
+- GET /api/tiers: Model tier policy per agent, with latency and quality per tier
 - GET /api/health: Health check
 - GET /metrics: Prometheus metrics for Grafana
+
+Conversation endpoints are keyed by the X-Session-ID header. /api/chat
+creates a session when the header is missing and returns its ID.
+Every chat response carries a `trace_id` (also the X-Trace-ID header) naming
+the request's trace; see src/utils/tracing.py for exporting its spans.
+Messages carry a per-session `seq`; clients send the last one they have
+(`since` on /api/chat, `after`/`before` on /api/history) and receive only
+newer or older messages instead of the whole conversation.
+
+With SESSION_BACKEND=redis, sessions live in Redis and the app can run
+several workers (WEB_CONCURRENCY) and hosts; set PROMETHEUS_MULTIPROC_DIR so
+/metrics aggregates every worker's metrics.
 """
 
-from fastapi import FastAPI, Response
+import asyncio
+import os
+import orjson
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
 import uvicorn
 from dotenv import load_dotenv
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-from ..utils.prometheus_metrics import user_sessions, messages_per_session
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 
 load_dotenv()
 
-app = FastAPI(title="RetailOdyssey", version="1.0.0")
+app = FastAPI(title="RetailOdyssey", version="1.0.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,45 +53,218 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-ID", "X-Trace-ID"],
 )
 
 from ..agents.group_chat_orchestrator import GroupChatOrchestrator
+from ..agents.imagegen_agent import close_image_jobs, get_image_jobs
+from .session_store import get_session_store, new_session_id, normalize_session_id
+from ..utils.job_queue import QUEUED, RUNNING, FAILED
+from ..utils.image_pipeline import close_http_client
+from ..utils.blob_store import get_blob_store
+from ..utils.tracing import close_tracing, new_trace_id, start_trace
+from ..providers.usage import Budget, get_usage_ledger, track_session
+from ..providers.tiers import get_tier_policy
+from .. import providers
+from ..catalog import get_catalog
+
+sessions = get_session_store(GroupChatOrchestrator)
+
+@app.on_event("startup")
+async def startup():
+    # Open provider connections before the first user request pays for TLS setup
+    await providers.warm_up()
+    # Index the product catalog (if configured) now rather than on the first recommendation
+    await asyncio.to_thread(get_catalog)
+    # Job status lives with the sessions, so any worker can answer /api/jobs
+    get_image_jobs().listeners.append(sessions.record_job)
 
-orchestrator = GroupChatOrchestrator()
-session_message_count = 0
+@app.on_event("shutdown")
+async def shutdown():
+    await close_image_jobs()
+    await sessions.close()
+    await close_http_client()
+    await providers.close()
+    close_tracing()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
 
 class ChatRequest(BaseModel):
     message: str
     image_url: Optional[str] = None
+    # Last message seq the client has; defaults to everything before this turn
+    since: Optional[int] = None
 
 @app.post("/api/chat")
-async def chat(request: ChatRequest):
-    global session_message_count
-    session_message_count += 1
+async def chat(request: ChatRequest, response: Response, x_session_id: Optional[str] = Header(None)):
+    session_id = normalize_session_id(x_session_id) or new_session_id()
+    response.headers["X-Session-ID"] = session_id
     
-    agent_conversation = await orchestrator.process_message(request.message, request.image_url)
+    with start_trace("POST /api/chat", session_id=session_id) as trace:
+        response.headers["X-Trace-ID"] = trace.trace_id
+        async with sessions.open(session_id) as session:
+            session.message_count += 1
+            orchestrator = session.orchestrator
+            since = request.since if request.since is not None else orchestrator.last_seq
+            with track_session(session.usage):
+                agent_conversation = await orchestrator.process_message(request.message, request.image_url)
+            conversation = orchestrator.get_conversation_history(after=since)
     
     return {
+        "session_id": session_id,
+        "trace_id": trace.trace_id,
         "responses": agent_conversation,
-        "conversation": orchestrator.get_conversation_history()
+        "conversation": conversation,
+        "last_seq": orchestrator.last_seq
     }
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, x_session_id: Optional[str] = Header(None)):
+    """
+    Streams the agent conversation as Server-Sent Events:
+    agent_start, delta (token chunks), message (each agent's final response),
+    then done (or error). Disconnecting cancels the remaining agents.
+    """
+    session_id = normalize_session_id(x_session_id) or new_session_id()
+    trace_id = new_trace_id()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def run_turn():
+        try:
+            with start_trace("POST /api/chat/stream", trace_id=trace_id, session_id=session_id):
+                async with sessions.open(session_id) as session:
+                    session.message_count += 1
+                    with track_session(session.usage):
+                        agent_conversation = await session.orchestrator.process_message(
+                            request.message, request.image_url, on_event=queue.put_nowait)
+            queue.put_nowait({"event": "done", "session_id": session_id, "trace_id": trace_id,
+                              "responses": agent_conversation})
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            queue.put_nowait({"event": "error", "message": "Agent conversation failed"})
+        finally:
+            queue.put_nowait(None)
+    
+    async def event_source():
+        task = asyncio.create_task(run_turn())
+        try:
+            yield b"event: session\ndata: " + orjson.dumps({"session_id": session_id, "trace_id": trace_id}) + b"\n\n"
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield b"event: " + event["event"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+        finally:
+            if not task.done():
+                task.cancel()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"X-Session-ID": session_id, "X-Trace-ID": trace_id, "Cache-Control": "no-cache",
+                 "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/history")
-async def get_history():
-    return {"conversation": orchestrator.get_conversation_history()}
+async def get_history(x_session_id: Optional[str] = Header(None), after: Optional[int] = None,
+                      before: Optional[int] = None, limit: int = Query(50, ge=1, le=200)):
+    session_id = normalize_session_id(x_session_id)
+    session = await sessions.get(session_id) if session_id else None
+    if session is None:
+        return {"conversation": [], "last_seq": 0, "has_more": False}
+    # Fetch one extra message to learn whether another page exists
+    page = session.orchestrator.get_conversation_history(after=after, before=before, limit=limit + 1)
+    has_more = len(page) > limit
+    if has_more:
+        page = page[1:] if before is not None and after is None else page[:limit]
+    return {"conversation": page, "last_seq": session.orchestrator.last_seq, "has_more": has_more}
 
 @app.post("/api/clear")
-async def clear_history():
-    global session_message_count
+async def clear_history(x_session_id: Optional[str] = Header(None)):
+    session_id = normalize_session_id(x_session_id)
+    if session_id:
+        await sessions.end(session_id)
+    return {"status": "cleared"}
+
+@app.get("/api/images/{digest}")
+async def get_image(digest: str, if_none_match: Optional[str] = Header(None)):
+    blob = get_blob_store().get(digest)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Content-addressed: the URL never changes meaning, so caches may keep it forever
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(blob.path, media_type=blob.mime_type, headers=headers)
+
+async def _job_status(job_id: str) -> Optional[dict]:
+    # Jobs run on the worker that accepted the turn; others read the status mirrored to the session store
+    job = get_image_jobs().get(job_id)
+    return job.to_dict() if job is not None else await sessions.load_job(job_id)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    status = await _job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Streams the job's current status, then one `done` or `failed` event when
+    it finishes (immediately if it already has). Comments keep idle proxies
+    from closing the connection while the image renders.
+    """
+    status = await _job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    # Track session metrics
-    if session_message_count > 0:
-        messages_per_session.observe(session_message_count)
-        user_sessions.inc()
+    async def event_source():
+        nonlocal status
+        yield b"event: status\ndata: " + orjson.dumps(status) + b"\n\n"
+        while status["status"] in (QUEUED, RUNNING):
+            job = get_image_jobs().get(job_id)
+            if job is not None:
+                await job.wait(timeout=15)
+                status = job.to_dict()
+            else:
+                # Running on another worker: poll the mirrored status
+                await asyncio.sleep(1)
+                status = await sessions.load_job(job_id) or {**status, "status": FAILED, "error": "expired"}
+            if status["status"] in (QUEUED, RUNNING):
+                yield b": keep-alive\n\n"
+        yield b"event: " + status["status"].encode() + b"\ndata: " + orjson.dumps(status) + b"\n\n"
     
-    orchestrator.clear_history()
-    session_message_count = 0
-    return {"status": "cleared"}
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/usage")
+async def get_usage(x_session_id: Optional[str] = Header(None)):
+    """
+    Tokens and estimated spend since this worker started, per agent and model
+    (Prometheus has the totals across workers), plus the session's own usage
+    and budget state when X-Session-ID names a live session.
+    """
+    usage = get_usage_ledger().report()
+    session_id = normalize_session_id(x_session_id)
+    session = await sessions.get(session_id) if session_id else None
+    if session is not None:
+        usage["session"] = {"session_id": session_id, **session.usage.to_dict(),
+                            "budget": Budget.from_env().to_dict(session.usage)}
+    return usage
+
+@app.get("/api/tiers")
+async def get_tiers():
+    """
+    The model tier policy (tiers, each agent's candidates and latency SLO, A/B
+    experiments) and, per agent and model, this worker's call count, recent
+    p50/p95 latency, share of calls within the SLO and mean reply quality.
+    """
+    return get_tier_policy().report()
 
 @app.get("/api/health")
 async def health():
@@ -78,7 +273,22 @@ async def health():
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint for Grafana"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Every worker writes its own files; aggregate them so any worker reports the whole host
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1 and os.getenv("SESSION_BACKEND", "memory") == "memory":
+        print("Warning: in-memory sessions aren't shared between workers; set SESSION_BACKEND=redis")
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        # Stale files from a previous run would be summed into the new one
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+    uvicorn.run("src.api.main:app", host="0.0.0.0", port=8000, workers=workers)
@@ -0,0 +1,282 @@
+"""
+Session Store for Retail Odyssey
+
+Keeps one GroupChatOrchestrator per shopper, keyed by session ID, so no two
+users ever share conversation state. SESSION_BACKEND picks where it lives:
+
+memory (default) - live orchestrators in this process; run a single worker
+- LRU ordering: every access moves a session to the most-recent end
+- TTL eviction: idle sessions expire after SESSION_TTL_SECONDS (default 1800)
+- Memory cap: at most MAX_SESSIONS live sessions (default 5000), oldest idle evicted first
+  (sessions with a turn in flight are never evicted)
+- Per-session asyncio.Lock so concurrent requests for one session never interleave
+
+redis - sessions serialized in Redis (REDIS_URL), so any worker or host can serve any session
+- Compact format: orjson of the orchestrator's exported state (plus the
+  session's token usage, so budgets hold across workers), zlib-compressed
+  past SESSION_COMPRESS_BYTES (default 1024); wardrobe embeddings are rebuilt on load
+- Keys expire after SESSION_TTL_SECONDS of inactivity
+- A Redis lock per session (held up to SESSION_LOCK_SECONDS, default 180)
+  serializes turns across workers
+- Background updates (summaries, finished images) are applied under the same lock
+- Image job status is mirrored so /api/jobs works on every worker
+"""
+
+import asyncio
+import os
+import re
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import orjson
+
+from ..providers.usage import SessionUsage
+from ..utils.job_queue import Job
+from ..utils.prometheus_metrics import user_sessions, messages_per_session, active_sessions
+from ..utils.tracing import span
+
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+# First byte of a stored session: plain JSON starts with "{", compressed JSON with this marker
+_COMPRESSED = b"\x01"
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+def normalize_session_id(session_id: Optional[str]) -> Optional[str]:
+    """Returns the session ID if it is well formed, otherwise None."""
+    if session_id and _SESSION_ID_PATTERN.match(session_id):
+        return session_id
+    return None
+
+class Session:
+    __slots__ = ("orchestrator", "lock", "last_seen", "message_count", "usage")
+
+    def __init__(self, orchestrator):
+        self.orchestrator = orchestrator
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+        self.message_count = 0
+        self.usage = SessionUsage()
+
+def encode_session(session: Session, compress_bytes: int = 1024) -> bytes:
+    data = orjson.dumps({"count": session.message_count, "usage": session.usage.to_dict(),
+                         **session.orchestrator.export_state()})
+    if len(data) >= compress_bytes:
+        return _COMPRESSED + zlib.compress(data, 6)
+    return data
+
+def decode_session(data: bytes, factory: Callable) -> Session:
+    if data[:1] == _COMPRESSED:
+        data = zlib.decompress(data[1:])
+    state = orjson.loads(data)
+    session = Session(factory())
+    session.message_count = state.pop("count")
+    session.usage = SessionUsage.from_dict(state.pop("usage", None))
+    session.orchestrator.restore_state(state)
+    return session
+
+def _record_end(session: Session) -> None:
+    if session.message_count > 0:
+        messages_per_session.observe(session.message_count)
+        user_sessions.inc()
+
+def _close(session: Session) -> None:
+    """Ends a session for good: records its metrics and stops its pending summary and queued image jobs."""
+    _record_end(session)
+    session.orchestrator.clear_history()
+
+class SessionStore:
+    """
+    Interface shared by the backends. `open` yields the session for one turn,
+    holding its lock and persisting it afterwards; `get` is a read-only view.
+    """
+
+    def open(self, session_id: str) -> AsyncIterator[Session]:
+        raise NotImplementedError
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    async def end(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def record_job(self, job: Job) -> None:
+        """Makes a background job's status visible to other workers (no-op in process)."""
+
+    async def load_job(self, job_id: str) -> Optional[Dict]:
+        return None
+
+    async def close(self) -> None:
+        pass
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, factory: Callable, max_sessions: int = None, ttl_seconds: float = None):
+        self._factory = factory
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.max_sessions = max_sessions or int(os.getenv("MAX_SESSIONS", "5000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_or_create(self, session_id: str) -> Session:
+        now = time.monotonic()
+        self._evict_expired(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(self._factory())
+            self._sessions[session_id] = session
+            if len(self._sessions) > self.max_sessions:
+                self._evict_oldest(len(self._sessions) - self.max_sessions, keep=session_id)
+            active_sessions.set(len(self._sessions))
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_seen = now
+        return session
+
+    @asynccontextmanager
+    async def open(self, session_id: str) -> AsyncIterator[Session]:
+        session = self.get_or_create(session_id)
+        # Waiting here means another request for this session is still running
+        with span("session.lock", backend="memory"):
+            await session.lock.acquire()
+        try:
+            yield session
+        finally:
+            session.lock.release()
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        self._evict_expired(time.monotonic())
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            session.last_seen = time.monotonic()
+        return session
+
+    async def end(self, session_id: str) -> None:
+        """Records session metrics, stops its background work and frees the session."""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            _close(session)
+            active_sessions.set(len(self._sessions))
+
+    def _evict_oldest(self, count: int, keep: str) -> None:
+        # Sessions with a turn in flight are skipped, so the cap can be exceeded until they finish
+        idle = list(islice((sid for sid, session in self._sessions.items() if sid != keep and not session.lock.locked()), count))
+        for sid in idle:
+            _close(self._sessions.pop(sid))
+
+    def _evict_expired(self, now: float) -> None:
+        # Sessions are kept in access order, so expired ones sit at the front
+        evicted = False
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen < self.ttl_seconds or session.lock.locked():
+                break
+            del self._sessions[session_id]
+            _close(session)
+            evicted = True
+        if evicted:
+            active_sessions.set(len(self._sessions))
+
+class RedisSessionStore(SessionStore):
+    def __init__(self, factory: Callable, url: str = None, ttl_seconds: float = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        self._redis = client
+        self._factory = factory
+        self.ttl_seconds = int(ttl_seconds or float(os.getenv("SESSION_TTL_SECONDS", "1800")))
+        self.lock_seconds = float(os.getenv("SESSION_LOCK_SECONDS", "180"))
+        self.compress_bytes = int(os.getenv("SESSION_COMPRESS_BYTES", "1024"))
+        self.job_ttl_seconds = int(float(os.getenv("IMAGE_GEN_JOB_TTL_SECONDS", "3600")))
+        self.prefix = os.getenv("SESSION_KEY_PREFIX", "retail_odyssey:")
+        # Fire-and-forget writes, referenced until they finish
+        self._background = set()
+
+    def _key(self, kind: str, name: str) -> str:
+        return f"{self.prefix}{kind}:{name}"
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @asynccontextmanager
+    async def _locked(self, session_id: str):
+        # Outlives the longest turn; if a worker dies mid-turn the lock expires on its own
+        async with self._redis.lock(self._key("lock", session_id), timeout=self.lock_seconds,
+                                    blocking_timeout=self.lock_seconds, thread_local=False):
+            yield
+
+    async def _load(self, session_id: str) -> Optional[Session]:
+        data = await self._redis.get(self._key("session", session_id))
+        return decode_session(data, self._factory) if data else None
+
+    async def _save(self, session_id: str, session: Session):
+        await self._redis.set(self._key("session", session_id), encode_session(session, self.compress_bytes),
+                              ex=self.ttl_seconds)
+
+    def _bind(self, session_id: str, session: Session) -> Session:
+        session.orchestrator.apply_later = lambda update: self._spawn(self._apply(session_id, update))
+        return session
+
+    @asynccontextmanager
+    async def open(self, session_id: str) -> AsyncIterator[Session]:
+        async with AsyncExitStack() as stack:
+            with span("session.load", backend="redis"):
+                await stack.enter_async_context(self._locked(session_id))
+                session = await self._load(session_id) or Session(self._factory())
+            try:
+                yield self._bind(session_id, session)
+            finally:
+                # Saved even if the turn failed or the client went away, like the in-memory state would be
+                with span("session.save", backend="redis"):
+                    await asyncio.shield(self._save(session_id, session))
+
+    async def _apply(self, session_id: str, update: Callable):
+        try:
+            async with self._locked(session_id):
+                session = await self._load(session_id)
+                if session is None:
+                    return  # cleared or expired meanwhile
+                update(self._bind(session_id, session).orchestrator)
+                await self._save(session_id, session)
+        except Exception as e:
+            print(f"Session store: background update for {session_id} failed: {e!r}")
+
+    async def get(self, session_id: str) -> Optional[Session]:
+        session = await self._load(session_id)
+        return self._bind(session_id, session) if session else None
+
+    async def end(self, session_id: str) -> None:
+        # Under the session lock, so a turn in flight can't save the session back afterwards
+        async with self._locked(session_id):
+            session = await self._load(session_id)
+            if session is not None:
+                await self._redis.delete(self._key("session", session_id))
+                # Cancels its image jobs still queued on this worker; others are dropped when they report back
+                _close(session)
+
+    def record_job(self, job: Job) -> None:
+        self._spawn(self._redis.set(self._key("job", job.id), orjson.dumps(job.to_dict()), ex=self.job_ttl_seconds))
+
+    async def load_job(self, job_id: str) -> Optional[Dict]:
+        data = await self._redis.get(self._key("job", job_id))
+        return orjson.loads(data) if data else None
+
+    async def close(self) -> None:
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self._redis.aclose()
+
+def get_session_store(factory: Callable) -> SessionStore:
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisSessionStore(factory)
+    return MemorySessionStore(factory)
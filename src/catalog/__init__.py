@@ -0,0 +1,66 @@
+"""
+Local Frasers product catalog
+
+Grounds RecommendationAgent in a product feed instead of (or as well as)
+live Google Search. The feed is loaded once from CATALOG_PATH (CSV or JSONL,
+see products.py) into an in-memory index (index.py); a sample feed for
+offline use ships in data/catalog/frasers_sample.csv.
+
+RECOMMENDATION_GROUNDING selects the source:
+- catalog: retrieved products only, no web search (default when CATALOG_PATH is set)
+- search: Google Search grounding only (default otherwise)
+- both: retrieved products as context plus Google Search
+
+CATALOG_EMBEDDINGS_PATH (optional, .npy) caches the dense product item
+vectors used for wardrobe matching: they are saved after indexing and
+memory-mapped on later starts while the file is newer than the feed.
+"""
+
+import os
+import time
+from typing import Optional
+
+from src.catalog.products import CatalogQuery, Product, load_products, parse_price_range
+from src.catalog.index import ProductCatalog
+from src.catalog.wardrobe import WardrobeItem, describe_items, extract_wardrobe_items
+from src.utils.embedding_store import EmbeddingStore
+
+_catalog: Optional[ProductCatalog] = None
+_loaded = False
+
+def get_catalog() -> Optional[ProductCatalog]:
+    """Returns the shared catalog, or None when CATALOG_PATH isn't set."""
+    global _catalog, _loaded
+    if not _loaded:
+        _loaded = True
+        path = os.getenv("CATALOG_PATH")
+        if path:
+            started = time.perf_counter()
+            vectors_path = os.getenv("CATALOG_EMBEDDINGS_PATH")
+            saved = None
+            if vectors_path and os.path.exists(vectors_path) and os.path.getmtime(vectors_path) >= os.path.getmtime(path):
+                saved = EmbeddingStore.open(vectors_path)
+            _catalog = ProductCatalog(load_products(path), saved)
+            if vectors_path and _catalog.item_vectors is not saved:
+                os.makedirs(os.path.dirname(vectors_path) or ".", exist_ok=True)
+                _catalog.item_vectors.save(vectors_path)
+            print(f"Catalog: indexed {len(_catalog)} products from {path} in {time.perf_counter() - started:.2f}s")
+    return _catalog
+
+def grounding_mode() -> str:
+    default = "catalog" if os.getenv("CATALOG_PATH") else "search"
+    mode = os.getenv("RECOMMENDATION_GROUNDING", default).lower()
+    return mode if mode in ("catalog", "search", "both") else default
+
+__all__ = [
+    "CatalogQuery",
+    "Product",
+    "ProductCatalog",
+    "WardrobeItem",
+    "describe_items",
+    "extract_wardrobe_items",
+    "load_products",
+    "parse_price_range",
+    "get_catalog",
+    "grounding_mode",
+]
@@ -0,0 +1,149 @@
+"""
+In-memory product index for the local Frasers catalog
+
+- Inverted index: facet terms (occasion:, style:, brand:, category:, colour:)
+  map to boolean masks over the catalog; words map to sorted posting arrays
+- Vector index: one L2-normalized hashed embedding per product
+  (src/utils/text_embedding.py), stored sparse and dimension-major (like a
+  CSC matrix): a query only touches the rows under its own non-zero dimensions
+- Item vectors: the same embeddings folded into a dense EmbeddingStore
+  (src/utils/embedding_store.py) for wardrobe matching; match_items() scores
+  every wardrobe item against every product in one matrix product
+- Prices in a parallel array, so price filters are one vectorized comparison
+
+search() narrows candidates with the facets and price range, then ranks them
+by cosine similarity plus a bonus per query word the product contains.
+Occasion/style tags are partly inferred, so if too few products match, the
+style filter and then the occasion filter are relaxed; price limits never are.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.catalog.products import CatalogQuery, Product, tokenize
+from src.utils.embedding_store import EmbeddingStore, fold_sparse
+from src.utils.text_embedding import EMBEDDING_DIM, embed_sparse
+
+# Score added per query word found in a product, on top of cosine similarity
+KEYWORD_BONUS = 0.1
+
+class ProductCatalog:
+    def __init__(self, products: Iterable[Product], item_vectors: Optional[EmbeddingStore] = None):
+        """`item_vectors` reuses a saved (memory-mapped) item matrix when its row count matches."""
+        self.products: List[Product] = list(products)
+        count = len(self.products)
+        self.prices = np.array([p.price for p in self.products], dtype=np.float32)
+
+        facets: Dict[str, List[int]] = defaultdict(list)
+        words: Dict[str, List[int]] = defaultdict(list)
+        rows: List[int] = []
+        dims: List[int] = []
+        weights: List[float] = []
+        for i, product in enumerate(self.products):
+            embedding = embed_sparse(product.search_text())
+            rows.extend([i] * len(embedding))
+            dims.extend(embedding.keys())
+            weights.extend(embedding.values())
+            terms = {f"brand:{product.brand.lower()}", f"category:{product.category}"}
+            terms.update(f"occasion:{o}" for o in product.occasions)
+            terms.update(f"style:{s}" for s in product.styles)
+            terms.update(f"colour:{c}" for c in product.colours)
+            for term in terms:
+                facets[term].append(i)
+            for word in set(tokenize(product.search_text())):
+                words[word].append(i)
+
+        self._facets: Dict[str, np.ndarray] = {}
+        for term, ids in facets.items():
+            mask = np.zeros(count, dtype=bool)
+            mask[ids] = True
+            self._facets[term] = mask
+        self._postings = {word: np.array(ids, dtype=np.int32) for word, ids in words.items()}
+
+        rows = np.array(rows, dtype=np.int32)
+        dims = np.array(dims, dtype=np.int32)
+        weights = np.array(weights, dtype=np.float32)
+        if item_vectors is not None and len(item_vectors) == count:
+            self.item_vectors = item_vectors
+        else:
+            self.item_vectors = EmbeddingStore.from_matrix(fold_sparse(rows, dims, weights, count))
+
+        order = np.argsort(dims, kind="stable")
+        self._vector_rows = rows[order]
+        self._vector_weights = weights[order]
+        self._dim_starts = np.searchsorted(dims[order], np.arange(EMBEDDING_DIM + 1))
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    @property
+    def vector_index_bytes(self) -> int:
+        return self._vector_rows.nbytes + self._vector_weights.nbytes + self._dim_starts.nbytes
+
+    def _mask(self, query: CatalogQuery, occasion: bool, style: bool) -> np.ndarray:
+        mask = np.ones(len(self.products), dtype=bool)
+        if query.min_price is not None:
+            mask &= self.prices >= query.min_price
+        if query.max_price is not None:
+            mask &= self.prices <= query.max_price
+        empty = np.zeros(len(self.products), dtype=bool)
+        if occasion and query.occasion:
+            mask &= self._facets.get(f"occasion:{query.occasion}", empty)
+        if style and query.style:
+            mask &= self._facets.get(f"style:{query.style}", empty)
+        return mask
+
+    def _scores(self, text: str) -> np.ndarray:
+        """Cosine similarity to `text` plus keyword bonuses, for every product."""
+        rows, weights = [], []
+        for dim, query_weight in embed_sparse(text).items():
+            start, end = self._dim_starts[dim], self._dim_starts[dim + 1]
+            rows.append(self._vector_rows[start:end])
+            weights.append(self._vector_weights[start:end] * query_weight)
+        if rows:
+            scores = np.bincount(np.concatenate(rows), np.concatenate(weights), minlength=len(self.products))
+        else:
+            scores = np.zeros(len(self.products))
+        for word in set(tokenize(text)):
+            postings = self._postings.get(word)
+            if postings is not None:
+                scores[postings] += KEYWORD_BONUS
+        return scores
+
+    def search(self, query: CatalogQuery, k: int = 5) -> List[Product]:
+        """Returns up to `k` products matching the query's filters, best first."""
+        if not self.products:
+            return []
+        # Strictest filters first; relax the inferred facets if they leave too little
+        for occasion, style in ((True, True), (True, False), (False, False)):
+            candidates = np.flatnonzero(self._mask(query, occasion, style))
+            if len(candidates) >= k:
+                break
+        if len(candidates) == 0:
+            return []
+
+        scores = self._scores(query.text)[candidates]
+
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.products[candidates[i]] for i in top]
+
+    def match_items(self, vectors: np.ndarray, k: int = 1, query: Optional[CatalogQuery] = None) -> List[List[Product]]:
+        """
+        Closest `k` products for each wardrobe item embedding (rows of
+        `vectors`), scored in one batched matrix product. `query` applies its
+        price limits, so matches stay within the shopper's budget.
+        """
+        if not self.products or len(vectors) == 0:
+            return [[] for _ in range(len(vectors))]
+        exclude = None
+        if query is not None and (query.min_price is not None or query.max_price is not None):
+            exclude = ~self._mask(query._replace(occasion=None, style=None), False, False)
+        indices, scores = self.item_vectors.top_k(vectors, k, exclude)
+        return [[self.products[i] for i, score in zip(row, row_scores) if score > 0]
+                for row, row_scores in zip(indices, scores)]
@@ -0,0 +1,166 @@
+"""
+Product records and feed ingestion for the local Frasers catalog
+
+Feeds are CSV (header row) or JSONL (one object per line) with the fields
+id, name, brand, price, category, url and colours; optional occasions and
+styles use the IntentAgent vocabulary. List fields are "|"-separated in CSV
+and arrays (or "|"-strings) in JSONL. Missing occasions/styles are inferred
+from the product name and category.
+"""
+
+import csv
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+STORES = {
+    "sportsdirect.com": "Sports Direct",
+    "houseoffraser.co.uk": "House of Fraser",
+    "flannels.com": "Flannels",
+    "usc.co.uk": "USC",
+    "jackwills.com": "Jack Wills",
+}
+
+OCCASIONS = ("casual", "formal", "business", "party", "date", "workout")
+STYLES = ("classic", "trendy", "minimalist", "bold")
+
+# Keyword -> occasions/styles, used when a feed doesn't tag products itself
+_OCCASION_HINTS = {
+    "suit": ("formal", "business"), "tie": ("formal", "business"), "blazer": ("business", "formal", "date"),
+    "derby": ("formal", "business"), "oxford": ("business", "formal"), "court": ("business", "formal"),
+    "overcoat": ("business", "formal"), "dress": ("party", "date"), "heel": ("party", "date", "formal"),
+    "sequin": ("party",), "silk": ("party", "date"), "satin": ("party", "date"),
+    "running": ("workout",), "training": ("workout",), "leggings": ("workout",), "dri-fit": ("workout",),
+    "shorts": ("casual", "workout"), "hoodie": ("casual",), "t-shirt": ("casual",), "jeans": ("casual",),
+    "trainers": ("casual",), "jumper": ("casual",), "polo": ("casual",), "gilet": ("casual",),
+    "chinos": ("casual", "business"), "jacket": ("casual",), "cargo": ("casual",),
+}
+_STYLE_HINTS = {
+    "tailored": ("classic",), "wool": ("classic",), "oxford": ("classic",), "cable": ("classic",),
+    "leather": ("classic",), "linen": ("minimalist",), "merino": ("minimalist",), "oversized": ("trendy",),
+    "graphic": ("trendy",), "cargo": ("trendy",), "platform": ("trendy",), "printed": ("bold",),
+    "sequin": ("bold",), "puffer": ("bold",), "floral": ("trendy",),
+}
+
+_WORD = re.compile(r"[a-z0-9&'-]+")
+
+class Product(NamedTuple):
+    id: str
+    name: str
+    brand: str
+    price: float
+    category: str
+    url: str
+    colours: Tuple[str, ...]
+    occasions: Tuple[str, ...]
+    styles: Tuple[str, ...]
+    store: str
+
+    def search_text(self) -> str:
+        return " ".join([self.name, self.brand, self.category, *self.colours, *self.occasions, *self.styles])
+
+    def prompt_line(self) -> str:
+        colours = f" ({', '.join(self.colours)})" if self.colours else ""
+        return f"- {self.name} by {self.brand}, £{self.price:.2f}{colours} at {self.store}: {self.url}"
+
+    def to_dict(self) -> Dict:
+        return {**self._asdict(), "colours": list(self.colours), "occasions": list(self.occasions),
+                "styles": list(self.styles)}
+
+class CatalogQuery(NamedTuple):
+    text: str
+    occasion: Optional[str] = None
+    style: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    # Session wardrobe item embeddings (rows of an EmbeddingStore), matched against the catalog too
+    wardrobe: Optional["np.ndarray"] = None
+
+    @classmethod
+    def from_request(cls, text: str, occasion: Optional[str] = None, style: Optional[str] = None,
+                     wardrobe: Optional["np.ndarray"] = None) -> "CatalogQuery":
+        """Builds a query from the shopper's message and intent, reading price limits from the text."""
+        min_price, max_price = parse_price_range(text)
+        return cls(text, occasion if occasion in OCCASIONS else None, style if style in STYLES else None,
+                   min_price, max_price, wardrobe)
+
+_AMOUNT = r"(\d+(?:\.\d{1,2})?)"
+_CURRENCY_WORD = r"\s?(?:pounds?|quid)\b"
+# A price needs a currency: "£50", "$50", "50 pounds", "50 quid" (not "up to 6 friends" or "over 18s")
+_PRICE = rf"(?:[£$€]\s?{_AMOUNT}|{_AMOUNT}{_CURRENCY_WORD})"
+_PRICE_BETWEEN = re.compile(rf"(?:between\s+)?[£$€]?\s?{_AMOUNT}\s*(?:-|to|and)\s*[£$€]?\s?{_AMOUNT}(?:{_CURRENCY_WORD})?",
+                            re.IGNORECASE)
+_PRICE_MAX = re.compile(rf"(?:under|below|less than|up to|max(?:imum)?|budget(?: of)?|no more than)\s+{_PRICE}", re.IGNORECASE)
+_PRICE_MIN = re.compile(rf"(?:over|above|more than|at least|from)\s+{_PRICE}", re.IGNORECASE)
+_CURRENCY = re.compile(rf"[£$€]|{_CURRENCY_WORD}", re.IGNORECASE)
+
+def _amount(match: Optional[re.Match]) -> Optional[float]:
+    if match is None:
+        return None
+    return float(match.group(1) or match.group(2))
+
+def parse_price_range(text: str) -> Tuple[Optional[float], Optional[float]]:
+    """(min, max) price limits in the shopper's message; only amounts with a currency count."""
+    between = _PRICE_BETWEEN.search(text)
+    if between and _CURRENCY.search(between.group(0)):
+        low, high = sorted((float(between.group(1)), float(between.group(2))))
+        return low, high
+    return _amount(_PRICE_MIN.search(text)), _amount(_PRICE_MAX.search(text))
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+def _split(value) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    items = value if isinstance(value, list) else str(value).split("|")
+    return tuple(item.strip().lower() for item in items if item and item.strip())
+
+def _infer(text: str, hints: Dict[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    found: List[str] = []
+    for word in tokenize(text):
+        for tag in hints.get(word, ()) or hints.get(word.rstrip("s"), ()):
+            if tag not in found:
+                found.append(tag)
+    return tuple(found)
+
+def make_product(row: Dict) -> Product:
+    url = row["url"].strip()
+    domain = urlparse(url).netloc.lower().removeprefix("www.")
+    name = row["name"].strip()
+    category = (row.get("category") or "").strip().lower()
+    described = f"{name} {category}"
+    return Product(
+        id=str(row.get("id") or url),
+        name=name,
+        brand=(row.get("brand") or "").strip(),
+        price=float(row["price"]),
+        category=category,
+        url=url,
+        colours=_split(row.get("colours")),
+        occasions=_split(row.get("occasions")) or _infer(described, _OCCASION_HINTS),
+        styles=_split(row.get("styles")) or _infer(described, _STYLE_HINTS),
+        store=STORES.get(domain, domain),
+    )
+
+def read_feed(path) -> Iterable[Dict]:
+    path = Path(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def load_products(path) -> List[Product]:
+    """Parses a CSV/JSONL feed, skipping rows without a name, URL or valid price."""
+    products = []
+    for line_number, row in enumerate(read_feed(path), start=1):
+        try:
+            products.append(make_product(row))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Catalog: skipping row {line_number} of {path}: {e!r}")
+    return products
@@ -0,0 +1,77 @@
+"""
+Structured wardrobe items parsed from VisionAgent descriptions
+
+VisionAgent answers in prose ("a navy linen blazer over a white oxford shirt
+with dark slim jeans"). extract_wardrobe_items() pulls out each garment with
+the colour and style/material words in front of it, so the session keeps a
+short item list (and its embeddings) instead of re-sending the whole text.
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+# Garment word -> canonical type; plurals are folded by stripping a trailing "s"
+GARMENTS = {
+    "blazer": "blazer", "jacket": "jacket", "coat": "coat", "overcoat": "coat", "trench": "coat",
+    "parka": "coat", "puffer": "jacket", "gilet": "gilet", "cardigan": "cardigan", "jumper": "jumper",
+    "sweater": "jumper", "knit": "jumper", "hoodie": "hoodie", "sweatshirt": "sweatshirt",
+    "shirt": "shirt", "blouse": "blouse", "t-shirt": "t-shirt", "tee": "t-shirt",
+    "polo": "polo", "vest": "vest", "dress": "dress", "skirt": "skirt", "jeans": "jeans",
+    "trousers": "trousers", "chinos": "chinos", "joggers": "joggers", "leggings": "leggings",
+    "shorts": "shorts", "suit": "suit", "waistcoat": "waistcoat", "trainers": "trainers",
+    "sneakers": "trainers", "boots": "boots", "boot": "boots", "loafers": "loafers", "heels": "heels",
+    "sandals": "sandals", "shoes": "shoes", "derbies": "shoes", "brogues": "shoes", "scarf": "scarf",
+    "hat": "hat", "cap": "cap", "beanie": "hat", "bag": "bag", "belt": "belt", "tie": "tie",
+}
+COLOURS = {
+    "black", "white", "grey", "gray", "navy", "blue", "light-blue", "red", "burgundy", "maroon", "pink",
+    "green", "olive", "khaki", "beige", "cream", "camel", "tan", "brown", "chocolate", "yellow", "mustard",
+    "orange", "purple", "lilac", "silver", "gold", "charcoal", "ivory", "teal", "dark", "light",
+}
+STYLE_WORDS = {
+    "linen", "oxford", "denim", "leather", "suede", "wool", "merino", "cashmere", "cotton", "silk", "satin", "knitted",
+    "cable-knit", "oversized", "slim", "skinny", "straight", "wide-leg", "cropped", "tailored", "fitted",
+    "relaxed", "casual", "formal", "smart", "sporty", "vintage", "floral", "striped", "checked", "plaid",
+    "graphic", "printed", "plain", "quilted", "chelsea", "chunky", "high-waisted", "sequin", "pleated",
+}
+
+# Clauses end at punctuation and conjunctions, so "navy blazer and white shirt" doesn't give the shirt "navy"
+_CLAUSE = re.compile(r"[,.;:!?()\n]|\b(?:and|with|over|under|or|plus|paired)\b", re.IGNORECASE)
+_WORD = re.compile(r"[a-z]+(?:-[a-z]+)*")
+# Words in front of a garment searched for its colour and style
+_LOOKBACK = 4
+
+class WardrobeItem(NamedTuple):
+    type: str
+    colour: Optional[str] = None
+    style: Optional[str] = None
+
+    def describe(self) -> str:
+        return " ".join(part for part in (self.colour, self.style, self.type) if part)
+
+def _garment(word: str) -> Optional[str]:
+    return GARMENTS.get(word) or (GARMENTS.get(word[:-1]) if word.endswith("s") else None)
+
+def extract_wardrobe_items(text: str) -> List[WardrobeItem]:
+    """Garments mentioned in `text`, in order, each with the nearest preceding colour and style word."""
+    items: List[WardrobeItem] = []
+    seen = set()
+    for clause in _CLAUSE.split(text.lower()):
+        words = _WORD.findall(clause)
+        for i, word in enumerate(words):
+            garment = _garment(word)
+            # "cable-knit jumper", "polo shirt": a garment word used as a modifier isn't an item itself
+            if not garment or (i + 1 < len(words) and _garment(words[i + 1])):
+                continue
+            window = words[max(0, i - _LOOKBACK):i]
+            colour = next((w for w in reversed(window) if w in COLOURS), None)
+            style = next((w for w in reversed(window) if w in STYLE_WORDS), None)
+            item = WardrobeItem(garment, "grey" if colour == "gray" else colour, style)
+            if item not in seen:
+                seen.add(item)
+                items.append(item)
+    return items
+
+def describe_items(items: List[WardrobeItem]) -> str:
+    """Compact prompt form of a wardrobe: "navy linen blazer; white shirt; dark slim jeans"."""
+    return "; ".join(item.describe() for item in items)
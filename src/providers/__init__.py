@@ -0,0 +1,45 @@
+"""
+Provider clients for Retail Odyssey
+
+Every agent gets its model clients from here instead of building its own:
+one long-lived, pooled client per provider, created on first use or by
+`warm_up()` at startup, with per-provider concurrency limits and a
+latency-aware router (router.py) that picks, hedges and times out calls.
+PROVIDER_MOCK swaps in local mock clients (mock.py) for benchmarks and load tests.
+"""
+
+import asyncio
+import os
+
+from src.providers.gemini_client import get_gemini_client, warm_up_gemini, close_gemini
+from src.providers.openai_client import get_openai_client, warm_up_openai, close_openai
+from src.providers.limits import provider_slot, provider_limit
+from src.providers.router import ProviderRoute, NoProviderAvailable, get_router
+
+async def warm_up():
+    """Creates clients and opens their first connections so no chat pays for setup."""
+    if os.getenv("PROVIDER_WARMUP", "1") == "0":
+        return
+    results = await asyncio.gather(
+        asyncio.wait_for(warm_up_gemini(), 10),
+        asyncio.wait_for(warm_up_openai(), 10),
+        return_exceptions=True,
+    )
+    for provider, result in zip(("gemini", "openai"), results):
+        if isinstance(result, BaseException):
+            print(f"Provider warm-up failed for {provider}: {result}")
+
+async def close():
+    await asyncio.gather(close_gemini(), close_openai(), return_exceptions=True)
+
+__all__ = [
+    "get_gemini_client",
+    "get_openai_client",
+    "provider_slot",
+    "provider_limit",
+    "ProviderRoute",
+    "NoProviderAvailable",
+    "get_router",
+    "warm_up",
+    "close",
+]
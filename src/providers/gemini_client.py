@@ -0,0 +1,50 @@
+"""
+Gemini provider client
+
+One google-genai Client for the whole process. Every agent uses its async
+surface (`client.aio.models`), which shares a single pooled httpx client.
+With PROVIDER_MOCK=1 (or =gemini) a local mock client (mock.py) stands in.
+"""
+
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+from src.providers.http import async_client_args
+from src.providers.mock import MockGeminiClient, mock_enabled
+
+load_dotenv()
+
+_client: Optional[genai.Client] = None
+
+def get_gemini_client() -> Optional[genai.Client]:
+    global _client
+    if _client is None:
+        key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if mock_enabled("gemini"):
+            _client = MockGeminiClient()
+        elif key:
+            _client = genai.Client(
+                api_key=key,
+                http_options=types.HttpOptions(async_client_args=async_client_args()),
+            )
+    return _client
+
+async def warm_up_gemini():
+    """Opens a pooled connection (DNS, TLS, HTTP/2 handshake) before the first chat."""
+    client = get_gemini_client()
+    if client:
+        await client.aio.models.get(model="gemini-2.5-flash")
+
+async def close_gemini():
+    global _client
+    if _client is not None:
+        # The SDK has no public close(); release the pooled connections directly
+        api_client = getattr(_client.aio, "_api_client", None)
+        http_client = getattr(api_client, "_async_httpx_client", None)
+        if http_client is not None:
+            await http_client.aclose()
+        _client = None
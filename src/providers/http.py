@@ -0,0 +1,31 @@
+"""
+Shared HTTP settings for provider clients
+
+One keep-alive connection pool per provider, HTTP/2 when the `h2` package is
+installed (httpx[http2]), with pool limits tuned through:
+- PROVIDER_MAX_CONNECTIONS (default 100)
+- PROVIDER_MAX_KEEPALIVE (default 40)
+- PROVIDER_KEEPALIVE_EXPIRY seconds (default 120)
+"""
+
+import importlib.util
+import os
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("PROVIDER_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("PROVIDER_MAX_KEEPALIVE", "40")),
+        keepalive_expiry=float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "120")),
+    )
+
+def async_client_args() -> dict:
+    """Keyword arguments for a long-lived httpx.AsyncClient."""
+    return {
+        "http2": HTTP2_AVAILABLE,
+        "limits": pool_limits(),
+        "timeout": httpx.Timeout(120.0, connect=10.0),
+    }
@@ -0,0 +1,68 @@
+"""
+Per-provider concurrency limits for Retail Odyssey
+
+Every agent awaits its model call inside `provider_slot(<provider>)` so a
+single uvicorn worker can keep many chats in flight without flooding one
+upstream API. Limits are configurable via environment variables:
+- GEMINI_MAX_CONCURRENCY (default 64)
+- OPENAI_MAX_CONCURRENCY (default 64)
+
+Time spent waiting for a slot is recorded (retail_odyssey_provider_queue_seconds,
+plus a `provider.queue` span when the call actually had to wait).
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict
+
+from src.providers.telemetry import mark_sent
+from src.utils.prometheus_metrics import provider_queue_time
+from src.utils.tracing import span
+
+_DEFAULT_LIMITS = {
+    "gemini": 64,
+    "openai": 64,
+}
+
+class ProviderSlot:
+    """A provider's semaphore, timing how long each call waits for it."""
+
+    def __init__(self, provider: str, limit: int):
+        self.provider = provider
+        self.semaphore = asyncio.Semaphore(limit)
+
+    def locked(self) -> bool:
+        return self.semaphore.locked()
+
+    async def __aenter__(self):
+        waited = 0.0
+        if self.semaphore.locked():
+            started = time.perf_counter()
+            with span("provider.queue", provider=self.provider):
+                await self.semaphore.acquire()
+            waited = time.perf_counter() - started
+        else:
+            await self.semaphore.acquire()
+        provider_queue_time.labels(provider=self.provider).observe(waited)
+        mark_sent()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+_semaphores: Dict[str, ProviderSlot] = {}
+
+def provider_limit(provider: str) -> int:
+    env_value = os.getenv(f"{provider.upper()}_MAX_CONCURRENCY")
+    if env_value and env_value.isdigit() and int(env_value) > 0:
+        return int(env_value)
+    return _DEFAULT_LIMITS.get(provider, 32)
+
+def provider_slot(provider: str) -> ProviderSlot:
+    """Returns the shared slot (semaphore) bounding in-flight calls to `provider`."""
+    slot = _semaphores.get(provider)
+    if slot is None:
+        slot = ProviderSlot(provider, provider_limit(provider))
+        _semaphores[provider] = slot
+    return slot
@@ -0,0 +1,383 @@
+"""
+Mock provider clients for Retail Odyssey
+
+Stand-ins for the Gemini and OpenAI clients that answer locally, so the
+orchestrator and API can be load-tested and benchmarked without API keys or
+quota. They expose the same async surfaces the agents call
+(`client.aio.models.generate_content[_stream]`, `client.chat.completions.create`)
+and return real SDK response objects, so every agent code path runs unchanged:
+
+- Enabled with PROVIDER_MOCK=1 (both providers), or =gemini / =openai for one
+- Canned replies per agent: schema-valid intent JSON, wardrobe descriptions,
+  catalogue or grounded-search recommendations (Frasers URLs, prices and
+  grounding metadata with UTF-8 byte offsets, like the real API), summaries,
+  conversation and a small PNG for image generation
+- Latency is lognormal per agent: MOCK_LATENCY_<AGENT>=median[,sigma] in
+  seconds (INTENT, VISION, RECOMMENDATION, CONVERSATION, SUMMARY, IMAGE),
+  all scaled by MOCK_LATENCY_SCALE (default 1)
+- Streaming replies arrive in MOCK_STREAM_CHUNK_CHARS pieces (default 24), the
+  first after MOCK_TTFT_FRACTION of the sampled latency (default 0.3)
+- Failures: MOCK_ERROR_RATE (default 0), or MOCK_ERROR_RATE_GEMINI /
+  MOCK_ERROR_RATE_OPENAI per provider, raise MockProviderError part-way
+  through the call
+- MOCK_SEED makes latencies and failures reproducible: each call's draws are
+  seeded from the seed and its prompt, so they don't depend on scheduling order
+"""
+
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+from google.genai import types
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# (median seconds, sigma of the underlying normal)
+DEFAULT_LATENCIES = {
+    "intent": (0.4, 0.35),
+    "vision": (2.0, 0.4),
+    "recommendation": (2.5, 0.45),
+    "conversation": (1.0, 0.4),
+    "summary": (1.2, 0.35),
+    "image": (6.0, 0.3),
+}
+
+# 1x1 white PNG
+_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR4nGP4//8/AAX+Av4N70a4AAAAAElFTkSuQmCC"
+)
+
+# Canned grounded-search results: (product, price, store, URL)
+_GROUNDED_PRODUCTS = [
+    ("Slim Fit Oxford Shirt", "£24.99", "House of Fraser", "https://www.houseoffraser.co.uk/men/shirts/slim-fit-oxford-shirt"),
+    ("Stretch Chino Trousers", "£30.00", "Jack Wills", "https://www.jackwills.com/men/trousers/stretch-chino-trousers"),
+    ("Suede Chelsea Boots", "£65.00", "Flannels", "https://www.flannels.com/men/footwear/suede-chelsea-boots"),
+    ("Classic Leather Trainers", "£45.00", "Sports Direct", "https://www.sportsdirect.com/mens/trainers/classic-leather-trainers"),
+    ("Relaxed Denim Jacket", "£55.00", "USC", "https://www.usc.co.uk/men/jackets/relaxed-denim-jacket"),
+]
+
+_CATALOG_LINE = re.compile(r"^- (.+?) by (.+?), (£[\d.]+).*? at (.+?): (\S+)$", re.MULTILINE)
+_NEW_MESSAGE = re.compile(r"New message:\s*(.*?)(?:\n\n|$)", re.DOTALL)
+
+class MockProviderError(RuntimeError):
+    pass
+
+class Latency(NamedTuple):
+    median: float
+    sigma: float
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def mock_enabled(provider: str) -> bool:
+    setting = os.getenv("PROVIDER_MOCK", "").strip().lower()
+    return setting in ("1", "true", "all") or setting == provider
+
+class MockBehaviour:
+    """Latency, streaming and failure settings shared by both mock clients."""
+
+    def __init__(self):
+        self.scale = _env_float("MOCK_LATENCY_SCALE", 1.0)
+        self.ttft_fraction = _env_float("MOCK_TTFT_FRACTION", 0.3)
+        self.chunk_chars = max(1, int(_env_float("MOCK_STREAM_CHUNK_CHARS", 24)))
+        self.latencies: Dict[str, Latency] = {}
+        for kind, (median, sigma) in DEFAULT_LATENCIES.items():
+            setting = os.getenv(f"MOCK_LATENCY_{kind.upper()}")
+            if setting:
+                values = [float(value) for value in setting.split(",")]
+                median, sigma = values[0], values[1] if len(values) > 1 else sigma
+            self.latencies[kind] = Latency(median, sigma)
+        error_rate = _env_float("MOCK_ERROR_RATE", 0.0)
+        self.error_rates = {provider: _env_float(f"MOCK_ERROR_RATE_{provider.upper()}", error_rate)
+                            for provider in ("gemini", "openai")}
+        self.seed = os.getenv("MOCK_SEED")
+        self._random = random.Random()
+
+    def _rng(self, provider: str, kind: str, prompt: str) -> random.Random:
+        if self.seed is None:
+            return self._random
+        return random.Random(f"{self.seed}:{provider}:{kind}:{prompt}")
+
+    def sample_latency(self, kind: str, rng: random.Random) -> float:
+        latency = self.latencies[kind]
+        return latency.median * self.scale * rng.lognormvariate(0.0, latency.sigma)
+
+    async def wait(self, provider: str, kind: str, prompt: str) -> float:
+        """Sleeps for a sampled latency, or part of it and then fails; returns the latency."""
+        rng = self._rng(provider, kind, prompt)
+        latency = self.sample_latency(kind, rng)
+        if rng.random() < self.error_rates[provider]:
+            await asyncio.sleep(latency * rng.random())
+            raise MockProviderError(f"mock {provider} {kind} call failed")
+        await asyncio.sleep(latency)
+        return latency
+
+    async def stream_pieces(self, provider: str, kind: str, prompt: str, text: str) -> AsyncIterator[Tuple[str, bool]]:
+        """Yields (piece, is_last), spreading the sampled latency over time-to-first-token and the rest."""
+        rng = self._rng(provider, kind, prompt)
+        latency = self.sample_latency(kind, rng)
+        fail = rng.random() < self.error_rates[provider]
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        await asyncio.sleep(latency * self.ttft_fraction)
+        gap = latency * (1 - self.ttft_fraction) / len(pieces)
+        for i, piece in enumerate(pieces):
+            if fail and i >= len(pieces) // 2:
+                raise MockProviderError(f"mock {provider} {kind} stream broke off")
+            if i:
+                await asyncio.sleep(gap)
+            yield piece, i == len(pieces) - 1
+
+_behaviour: Optional[MockBehaviour] = None
+
+def get_mock_behaviour() -> MockBehaviour:
+    global _behaviour
+    if _behaviour is None:
+        _behaviour = MockBehaviour()
+    return _behaviour
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+# Canned replies
+
+def _intent_reply(prompt: str) -> str:
+    match = _NEW_MESSAGE.search(prompt)
+    text = (match.group(1) if match else prompt[-300:]).lower()
+    needs_image_gen = any(w in text for w in ("show", "visualize", "picture", "generate"))
+    needs_vision = "this look" in text or "my wardrobe" in text
+    needs_recommendation = any(w in text for w in ("recommend", "suggest", "outfit", "wear", "need"))
+    primary = ("image_generation" if needs_image_gen else "wardrobe_analysis" if needs_vision
+               else "outfit_recommendation" if needs_recommendation else "general_chat")
+    occasion = next((o for o in ("formal", "business", "party", "date", "workout") if o in text), "casual")
+    return json.dumps({
+        "primary_intent": primary,
+        "needs_vision": needs_vision,
+        "needs_recommendation": needs_recommendation,
+        "needs_image_gen": needs_image_gen,
+        "occasion": occasion,
+        "style_preference": "classic",
+        "urgency": "normal",
+    })
+
+def _vision_reply() -> str:
+    return ("The wardrobe shows a navy oxford shirt, dark slim jeans and white leather trainers, "
+            "with a grey wool blazer. Neutral colours that layer easily into smart-casual outfits.")
+
+def _catalog_reply(prompt: str) -> Optional[str]:
+    matches = _CATALOG_LINE.findall(prompt)[:3]
+    if not matches:
+        return None
+    picks = [f"[{name}]({url}) by {brand} at {store}, {price}" for name, brand, price, store, url in matches]
+    return "Here's a look built from Frasers pieces: " + "; ".join(picks) + ". Together they keep it polished but relaxed."
+
+def _grounded_reply() -> Tuple[str, types.GroundingMetadata]:
+    picks = _GROUNDED_PRODUCTS[:3]
+    sentences = [f"Try the {name} from {store} at {price}." for name, price, store, _ in picks]
+    text = "For this occasion I'd go smart-casual. " + " ".join(sentences)
+    chunks = [types.GroundingChunk(web=types.GroundingChunkWeb(uri=url, title=store)) for _, _, store, url in picks]
+    supports = []
+    encoded = text.encode("utf-8")
+    for i, sentence in enumerate(sentences):
+        # Segment offsets are UTF-8 byte positions, as the real API reports them
+        start = encoded.index(sentence.encode("utf-8"))
+        supports.append(types.GroundingSupport(
+            segment=types.Segment(start_index=start, end_index=start + len(sentence.encode("utf-8")), text=sentence),
+            grounding_chunk_indices=[i],
+        ))
+    metadata = types.GroundingMetadata(
+        grounding_chunks=chunks, grounding_supports=supports,
+        web_search_queries=[f"{name} site:{url.split('/')[2]}" for name, _, _, url in picks],
+    )
+    return text, metadata
+
+def _recommendation_reply(prompt: str) -> str:
+    return _catalog_reply(prompt) or _grounded_reply()[0]
+
+def _summary_reply() -> str:
+    return ("Shopper is planning smart-casual outfits; owns a navy oxford shirt, dark jeans and white trainers. "
+            "Suggested: Slim Fit Oxford Shirt £24.99, Stretch Chino Trousers £30.00.")
+
+def _conversation_reply() -> str:
+    return ("Great choice! A smart-casual look works for most plans. Keep colours neutral, add one statement "
+            "piece, and check Sports Direct or House of Fraser for affordable basics.")
+
+def _reply(kind: str, prompt: str) -> str:
+    if kind == "intent":
+        return _intent_reply(prompt)
+    if kind == "vision":
+        return _vision_reply()
+    if kind == "summary":
+        return _summary_reply()
+    if kind == "recommendation":
+        return _recommendation_reply(prompt)
+    return _conversation_reply()
+
+# Gemini
+
+def _gemini_prompt(contents: Any) -> Tuple[str, bool]:
+    """Flattens `contents` to text; also reports whether it carries an image part."""
+    if isinstance(contents, str):
+        return contents, False
+    if isinstance(contents, dict):
+        return " ".join(str(part.get("text", "")) for part in contents.get("parts", [])), False
+    texts, has_image = [], False
+    for item in contents or []:
+        if isinstance(item, str):
+            texts.append(item)
+        elif getattr(item, "inline_data", None) is not None:
+            has_image = True
+        elif getattr(item, "text", None):
+            texts.append(item.text)
+    return " ".join(texts), has_image
+
+def _gemini_kind(model: str, prompt: str, has_image: bool, config) -> str:
+    if "image" in model:
+        return "image"
+    if config is not None and (config.response_schema is not None or config.response_mime_type == "application/json"):
+        return "intent"
+    if has_image:
+        return "vision"
+    if "running summary" in prompt:
+        return "summary"
+    if "stylist" in prompt:
+        return "recommendation"
+    return "conversation"
+
+def _gemini_response(parts: List[types.Part], prompt: str, reply: str,
+                     metadata: Optional[types.GroundingMetadata] = None, finished: bool = True):
+    candidate = types.Candidate(
+        content=types.Content(role="model", parts=parts),
+        grounding_metadata=metadata,
+        finish_reason=types.FinishReason.STOP if finished else None,
+    )
+    prompt_tokens, reply_tokens = _tokens(prompt), _tokens(reply)
+    return types.GenerateContentResponse(
+        candidates=[candidate],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens, candidates_token_count=reply_tokens,
+            total_token_count=prompt_tokens + reply_tokens,
+        ),
+    )
+
+def _gemini_reply(kind: str, prompt: str, config) -> Tuple[str, Optional[types.GroundingMetadata]]:
+    if kind == "recommendation" and config is not None and config.tools:
+        return _grounded_reply()
+    return _reply(kind, prompt), None
+
+class _MockGeminiModels:
+    def __init__(self, behaviour: MockBehaviour):
+        self._behaviour = behaviour
+
+    async def generate_content(self, *, model: str, contents: Any, config=None, **kwargs):
+        prompt, has_image = _gemini_prompt(contents)
+        kind = _gemini_kind(model, prompt, has_image, config)
+        await self._behaviour.wait("gemini", kind, prompt)
+        if kind == "image":
+            return _gemini_response([types.Part.from_bytes(data=_PNG, mime_type="image/png")], prompt, "")
+        text, metadata = _gemini_reply(kind, prompt, config)
+        return _gemini_response([types.Part(text=text)], prompt, text, metadata)
+
+    async def generate_content_stream(self, *, model: str, contents: Any, config=None, **kwargs):
+        prompt, has_image = _gemini_prompt(contents)
+        kind = _gemini_kind(model, prompt, has_image, config)
+        text, metadata = _gemini_reply(kind, prompt, config)
+
+        async def chunks():
+            async for piece, last in self._behaviour.stream_pieces("gemini", kind, prompt, text):
+                # Grounding metadata arrives with the closing chunk, as it does from the API
+                yield _gemini_response([types.Part(text=piece)], prompt, text if last else "",
+                                       metadata if last else None, finished=last)
+        return chunks()
+
+    async def get(self, *, model: str, **kwargs):
+        return types.Model(name=f"models/{model}")
+
+class _MockGeminiAio:
+    def __init__(self, behaviour: MockBehaviour):
+        self.models = _MockGeminiModels(behaviour)
+
+class MockGeminiClient:
+    def __init__(self, behaviour: Optional[MockBehaviour] = None):
+        self.aio = _MockGeminiAio(behaviour or get_mock_behaviour())
+
+# OpenAI
+
+def _openai_kind(messages: List[Dict], response_format) -> Tuple[str, str]:
+    texts, has_image = [], False
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                has_image = True
+            elif part.get("type") == "text":
+                texts.append(part.get("text", ""))
+    prompt = "\n".join(texts)
+    if response_format is not None:
+        return "intent", prompt
+    if has_image:
+        return "vision", prompt
+    if "running summary" in prompt:
+        return "summary", prompt
+    if "stylist" in prompt:
+        return "recommendation", prompt
+    return "conversation", prompt
+
+class _MockCompletions:
+    def __init__(self, behaviour: MockBehaviour):
+        self._behaviour = behaviour
+
+    async def create(self, *, model: str, messages: List[Dict], stream: bool = False, response_format=None,
+                     stream_options=None, **kwargs):
+        kind, prompt = _openai_kind(messages, response_format)
+        text = _reply(kind, prompt)
+        completion_id = f"chatcmpl-mock{int(time.time() * 1000)}"
+        usage = {"prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if stream:
+            include_usage = isinstance(stream_options, dict) and stream_options.get("include_usage")
+            return self._stream(completion_id, model, kind, prompt, text, usage if include_usage else None)
+        await self._behaviour.wait("openai", kind, prompt)
+        return ChatCompletion.model_validate({
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": usage,
+        })
+
+    async def _stream(self, completion_id: str, model: str, kind: str, prompt: str, text: str,
+                      usage: Optional[Dict]):
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        async for piece, last in self._behaviour.stream_pieces("openai", kind, prompt, text):
+            yield ChatCompletionChunk.model_validate({
+                **chunk,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": "stop" if last else None}],
+            })
+        if usage is not None:
+            # As with include_usage: one last chunk with no choices
+            yield ChatCompletionChunk.model_validate({**chunk, "choices": [], "usage": usage})
+
+class _MockChat:
+    def __init__(self, behaviour: MockBehaviour):
+        self.completions = _MockCompletions(behaviour)
+
+class _MockModels:
+    async def retrieve(self, model: str, **kwargs):
+        return {"id": model, "object": "model"}
+
+class MockOpenAIClient:
+    def __init__(self, behaviour: Optional[MockBehaviour] = None):
+        self.chat = _MockChat(behaviour or get_mock_behaviour())
+        self.models = _MockModels()
+
+    async def close(self):
+        pass
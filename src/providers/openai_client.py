@@ -0,0 +1,42 @@
+"""
+OpenAI provider client
+
+One AsyncOpenAI client for the whole process, backed by a pooled keep-alive
+httpx client (HTTP/2 when available). With PROVIDER_MOCK=1 (or =openai) a
+local mock client (mock.py) stands in.
+"""
+
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from src.providers.http import async_client_args
+from src.providers.mock import MockOpenAIClient, mock_enabled
+
+load_dotenv()
+
+_client: Optional[AsyncOpenAI] = None
+
+def get_openai_client() -> Optional[AsyncOpenAI]:
+    global _client
+    if _client is None:
+        key = os.getenv("OPENAI_API_KEY")
+        if mock_enabled("openai"):
+            _client = MockOpenAIClient()
+        elif key:
+            _client = AsyncOpenAI(api_key=key, http_client=DefaultAsyncHttpxClient(**async_client_args()))
+    return _client
+
+async def warm_up_openai():
+    """Opens a pooled connection before the first chat."""
+    client = get_openai_client()
+    if client:
+        await client.models.retrieve("gpt-4o-mini")
+
+async def close_openai():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
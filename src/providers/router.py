@@ -0,0 +1,264 @@
+"""
+Latency-aware provider router for Retail Odyssey
+
+Agents describe each way they can answer (Gemini, then OpenAI) as a
+`ProviderRoute` and let the router pick. Per provider/model it keeps a
+rolling window of latencies and errors and uses it to:
+
+- Order routes: the preferred route stays first unless a later one has been
+  clearly faster and healthier (ROUTER_PREFERENCE_MARGIN, default 1.5x)
+- Time out adaptively: ROUTER_TIMEOUT_MULTIPLIER x p95 (default 3x), at least
+  ROUTER_MIN_TIMEOUT_SECONDS (default 2) and at most the agent's cold timeout
+  ({AGENT}_PROVIDER_TIMEOUT_SECONDS); the last route is left to the step timeout
+- Hedge: once the primary has run past its ROUTER_HEDGE_PERCENTILE latency
+  (default 95) the next route is started too; the first success wins and the
+  loser is cancelled (ROUTER_HEDGE=0 disables, streaming calls never hedge)
+- Break circuits: ROUTER_BREAKER_FAILURES consecutive failures (default 5) skip
+  a provider for ROUTER_BREAKER_COOLDOWN_SECONDS (default 30), then one trial
+  call decides whether it comes back
+
+Every attempt runs in a `provider.call` span (telemetry.py); successful call
+latency per model and fallbacks (to the next route, or to the agent's default
+reply once every route failed) are exported as Prometheus metrics, and the
+latency is reported to the model tier policy (tiers.py) for its SLO checks.
+
+Samples older than ROUTER_STATS_MAX_AGE_SECONDS (default 300) are dropped, so
+a demoted provider goes cold, regains its preferred place and is re-measured.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from src.providers.telemetry import provider_call
+from src.providers.tiers import get_tier_policy
+from src.utils.prometheus_metrics import (provider_calls, hedged_requests, circuit_open, provider_fallbacks,
+                                          provider_latency)
+
+# Cold-start timeouts per agent, used until a route has enough samples
+_COLD_TIMEOUTS = {
+    "intent": 8.0,
+    "vision": 20.0,
+    "recommendation": 25.0,
+    "conversation": 12.0,
+    "summary": 20.0,
+}
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+class ProviderRoute(NamedTuple):
+    provider: str
+    model: str
+    run: Callable[[], Awaitable[Any]]
+
+class NoProviderAvailable(RuntimeError):
+    pass
+
+class RouteStats:
+    """Rolling latency/error window for one provider/model."""
+
+    def __init__(self, window: int, max_age: float):
+        self.samples: deque = deque(maxlen=window)
+        self.max_age = max_age
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((time.monotonic(), latency, ok))
+
+    def _fresh(self):
+        cutoff = time.monotonic() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return self.samples
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        latencies = sorted(latency for _, latency, ok in self._fresh() if ok)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))]
+
+    def error_rate(self) -> float:
+        samples = self._fresh()
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open (one trial) after a cooldown."""
+
+    def __init__(self, provider: str, failures: int, cooldown: float):
+        self.provider = provider
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.trial_in_flight or time.monotonic() - self.opened_at < self.cooldown:
+            return False
+        self.trial_in_flight = True
+        return True
+
+    def record(self, ok: bool):
+        self.trial_in_flight = False
+        if ok:
+            self.consecutive = 0
+            if self.opened_at is not None:
+                self.opened_at = None
+                circuit_open.labels(provider=self.provider).set(0)
+            return
+        self.consecutive += 1
+        if self.opened_at is not None or self.consecutive >= self.failures:
+            self.opened_at = time.monotonic()
+            circuit_open.labels(provider=self.provider).set(1)
+
+    def release(self):
+        """A trial call was cancelled before it could prove anything."""
+        self.trial_in_flight = False
+
+class ProviderRouter:
+    def __init__(self):
+        self.window = int(_env_float("ROUTER_WINDOW", 200))
+        self.min_samples = int(_env_float("ROUTER_MIN_SAMPLES", 20))
+        self.max_age = _env_float("ROUTER_STATS_MAX_AGE_SECONDS", 300)
+        self.timeout_multiplier = _env_float("ROUTER_TIMEOUT_MULTIPLIER", 3.0)
+        self.min_timeout = _env_float("ROUTER_MIN_TIMEOUT_SECONDS", 2.0)
+        self.preference_margin = _env_float("ROUTER_PREFERENCE_MARGIN", 1.5)
+        self.hedge_enabled = os.getenv("ROUTER_HEDGE", "1") != "0"
+        self.hedge_percentile = _env_float("ROUTER_HEDGE_PERCENTILE", 95)
+        self.breaker_failures = int(_env_float("ROUTER_BREAKER_FAILURES", 5))
+        self.breaker_cooldown = _env_float("ROUTER_BREAKER_COOLDOWN_SECONDS", 30)
+        self._stats: Dict[str, RouteStats] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def stats(self, route: ProviderRoute) -> RouteStats:
+        key = f"{route.provider}:{route.model}"
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = RouteStats(self.window, self.max_age)
+        return stats
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers[provider] = CircuitBreaker(
+                provider, self.breaker_failures, self.breaker_cooldown)
+        return breaker
+
+    def _order(self, routes: List[ProviderRoute]) -> List[ProviderRoute]:
+        scores = []
+        for route in routes:
+            p50 = self.stats(route).percentile(50, self.min_samples)
+            if p50 is None:
+                # Not enough recent data to argue with the configured preference
+                return list(routes)
+            scores.append(p50 / max(1.0 - self.stats(route).error_rate(), 0.05))
+        ranked = sorted(range(len(routes)), key=lambda i: scores[i] * self.preference_margin ** i)
+        return [routes[i] for i in ranked]
+
+    def timeout_for(self, agent: str, route: ProviderRoute) -> float:
+        cold = _env_float(f"{agent.upper()}_PROVIDER_TIMEOUT_SECONDS", _COLD_TIMEOUTS.get(agent, 20.0))
+        p95 = self.stats(route).percentile(95, self.min_samples)
+        if p95 is None:
+            return cold
+        return min(max(p95 * self.timeout_multiplier, self.min_timeout), cold)
+
+    async def _attempt(self, agent: str, route: ProviderRoute, timeout: Optional[float], attempt: int):
+        started = time.perf_counter()
+        breaker = self.breaker(route.provider)
+        with provider_call(agent, route.provider, route.model, attempt=attempt, timeout=timeout,
+                           tier=get_tier_policy().tier_of(route.provider, route.model)) as call:
+            try:
+                if timeout is None:
+                    result = await route.run()
+                else:
+                    result = await asyncio.wait_for(route.run(), timeout)
+            except asyncio.CancelledError:
+                breaker.release()
+                provider_calls.labels(agent_name=agent, provider=route.provider, outcome="cancelled").inc()
+                raise
+            except Exception as e:
+                outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                self.stats(route).record(time.perf_counter() - started, False)
+                breaker.record(False)
+                provider_calls.labels(agent_name=agent, provider=route.provider, outcome=outcome).inc()
+                call.span.set(outcome=outcome)
+                print(f"{agent} via {route.provider} ({route.model}) {outcome}: {e!r}")
+                raise
+            latency = time.perf_counter() - started
+            self.stats(route).record(latency, True)
+            breaker.record(True)
+            provider_calls.labels(agent_name=agent, provider=route.provider, outcome="ok").inc()
+            provider_latency.labels(agent_name=agent, provider=route.provider, model=route.model).observe(latency)
+            get_tier_policy().observe(agent, route.provider, route.model, latency)
+            call.span.set(outcome="ok")
+            return result
+
+    async def call(self, agent: str, routes: List[ProviderRoute], hedge: bool = True) -> Any:
+        """
+        Runs `routes` (in preference order) until one succeeds and returns its result.
+        Raises NoProviderAvailable if every route failed or was skipped.
+        """
+        candidates = self._order(routes)
+        hedge = hedge and self.hedge_enabled
+        running: Dict[asyncio.Task, ProviderRoute] = {}
+        next_index = 0
+
+        def launch() -> bool:
+            # Breakers are asked only when a route is about to run, so a half-open
+            # trial slot is never claimed by a route that ends up unused
+            nonlocal next_index
+            while next_index < len(candidates):
+                route = candidates[next_index]
+                next_index += 1
+                if not self.breaker(route.provider).allow():
+                    continue
+                # The last resort is bounded by the orchestrator's step timeout instead
+                timeout = self.timeout_for(agent, route) if next_index < len(candidates) else None
+                running[asyncio.ensure_future(self._attempt(agent, route, timeout, next_index))] = route
+                return True
+            return False
+
+        try:
+            if not launch():
+                raise NoProviderAvailable(f"{agent}: no provider available")
+            while running:
+                wait = None
+                if hedge and len(running) == 1 and next_index < len(candidates):
+                    wait = self.stats(next(iter(running.values()))).percentile(
+                        self.hedge_percentile, self.min_samples)
+                done, _ = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch():
+                        hedged_requests.labels(agent_name=agent).inc()
+                    continue
+                failed = []
+                for task in done:
+                    route = running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    failed.append(route)
+                # A hedge still running or the next route takes over; otherwise the agent's default reply
+                to = "next_route" if running or launch() else "default"
+                for route in failed:
+                    provider_fallbacks.labels(agent_name=agent, provider=route.provider, model=route.model, to=to).inc()
+            raise NoProviderAvailable(f"{agent}: all providers failed")
+        finally:
+            for task in running:
+                task.cancel()
+
+_router: Optional[ProviderRouter] = None
+
+def get_router() -> ProviderRouter:
+    global _router
+    if _router is None:
+        _router = ProviderRouter()
+    return _router
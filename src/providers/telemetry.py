@@ -0,0 +1,86 @@
+"""
+Provider call telemetry for Retail Odyssey
+
+`provider_call()` wraps one attempt at a model (the router opens it around
+every route it runs) in a `provider.call` span and makes the agent, provider
+and model available to code deeper in the call, so the streaming helpers and
+agents can report time-to-first-token and token usage without threading
+labels through every signature:
+
+- record_first_token(): first streamed text chunk, measured from when the
+  request left (after any wait for a provider slot)
+- record_usage(response): prompt/completion tokens from Gemini
+  `usage_metadata` or OpenAI `usage`, on responses and final stream chunks;
+  also charged to the usage ledger and the current session (see usage.py)
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from src.providers.usage import get_usage_ledger
+from src.utils.prometheus_metrics import model_tokens, time_to_first_token
+from src.utils.tracing import Span, span
+
+class ProviderCall:
+    __slots__ = ("agent", "provider", "model", "span", "sent", "first_token")
+
+    def __init__(self, agent: str, provider: str, model: str, call_span: Span):
+        self.agent = agent
+        self.provider = provider
+        self.model = model
+        self.span = call_span
+        self.sent = time.perf_counter()
+        self.first_token: Optional[float] = None
+
+_call: ContextVar[Optional[ProviderCall]] = ContextVar("retail_odyssey_provider_call", default=None)
+
+def current_call() -> Optional[ProviderCall]:
+    return _call.get()
+
+@contextmanager
+def provider_call(agent: str, provider: str, model: str, **attributes) -> Iterator[ProviderCall]:
+    with span("provider.call", agent=agent, provider=provider, model=model, **attributes) as call_span:
+        call = ProviderCall(agent, provider, model, call_span)
+        token = _call.set(call)
+        try:
+            yield call
+        finally:
+            _call.reset(token)
+
+def mark_sent():
+    """Called once a provider slot is acquired, so queueing isn't counted as model time."""
+    call = _call.get()
+    if call is not None:
+        call.sent = time.perf_counter()
+
+def record_first_token():
+    call = _call.get()
+    if call is None or call.first_token is not None:
+        return
+    call.first_token = time.perf_counter() - call.sent
+    time_to_first_token.labels(agent_name=call.agent, provider=call.provider, model=call.model).observe(call.first_token)
+    call.span.set(ttft_ms=round(call.first_token * 1e3, 2))
+
+def usage_tokens(response: Any) -> Optional[tuple]:
+    """(prompt tokens, completion tokens) from a Gemini or OpenAI response, if it carries usage."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        return usage.prompt_token_count or 0, usage.candidates_token_count or 0
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return usage.prompt_tokens or 0, usage.completion_tokens or 0
+    return None
+
+def record_usage(response: Any) -> Optional[tuple]:
+    call = _call.get()
+    tokens = usage_tokens(response)
+    if call is None or tokens is None:
+        return tokens
+    prompt, completion = tokens
+    model_tokens.labels(agent_name=call.agent, provider=call.provider, model=call.model, kind="prompt").observe(prompt)
+    model_tokens.labels(agent_name=call.agent, provider=call.provider, model=call.model, kind="completion").observe(completion)
+    cost = get_usage_ledger().record(call.agent, call.provider, call.model, prompt, completion)
+    call.span.set(prompt_tokens=prompt, completion_tokens=completion, cost_usd=round(cost, 6))
+    return tokens
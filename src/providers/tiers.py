@@ -0,0 +1,184 @@
+"""
+Model tiering for Retail Odyssey
+
+Agents don't hardcode models: they ask `route_model()` which model each
+provider should use for the call, and the policy in config/model_tiers.json
+(override with MODEL_TIERS_PATH) answers:
+
+- "tiers" maps each tier to a model per provider, cheapest tier first
+- "agents" lists each agent's candidate tiers (cheapest first) and its
+  latency SLO; the cheapest candidate whose recent p95 for this agent meets
+  the SLO is used (or the fastest one if none does). A tier with too few
+  recent samples counts as meeting it, so a demoted tier is retried once its
+  samples age out
+- "complex_tokens" / "complex_tiers": calls whose prompt reaches that many
+  tokens (e.g. a long conversation) choose from the complex tiers instead
+
+Env overrides per agent: {AGENT}_MODEL_TIERS (e.g. "flash,pro") and
+{AGENT}_LATENCY_SLO_MS.
+
+A/B mode (MODEL_TIER_AB=1) picks a random tier per call from the file's "ab"
+experiments instead. Either way, the router reports each successful call's
+latency and agents report a 0-1 quality score for the reply (`record_quality`,
+e.g. whether an intent parsed cleanly or a recommendation linked products),
+per agent, tier and model; see GET /api/tiers and the retail_odyssey_tier_*
+metrics. Budget downgrades (usage.py) still apply on top of the tier's model.
+"""
+
+import json
+import os
+import random
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from src.providers.telemetry import current_call
+from src.providers.usage import select_model
+from src.utils.prometheus_metrics import tier_latency, tier_quality, tier_selections
+
+DEFAULT_TIERS_PATH = Path(__file__).resolve().parents[2] / "config" / "model_tiers.json"
+
+class AgentPolicy(NamedTuple):
+    tiers: List[str]
+    slo: float  # seconds
+    complex_tokens: int = 0
+    complex_tiers: Optional[List[str]] = None
+
+class TierStats:
+    """Recent latencies (for SLO checks and percentiles) plus running quality totals."""
+    __slots__ = ("samples", "calls", "slo_met", "quality_sum", "quality_count")
+
+    def __init__(self, window: int):
+        self.samples: deque = deque(maxlen=window)
+        self.calls = 0
+        self.slo_met = 0
+        self.quality_sum = 0.0
+        self.quality_count = 0
+
+    def percentile(self, q: float, min_samples: int, max_age: float) -> Optional[float]:
+        cutoff = time.monotonic() - max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        if len(self.samples) < min_samples:
+            return None
+        latencies = sorted(latency for _, latency in self.samples)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))]
+
+class TierPolicy:
+    def __init__(self, config: Dict):
+        self.models: Dict[str, Dict[str, str]] = config.get("tiers", {})
+        # Tier -> model lookups for stats; a model listed under several tiers reports as the cheapest
+        self._tier_of: Dict[Tuple[str, str], str] = {}
+        for tier, models in reversed(list(self.models.items())):
+            for provider, model in models.items():
+                self._tier_of[(provider, model)] = tier
+        self.agents: Dict[str, AgentPolicy] = {}
+        for agent, spec in config.get("agents", {}).items():
+            tiers = os.getenv(f"{agent.upper()}_MODEL_TIERS")
+            slo_ms = float(os.getenv(f"{agent.upper()}_LATENCY_SLO_MS", spec.get("slo_ms", 10000)))
+            self.agents[agent] = AgentPolicy(
+                [t.strip() for t in tiers.split(",")] if tiers else spec["tiers"],
+                slo_ms / 1e3,
+                spec.get("complex_tokens", 0),
+                spec.get("complex_tiers"),
+            )
+        self.experiments: Dict[str, List[str]] = config.get("ab", {}) if os.getenv("MODEL_TIER_AB", "0") == "1" else {}
+        self.window = int(os.getenv("MODEL_TIER_WINDOW", "200"))
+        self.min_samples = int(os.getenv("MODEL_TIER_MIN_SAMPLES", "20"))
+        self.max_age = float(os.getenv("MODEL_TIER_STATS_MAX_AGE_SECONDS", "300"))
+        self._stats: Dict[Tuple[str, str, str], TierStats] = {}
+
+    def tier_of(self, provider: str, model: str) -> str:
+        return self._tier_of.get((provider, model), "untiered")
+
+    def stats(self, agent: str, provider: str, model: str) -> TierStats:
+        key = (agent, provider, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = TierStats(self.window)
+        return stats
+
+    def choose(self, agent: str, provider: str, default: str, prompt_tokens: int = 0) -> str:
+        policy = self.agents.get(agent)
+        if policy is None:
+            return default
+        experiment = self.experiments.get(agent)
+        if experiment:
+            tier = random.choice(experiment)
+            tier_selections.labels(agent_name=agent, provider=provider, tier=tier, reason="ab").inc()
+            return self.models.get(tier, {}).get(provider, default)
+        reason = "policy"
+        tiers = policy.tiers
+        if policy.complex_tiers and policy.complex_tokens and prompt_tokens >= policy.complex_tokens:
+            tiers, reason = policy.complex_tiers, "complex"
+        candidates = [(tier, self.models[tier][provider]) for tier in tiers if provider in self.models.get(tier, {})]
+        if not candidates:
+            return default
+        fastest = None
+        for tier, model in candidates:
+            p95 = self.stats(agent, provider, model).percentile(95, self.min_samples, self.max_age)
+            if p95 is None or p95 <= policy.slo:
+                tier_selections.labels(agent_name=agent, provider=provider, tier=tier, reason=reason).inc()
+                return model
+            if fastest is None or p95 < fastest[0]:
+                fastest = (p95, tier, model)
+        _, tier, model = fastest
+        tier_selections.labels(agent_name=agent, provider=provider, tier=tier, reason="slo").inc()
+        return model
+
+    def observe(self, agent: str, provider: str, model: str, latency: float):
+        """A successful call's latency (reported by the router)."""
+        stats = self.stats(agent, provider, model)
+        stats.samples.append((time.monotonic(), latency))
+        stats.calls += 1
+        policy = self.agents.get(agent)
+        if policy is not None and latency <= policy.slo:
+            stats.slo_met += 1
+        tier_latency.labels(agent_name=agent, tier=self.tier_of(provider, model), model=model).observe(latency)
+
+    def record_quality(self, agent: str, provider: str, model: str, score: float):
+        stats = self.stats(agent, provider, model)
+        stats.quality_sum += score
+        stats.quality_count += 1
+        tier_quality.labels(agent_name=agent, tier=self.tier_of(provider, model), model=model).observe(score)
+
+    def report(self) -> Dict:
+        agents = {agent: {"tiers": policy.tiers, "slo_ms": policy.slo * 1e3, "complex_tokens": policy.complex_tokens or None,
+                          "complex_tiers": policy.complex_tiers, "ab": self.experiments.get(agent)}
+                  for agent, policy in self.agents.items()}
+        rows = []
+        for (agent, provider, model), stats in sorted(self._stats.items()):
+            if not stats.calls and not stats.quality_count:
+                continue
+            p50 = stats.percentile(50, 1, self.max_age)
+            p95 = stats.percentile(95, 1, self.max_age)
+            rows.append({
+                "agent": agent, "provider": provider, "model": model, "tier": self.tier_of(provider, model),
+                "calls": stats.calls,
+                "p50_ms": round(p50 * 1e3, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1e3, 1) if p95 is not None else None,
+                "slo_met": round(stats.slo_met / stats.calls, 4) if stats.calls else None,
+                "quality": round(stats.quality_sum / stats.quality_count, 4) if stats.quality_count else None,
+            })
+        return {"tiers": self.models, "agents": agents, "ab_enabled": bool(self.experiments), "stats": rows}
+
+_policy: Optional[TierPolicy] = None
+
+def get_tier_policy() -> TierPolicy:
+    global _policy
+    if _policy is None:
+        path = os.getenv("MODEL_TIERS_PATH") or DEFAULT_TIERS_PATH
+        with open(path) as f:
+            _policy = TierPolicy(json.load(f))
+    return _policy
+
+def route_model(agent: str, provider: str, default: str, prompt_tokens: int = 0) -> str:
+    """The model `agent` should call on `provider`: its tier policy's pick, then any budget downgrade."""
+    return select_model(agent, get_tier_policy().choose(agent, provider, default, prompt_tokens))
+
+def record_quality(score: float):
+    """Scores (0-1) the reply of the provider call in progress, for tier comparisons."""
+    call = current_call()
+    if call is not None:
+        get_tier_policy().record_quality(call.agent, call.provider, call.model, score)
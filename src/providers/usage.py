@@ -0,0 +1,183 @@
+"""
+Token usage and cost accounting for Retail Odyssey
+
+Every model call that reports usage (see telemetry.record_usage) is added to
+in-memory counters per agent/provider/model and to the usage of the session
+whose turn made the call, priced from config/model_pricing.json (USD per
+million input/output tokens; override the file with MODEL_PRICING_PATH).
+Totals are exported as Prometheus counters and served by GET /api/usage.
+
+Per-session budgets (0 = unlimited):
+- SESSION_TOKEN_BUDGET: prompt + completion tokens
+- SESSION_COST_BUDGET_USD: estimated spend
+Once a session is over budget, agents ask `select_model()` for each call and
+get the cheaper model from the pricing file's "downgrade" map (e.g.
+gemini-3-pro-preview -> gemini-2.5-flash) for the rest of the session.
+
+The session's usage travels with the session (it is saved with it in Redis),
+and is found from inside provider calls through a contextvar set for the
+turn by `track_session()`. Background work started by the turn (summaries,
+image jobs) is charged to the same session; with SESSION_BACKEND=redis, calls
+finishing after the turn has saved the session only reach the process-wide
+counters.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.utils.prometheus_metrics import budget_downgrades, model_cost, token_usage
+
+DEFAULT_PRICING_PATH = Path(__file__).resolve().parents[2] / "config" / "model_pricing.json"
+
+class Price(NamedTuple):
+    input: float   # USD per million prompt tokens
+    output: float  # USD per million completion tokens
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.input + completion_tokens * self.output) / 1e6
+
+class Pricing:
+    def __init__(self, config: Dict):
+        self.prices = {model: Price(p["input"], p["output"]) for model, p in config.get("prices", {}).items()}
+        self.downgrade: Dict[str, str] = dict(config.get("downgrade", {}))
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        price = self.prices.get(model)
+        return price.cost(prompt_tokens, completion_tokens) if price else 0.0
+
+_pricing: Optional[Pricing] = None
+
+def get_pricing() -> Pricing:
+    global _pricing
+    if _pricing is None:
+        path = os.getenv("MODEL_PRICING_PATH") or DEFAULT_PRICING_PATH
+        with open(path) as f:
+            _pricing = Pricing(json.load(f))
+    return _pricing
+
+class SessionUsage:
+    """One session's usage: running totals plus [calls, prompt, completion, cost] per model."""
+    __slots__ = ("prompt_tokens", "completion_tokens", "cost", "models", "downgraded")
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.models: Dict[str, List] = {}
+        self.downgraded = False
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, model: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+        entry = self.models.get(model)
+        if entry is None:
+            entry = self.models[model] = [0, 0, 0, 0.0]
+        entry[0] += 1
+        entry[1] += prompt_tokens
+        entry[2] += completion_tokens
+        entry[3] += cost
+
+    def to_dict(self) -> Dict:
+        return {"prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens,
+                "cost_usd": round(self.cost, 6), "downgraded": self.downgraded,
+                "models": {model: [calls, prompt, completion, round(cost, 6)]
+                           for model, (calls, prompt, completion, cost) in self.models.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "SessionUsage":
+        usage = cls()
+        if data:
+            usage.prompt_tokens = data["prompt_tokens"]
+            usage.completion_tokens = data["completion_tokens"]
+            usage.cost = data["cost_usd"]
+            usage.downgraded = data.get("downgraded", False)
+            usage.models = {model: list(entry) for model, entry in data.get("models", {}).items()}
+        return usage
+
+class Budget(NamedTuple):
+    tokens: int
+    cost: float
+
+    @classmethod
+    def from_env(cls) -> "Budget":
+        return cls(int(os.getenv("SESSION_TOKEN_BUDGET", "0")), float(os.getenv("SESSION_COST_BUDGET_USD", "0")))
+
+    def exceeded(self, usage: SessionUsage) -> bool:
+        return bool((self.tokens and usage.tokens >= self.tokens) or (self.cost and usage.cost >= self.cost))
+
+    def to_dict(self, usage: SessionUsage) -> Dict:
+        return {"tokens": self.tokens or None, "cost_usd": self.cost or None, "exceeded": self.exceeded(usage)}
+
+class UsageLedger:
+    """Process-wide totals per (agent, provider, model): [calls, prompt, completion, cost]."""
+
+    def __init__(self):
+        self.totals: Dict[Tuple[str, str, str], List] = {}
+
+    def record(self, agent: str, provider: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        cost = get_pricing().cost(model, prompt_tokens, completion_tokens)
+        entry = self.totals.get((agent, provider, model))
+        if entry is None:
+            entry = self.totals[(agent, provider, model)] = [0, 0, 0, 0.0]
+        entry[0] += 1
+        entry[1] += prompt_tokens
+        entry[2] += completion_tokens
+        entry[3] += cost
+        token_usage.labels(agent_name=agent, provider=provider, model=model, kind="prompt").inc(prompt_tokens)
+        token_usage.labels(agent_name=agent, provider=provider, model=model, kind="completion").inc(completion_tokens)
+        model_cost.labels(agent_name=agent, provider=provider, model=model).inc(cost)
+        session = _session_usage.get()
+        if session is not None:
+            session.add(model, prompt_tokens, completion_tokens, cost)
+        return cost
+
+    def report(self) -> Dict:
+        rows = [{"agent": agent, "provider": provider, "model": model, "calls": calls,
+                 "prompt_tokens": prompt, "completion_tokens": completion, "cost_usd": round(cost, 6)}
+                for (agent, provider, model), (calls, prompt, completion, cost) in sorted(self.totals.items())]
+        return {
+            "prompt_tokens": sum(row["prompt_tokens"] for row in rows),
+            "completion_tokens": sum(row["completion_tokens"] for row in rows),
+            "cost_usd": round(sum(cost for _, _, _, cost in self.totals.values()), 6),
+            "by_agent_model": rows,
+        }
+
+_ledger: Optional[UsageLedger] = None
+
+def get_usage_ledger() -> UsageLedger:
+    global _ledger
+    if _ledger is None:
+        _ledger = UsageLedger()
+    return _ledger
+
+_session_usage: ContextVar[Optional[SessionUsage]] = ContextVar("retail_odyssey_session_usage", default=None)
+
+@contextmanager
+def track_session(usage: SessionUsage) -> Iterator[SessionUsage]:
+    """Charges model calls made inside the block (and tasks it starts) to `usage`."""
+    token = _session_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _session_usage.reset(token)
+
+def select_model(agent: str, model: str) -> str:
+    """`model`, or its cheaper downgrade once the current session is over budget."""
+    usage = _session_usage.get()
+    if usage is None:
+        return model
+    cheaper = get_pricing().downgrade.get(model)
+    if cheaper is None or not Budget.from_env().exceeded(usage):
+        return model
+    usage.downgraded = True
+    budget_downgrades.labels(agent_name=agent, model=model).inc()
+    return cheaper
@@ -0,0 +1,120 @@
+"""
+Content-addressed Blob Store for generated images
+
+ImageGenAgent output is written once to disk under its SHA-256 and served
+from /api/images/{hash}; chat history only carries the reference.
+
+- IMAGE_STORE_DIR: directory for blobs (default .cache/images)
+- IMAGE_STORE_MAX_BYTES: total size cap (default 512 MB); least recently
+  stored or served blobs are evicted first
+
+Workers sharing IMAGE_STORE_DIR serve each other's images: a digest missing
+from this process's index is looked up on disk. Multi-host deployments need
+the directory on shared storage (e.g. NFS or a mounted volume).
+
+The index is only used from the event loop: put_async() hashes and writes
+the file in a worker thread, then indexes it (and evicts) back on the loop.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+_MIME_TYPES = {ext: mime for mime, ext in _EXTENSIONS.items()}
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+class Blob(NamedTuple):
+    path: Path
+    size: int
+    mime_type: str
+
+class BlobStore:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index: "OrderedDict[str, Blob]" = OrderedDict()
+        self._total = 0
+        # Rebuild the index from disk, oldest first, so restarts keep serving old links
+        for path in sorted(self.root.iterdir(), key=lambda p: p.stat().st_mtime):
+            digest, _, ext = path.name.partition(".")
+            if _DIGEST.match(digest) and ext in _MIME_TYPES:
+                self._index[digest] = Blob(path, path.stat().st_size, _MIME_TYPES[ext])
+                self._total += self._index[digest].size
+
+    def put(self, data: bytes, mime_type: str = "image/png") -> str:
+        """Stores `data` (blocking) and returns its content hash."""
+        return self._add(*self._write(data, mime_type))
+
+    async def put_async(self, data: bytes, mime_type: str = "image/png") -> str:
+        # Only the hashing and file write run in a thread; the index is only touched on the event loop
+        return self._add(*await asyncio.to_thread(self._write, data, mime_type))
+
+    def _write(self, data: bytes, mime_type: str) -> Tuple[str, Blob]:
+        """Writes the blob file if it isn't on disk yet; doesn't touch the index, so it is safe off the loop."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.root / f"{digest}.{_EXTENSIONS.get(mime_type, 'png')}"
+        if not path.exists():
+            # Write to a temp file and rename so readers never see a partial image
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest, Blob(path, len(data), _MIME_TYPES[path.suffix[1:]])
+
+    def _add(self, digest: str, blob: Blob) -> str:
+        if digest in self._index:
+            self._index.move_to_end(digest)
+            return digest
+        self._index[digest] = blob
+        self._total += blob.size
+        self._evict()
+        return digest
+
+    def get(self, digest: str) -> Optional[Blob]:
+        if not _DIGEST.match(digest):
+            return None
+        blob = self._index.get(digest)
+        if blob is not None:
+            self._index.move_to_end(digest)
+            return blob
+        # Possibly stored by another worker since this index was built
+        for ext, mime_type in _MIME_TYPES.items():
+            path = self.root / f"{digest}.{ext}"
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            blob = Blob(path, size, mime_type)
+            self._add(digest, blob)
+            return blob
+        return None
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._index) > 1:
+            _, blob = self._index.popitem(last=False)
+            self._total -= blob.size
+            try:
+                blob.path.unlink()
+            except FileNotFoundError:
+                pass
+
+_store: Optional[BlobStore] = None
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        _store = BlobStore(
+            os.getenv("IMAGE_STORE_DIR", ".cache/images"),
+            int(os.getenv("IMAGE_STORE_MAX_BYTES", str(512 * 1024 * 1024))),
+        )
+    return _store
+
+def image_ref_url(digest: Optional[str]) -> Optional[str]:
+    return f"/api/images/{digest}" if digest else None
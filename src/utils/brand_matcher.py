@@ -0,0 +1,115 @@
+"""
+Brand Matcher for Retail Odyssey
+
+One precompiled, word-boundary-aware matcher for every brand list the agents
+use (competitor blocking, Frasers brand-mention metrics, redaction). All
+names are folded into a single regex compiled from a character trie (shared
+prefixes factored out, longer names preferred), so one scan returns every
+match with its span: "Nike.com" wins over "Nike", and "Gap" no longer fires
+inside "gaping".
+
+Brands are loaded once from config/brands.json (override with
+BRANDS_CONFIG_PATH). Entries are plain names, or
+{"name": ..., "case_sensitive": true} for brands that are also common words
+("Target", "Gap", "Mango").
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Union
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parents[2] / "config" / "brands.json"
+
+class BrandMatch(NamedTuple):
+    brand: str
+    kind: str
+    start: int
+    end: int
+
+def _trie_pattern(names: List[str]) -> str:
+    """Builds a regex matching any of `names`, preferring the longest match at a position."""
+    trie: Dict = {}
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # A name ends here but a longer one continues: make the continuation optional (greedy)
+            return body + "?" if body.startswith("(?:") else "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+class BrandMatcher:
+    def __init__(self, groups: Dict[str, List[Union[str, Dict]]]):
+        self._lookup: Dict[str, tuple] = {}
+        alternatives = []
+        for kind, entries in groups.items():
+            for entry in entries:
+                name = entry if isinstance(entry, str) else entry["name"]
+                case_sensitive = isinstance(entry, dict) and entry.get("case_sensitive", False)
+                self._lookup[name.lower()] = (name, kind)
+                alternatives.append((name, case_sensitive))
+
+        insensitive = [name.lower() for name, case_sensitive in alternatives if not case_sensitive]
+        sensitive = [name for name, case_sensitive in alternatives if case_sensitive]
+        branches = []
+        if insensitive:
+            branches.append(_trie_pattern(insensitive))
+        if sensitive:
+            branches.append(f"(?-i:{_trie_pattern(sensitive)})")
+        first_chars = sorted({c for name, _ in alternatives for c in (name[0].lower(), name[0].upper())})
+        self.max_length = max((len(name) for name, _ in alternatives), default=0)
+        # The first-character lookahead lets the engine skip most positions cheaply; lookarounds
+        # instead of \b so names starting/ending in punctuation ("H&M", "Dick's") still anchor
+        self._pattern = re.compile(
+            r"(?<!\w)(?=[" + re.escape("".join(first_chars)) + r"])(?:" + "|".join(branches) + r")(?!\w)",
+            re.IGNORECASE,
+        )
+
+    def find_all(self, text: str, kind: Optional[str] = None) -> List[BrandMatch]:
+        matches = []
+        for match in self._pattern.finditer(text):
+            brand, brand_kind = self._lookup[match.group(0).lower()]
+            if kind is None or brand_kind == kind:
+                matches.append(BrandMatch(brand, brand_kind, match.start(), match.end()))
+        return matches
+
+    def first(self, text: str, kind: Optional[str] = None) -> Optional[BrandMatch]:
+        for match in self._pattern.finditer(text):
+            brand, brand_kind = self._lookup[match.group(0).lower()]
+            if kind is None or brand_kind == kind:
+                return BrandMatch(brand, brand_kind, match.start(), match.end())
+        return None
+
+    def counts(self, text: str, kind: Optional[str] = None) -> Counter:
+        return Counter(match.brand for match in self.find_all(text, kind))
+
+    def redact(self, text: str, kind: str = "competitor", replacement: str = "[brand removed]") -> str:
+        def substitute(match):
+            _, brand_kind = self._lookup[match.group(0).lower()]
+            return replacement if brand_kind == kind else match.group(0)
+        return self._pattern.sub(substitute, text)
+
+    def names(self, kind: str) -> List[str]:
+        return [name for name, brand_kind in self._lookup.values() if brand_kind == kind]
+
+_matcher: Optional[BrandMatcher] = None
+
+def get_brand_matcher() -> BrandMatcher:
+    global _matcher
+    if _matcher is None:
+        path = os.getenv("BRANDS_CONFIG_PATH") or DEFAULT_CONFIG_PATH
+        with open(path) as f:
+            _matcher = BrandMatcher(json.load(f))
+    return _matcher
@@ -0,0 +1,193 @@
+"""
+Citation rendering for grounded recommendations
+
+Gemini's Google Search grounding returns the reply with grounding chunks (the
+pages it used) and supports (reply segments, each citing some chunks).
+`render_citations()` turns them into the markdown the chat shows, with a
+[Link](url) after each segment that cites a Frasers page, plus structured
+citations and products for the frontend's product cards:
+
+- Segment offsets are UTF-8 byte positions; they are converted to character
+  positions in one pass over the encoded reply (ASCII replies skip it), so
+  "£" or accented product names no longer shift links into the wrong place
+- Each chunk's store is resolved once from its URL host (or its title, which
+  carries the domain when the URL is a grounding redirect), and only for
+  chunks the reply cites unless none of those is a Frasers page
+- The output is assembled once from slices of the reply rather than
+  re-spliced for every citation
+
+Replies grounded in the local catalogue link products directly;
+`catalog_links()` returns the catalogue products a reply links to.
+
+Benchmark: python -m benchmarks.bench_citations
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.catalog.products import STORES, Product
+
+_PRICE = re.compile(r"[£€$]\s?\d[\d,]*(?:\.\d{1,2})?")
+# Joining words and punctuation left between a product name and its price ("... at £24.99", "... - £30")
+_TAIL_WORDS = frozenset(("at", "for", "from", "is", "cost", "costs", "priced"))
+_TAIL_PUNCTUATION = " \t\n-–—:,("
+# Lead-ins before the name ("try the ...", "a ...")
+_NAME_LEAD = re.compile(r"\s*(?:(?:try|consider|go for|pick|add|grab|choose)\s+)?(?:(?:the|an?|some)\s+)?", re.IGNORECASE)
+_MARKDOWN = re.compile(r"[*_`]+")
+_UNRESOLVED = object()
+# Host of a URL, or a bare domain (grounding titles)
+_HOST = re.compile(r"\s*(?:[a-z][a-z0-9+.-]*://)?(?:[^/?#@\s]*@)?([^/?#:\s]*)")
+
+class Citation(NamedTuple):
+    url: str
+    store: str
+    title: Optional[str]
+    text: str   # the supported segment of the reply
+    start: int  # character offsets of the segment in the reply, before links were added
+    end: int
+
+class ProductLink(NamedTuple):
+    name: str
+    price: Optional[str]
+    store: str
+    url: str
+    brand: Optional[str] = None
+
+class RenderedReply(NamedTuple):
+    text: str
+    citations: List[Citation]
+    products: List[ProductLink]
+    frasers_links: bool  # whether grounding found any Frasers page
+
+def store_for(url: str, title: Optional[str] = None) -> Optional[str]:
+    """The Frasers store a URL (or, for redirect URLs, a domain-like title) belongs to, if any."""
+    for candidate in (url, title):
+        if not candidate:
+            continue
+        lowered = candidate.lower()
+        # Most grounding pages aren't Frasers ones: skip the host check unless a store domain appears at all
+        if not any(domain in lowered for domain in STORES):
+            continue
+        host = _HOST.match(lowered).group(1).rstrip(".")
+        while host:
+            store = STORES.get(host)
+            if store is not None:
+                return store
+            # Walk up the subdomains: www.houseoffraser.co.uk -> houseoffraser.co.uk -> co.uk
+            _, _, host = host.partition(".")
+    return None
+
+def char_offsets(text: str, byte_offsets: Iterable[int]) -> Dict[int, int]:
+    """Maps UTF-8 byte offsets into `text` to character offsets, decoding the text once in order."""
+    wanted = sorted(set(byte_offsets))
+    if text.isascii():
+        return {offset: min(max(offset, 0), len(text)) for offset in wanted}
+    encoded = text.encode("utf-8")
+    size = len(encoded)
+    positions = {}
+    chars = previous = 0
+    for offset in wanted:
+        end = offset if 0 <= offset <= size else (0 if offset < 0 else size)
+        # An offset inside a multi-byte character snaps back to its first byte
+        while previous < end < size and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        chars += len(encoded[previous:end].decode("utf-8"))
+        previous = end
+        positions[offset] = chars
+    return positions
+
+def _strip_tail(name: str) -> str:
+    while True:
+        name = name.rstrip(_TAIL_PUNCTUATION)
+        head, _, word = name.rpartition(" ")
+        if not head or word.lower() not in _TAIL_WORDS:
+            return name
+        name = head
+
+def _product(segment: str, store: str, url: str) -> Optional[ProductLink]:
+    match = _PRICE.search(segment)
+    if match is None:
+        return None
+    name = segment[:match.start()]
+    if "*" in name or "_" in name or "`" in name:
+        name = _MARKDOWN.sub("", name)
+    name = _strip_tail(name).removesuffix(f" from {store}")
+    # Only the clause that quotes the price names the product ("For the day, try the ...")
+    clause = max(name.rfind(", "), name.rfind("; "), name.rfind(": "), name.rfind("! "))
+    if clause >= 0:
+        name = name[clause + 2:]
+    name = name[_NAME_LEAD.match(name).end():].strip()
+    return ProductLink(name, match.group().replace(" ", ""), store, url) if name else None
+
+def render_citations(text: str, metadata) -> RenderedReply:
+    """Adds Frasers citation links to a grounded reply; `metadata` is the candidate's grounding_metadata."""
+    chunks = (metadata.grounding_chunks or []) if metadata is not None else []
+    # (store, url, title) per chunk, resolved at most once: the cited chunks first, then
+    # (only if none of those is a Frasers page) the rest until one is
+    count = len(chunks)
+    resolved: List = [_UNRESOLVED] * count
+
+    def chunk(i: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        web = chunks[i].web
+        resolved[i] = (store_for(web.uri, web.title), web.uri, web.title) if web else (None, None, None)
+        return resolved[i]
+
+    cited = []
+    byte_offsets = []
+    for support in (metadata.grounding_supports or []) if chunks else []:
+        segment = support.segment
+        if segment is None or segment.end_index is None:
+            continue
+        indices = []
+        for i in support.grounding_chunk_indices or ():
+            if 0 <= i < count and i not in indices:
+                info = resolved[i]
+                if (chunk(i) if info is _UNRESOLVED else info)[0]:
+                    indices.append(i)
+        if indices:
+            start = segment.start_index or 0
+            cited.append((start, segment.end_index, segment.text, indices))
+            byte_offsets += (start, segment.end_index)
+    if not cited:
+        return RenderedReply(text, [], [], any((chunk(i) if resolved[i] is _UNRESOLVED else resolved[i])[0]
+                                               for i in range(count)))
+
+    offsets = char_offsets(text, byte_offsets)
+    citations: List[Citation] = []
+    products: List[ProductLink] = []
+    # Products are read once per segment and chunk; repeats of either reuse the result
+    extracted: Dict[Tuple[str, int], Optional[ProductLink]] = {}
+    seen_products = set()
+    insertions = []
+    for order, (start, end, segment_text, indices) in enumerate(cited):
+        start, end = offsets[start], offsets[end]
+        segment_text = segment_text or text[start:end]
+        store, url, _ = resolved[indices[0]]
+        if len(indices) == 1:
+            links = f" [Link]({url})"
+        else:
+            links = " " + " ".join(f"[Link]({u})" for u in dict.fromkeys(resolved[i][1] for i in indices))
+        insertions.append((end, order, links))
+        for i in indices:
+            citations.append(Citation(resolved[i][1], resolved[i][0], resolved[i][2], segment_text, start, end))
+        key = (segment_text, indices[0])
+        if key in extracted:
+            continue
+        product = extracted[key] = _product(segment_text, store, url)
+        if product is not None and (product.name, product.url) not in seen_products:
+            seen_products.add((product.name, product.url))
+            products.append(product)
+
+    insertions.sort()
+    parts = []
+    previous = 0
+    for position, _, links in insertions:
+        parts.append(text[previous:position])
+        parts.append(links)
+        previous = position
+    parts.append(text[previous:])
+    return RenderedReply("".join(parts), citations, products, True)
+
+def catalog_links(text: str, products: Iterable[Product]) -> List[ProductLink]:
+    """Catalogue products the reply links to, in catalogue order."""
+    return [ProductLink(p.name, f"£{p.price:.2f}", p.store, p.url, p.brand) for p in products if p.url in text]
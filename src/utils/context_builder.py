@@ -0,0 +1,128 @@
+"""
+Token-budgeted context assembly for Retail Odyssey agents
+
+Replaces per-agent history slicing ([-20:], [-10:], content[:200], ...) with
+one rule: every prompt gets a token budget, and context is packed into it by
+priority, highest first:
+
+1. LATEST_USER_TURN - the shopper's current message (and its intent)
+2. PRODUCTS - catalog products retrieved for this request
+3. WARDROBE - VisionAgent's wardrobe description
+4. LAST_RECOMMENDATION - the outfit suggested most recently
+5. SUMMARY - the session's rolling summary of turns no longer sent verbatim
+   (passed as a history turn with role SUMMARY_ROLE)
+6. OLDER_TURNS - earlier conversation, newest first
+
+Kept items are emitted in the order they were added and joined once. The item
+that crosses the budget is truncated; everything after it is dropped. Fixed
+instructions (prefix/suffix) don't count against the budget but are included
+in the prompt-token metric.
+
+Budgets per agent: {AGENT}_CONTEXT_TOKENS (defaults below). Tokens are counted
+with tiktoken when it is installed, otherwise estimated at 4 characters each.
+"""
+
+import importlib.util
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+from src.utils.prometheus_metrics import prompt_tokens
+
+LATEST_USER_TURN, PRODUCTS, WARDROBE, LAST_RECOMMENDATION, SUMMARY, OLDER_TURNS = range(6)
+
+SUMMARY_ROLE = "Conversation summary"
+
+_DEFAULT_BUDGETS = {
+    "intent": 256,
+    "recommendation": 1024,
+    "conversation": 1536,
+    "summary": 2048,
+}
+
+# Below this many tokens a truncated item says too little to be worth sending
+_MIN_TRUNCATED_TOKENS = 16
+_CHARS_PER_TOKEN = 4
+
+if importlib.util.find_spec("tiktoken") is not None:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text, disallowed_special=()))
+
+    def truncate_tokens(text: str, max_tokens: int) -> str:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding.decode(tokens[:max_tokens]) + "…"
+else:
+    def count_tokens(text: str) -> int:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+    def truncate_tokens(text: str, max_tokens: int) -> str:
+        limit = max_tokens * _CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit] + "…"
+
+def context_budget(agent: str) -> int:
+    return int(os.getenv(f"{agent.upper()}_CONTEXT_TOKENS", str(_DEFAULT_BUDGETS.get(agent, 1024))))
+
+class ContextItem(NamedTuple):
+    text: str
+    priority: int
+    rank: int
+    role: Optional[str] = None
+
+class ContextBuilder:
+    def __init__(self, agent: str, budget: Optional[int] = None):
+        self.agent = agent
+        self.budget = context_budget(agent) if budget is None else budget
+        self._items: List[ContextItem] = []
+
+    def add(self, text: str, priority: int, max_tokens: Optional[int] = None) -> "ContextBuilder":
+        if text:
+            if max_tokens is not None:
+                text = truncate_tokens(text, max_tokens)
+            self._items.append(ContextItem(text, priority, len(self._items)))
+        return self
+
+    def add_turns(self, history: List[Dict], priority: int = OLDER_TURNS,
+                  max_tokens: Optional[int] = None) -> "ContextBuilder":
+        """Adds {"role", "content"} turns; when they don't all fit, the newest win."""
+        for position, turn in enumerate(history):
+            text = f"{turn['role']}: {turn['content']}"
+            if max_tokens is not None:
+                text = truncate_tokens(text, max_tokens)
+            # Within one priority, a lower rank is packed first: newest turn first
+            self._items.append(ContextItem(text, SUMMARY if turn["role"] == SUMMARY_ROLE else priority,
+                                           len(history) - position, turn["role"]))
+        return self
+
+    def pack(self) -> List[ContextItem]:
+        """Returns the items that fit the budget, in insertion order."""
+        remaining = self.budget
+        kept = []
+        for index in sorted(range(len(self._items)), key=lambda i: (self._items[i].priority, self._items[i].rank)):
+            item = self._items[index]
+            cost = count_tokens(item.text)
+            if cost > remaining:
+                if remaining >= _MIN_TRUNCATED_TOKENS:
+                    kept.append((index, item._replace(text=truncate_tokens(item.text, remaining))))
+                break
+            remaining -= cost
+            kept.append((index, item))
+        kept.sort()
+        return [item for _, item in kept]
+
+    def build(self, prefix: str = "", suffix: str = "", separator: str = "\n") -> str:
+        """Packs the context and joins it (with fixed prefix/suffix) into one prompt."""
+        parts = [item.text for item in self.pack()]
+        if prefix:
+            parts.insert(0, prefix)
+        if suffix:
+            parts.append(suffix)
+        prompt = separator.join(parts)
+        record_prompt_tokens(self.agent, prompt)
+        return prompt
+
+def record_prompt_tokens(agent: str, *parts: str) -> int:
+    tokens = sum(count_tokens(part) for part in parts)
+    prompt_tokens.labels(agent_name=agent).observe(tokens)
+    return tokens
@@ -0,0 +1,132 @@
+"""
+NumPy embedding store for wardrobe items and catalog products
+
+Each store is one contiguous float32 matrix of L2-normalized rows, so
+matching many queries against many items is a single matrix product
+(queries @ matrix.T) followed by a per-row top-k, not a Python loop.
+
+- Item embeddings fold the hashed text embeddings (src/utils/text_embedding.py)
+  down to ITEM_EMBEDDING_DIM dimensions (default 128; must divide 1024), which
+  keeps a 1M-product matrix at 512 MB
+- Stores can be saved as .npy and reopened memory-mapped (read-only), so a
+  large catalog matrix is paged in by the OS instead of loaded up front
+- top_k scans the matrix in row chunks, bounding the score buffer for huge
+  memory-mapped stores
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.utils.text_embedding import EMBEDDING_DIM, embed_sparse
+
+ITEM_EMBEDDING_DIM = int(os.getenv("ITEM_EMBEDDING_DIM", "128"))
+# Rows scored per matrix product in top_k
+_CHUNK_ROWS = 1 << 18
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+def fold_sparse(rows: np.ndarray, dims: np.ndarray, weights: np.ndarray, count: int,
+                dim: int = ITEM_EMBEDDING_DIM) -> np.ndarray:
+    """Folds sparse (row, dimension, weight) entries of hashed embeddings into a dense (count x dim) matrix."""
+    if EMBEDDING_DIM % dim:
+        raise ValueError(f"ITEM_EMBEDDING_DIM must divide {EMBEDDING_DIM}, got {dim}")
+    flat = rows.astype(np.int64) * dim + dims % dim
+    matrix = np.bincount(flat, weights, minlength=count * dim).astype(np.float32).reshape(count, dim)
+    return normalize_rows(matrix)
+
+def embed_texts(texts: Sequence[str], dim: int = ITEM_EMBEDDING_DIM) -> np.ndarray:
+    rows: List[int] = []
+    dims: List[int] = []
+    weights: List[float] = []
+    for i, text in enumerate(texts):
+        embedding: Dict[int, float] = embed_sparse(text)
+        rows.extend([i] * len(embedding))
+        dims.extend(embedding.keys())
+        weights.extend(embedding.values())
+    return fold_sparse(np.array(rows, dtype=np.int64), np.array(dims, dtype=np.int64),
+                       np.array(weights, dtype=np.float64), len(texts), dim)
+
+class EmbeddingStore:
+    """Append-only matrix of normalized embeddings; rows are addressed by insertion index."""
+
+    def __init__(self, dim: int = ITEM_EMBEDDING_DIM, capacity: int = 16):
+        self.dim = dim
+        self._data = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> "EmbeddingStore":
+        store = cls.__new__(cls)
+        store.dim = matrix.shape[1]
+        store._data = matrix
+        store.size = matrix.shape[0]
+        return store
+
+    @classmethod
+    def open(cls, path: str) -> "EmbeddingStore":
+        """Opens a saved store memory-mapped and read-only."""
+        return cls.from_matrix(np.load(path, mmap_mode="r"))
+
+    def save(self, path: str):
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(self.size, self.dim))
+        out[:] = self.matrix
+        out.flush()
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, vectors: np.ndarray) -> range:
+        """Appends rows (already normalized) and returns their row indices."""
+        needed = self.size + len(vectors)
+        if needed > len(self._data):
+            grown = np.zeros((max(needed, 2 * len(self._data)), self.dim), dtype=np.float32)
+            grown[:self.size] = self.matrix
+            self._data = grown
+        self._data[self.size:needed] = vectors
+        added = range(self.size, needed)
+        self.size = needed
+        return added
+
+    def clear(self):
+        self.size = 0
+
+    def top_k(self, queries: np.ndarray, k: int, exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cosine top-k rows for every query row: returns (indices, scores), each
+        (len(queries) x k), best first. `exclude` is an optional boolean row mask.
+        """
+        queries = np.atleast_2d(queries).astype(np.float32, copy=False)
+        k = min(k, self.size)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        if k == 0:
+            return best_rows, best_scores
+        for start in range(0, self.size, _CHUNK_ROWS):
+            chunk = self._data[start:min(start + _CHUNK_ROWS, self.size)]
+            # (rows x dim) @ (dim x queries) streams the chunk once, in storage order
+            scores = (chunk @ queries.T).T
+            if exclude is not None:
+                scores[:, exclude[start:start + len(chunk)]] = -np.inf
+            if len(chunk) > k:
+                part = np.argpartition(scores, len(chunk) - k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, part, axis=1)
+            else:
+                part = np.broadcast_to(np.arange(len(chunk)), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
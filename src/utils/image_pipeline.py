@@ -0,0 +1,120 @@
+"""
+Image Ingestion Pipeline for VisionAgent
+
+Turns an uploaded image (base64 data URL or HTTP URL) into a small JPEG the
+vision models can use, without blocking the event loop:
+
+1. Fetch: data URLs are decoded; HTTP URLs are streamed through one pooled
+   httpx client with a timeout and a hard byte cap (IMAGE_MAX_BYTES, default 10 MB)
+2. Dedupe: the raw bytes are SHA-256 hashed; a photo seen before skips decoding
+3. Decode + downscale: in a bounded thread pool (IMAGE_WORKERS, default 4), fix EXIF
+   orientation and shrink to IMAGE_MAX_SIDE pixels (default 1024), re-encoded as JPEG
+
+The content hash doubles as the VisionAgent response-cache key, so a
+re-uploaded wardrobe photo also skips model inference.
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+import httpx
+from PIL import Image, ImageOps
+
+MAX_IMAGE_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_IMAGE_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+JPEG_QUALITY = 85
+
+class PreparedImage(NamedTuple):
+    content_hash: str
+    jpeg_bytes: bytes
+    width: int
+    height: int
+
+    def data_url(self) -> str:
+        return "data:image/jpeg;base64," + base64.b64encode(self.jpeg_bytes).decode("ascii")
+
+class ImageTooLargeError(ValueError):
+    pass
+
+_http_client: Optional[httpx.AsyncClient] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_prepared: "OrderedDict[str, PreparedImage]" = OrderedDict()
+_PREPARED_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "256"))
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+            follow_redirects=True,
+        )
+    return _http_client
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("IMAGE_WORKERS", "4")), thread_name_prefix="image-decode"
+        )
+    return _executor
+
+async def fetch_image_bytes(image_url: str) -> bytes:
+    if image_url.startswith("data:image"):
+        _, encoded = image_url.split(",", 1)
+        # Base64 is 4/3 the size of the payload it carries
+        if len(encoded) * 3 // 4 > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(f"Image exceeds {MAX_IMAGE_BYTES} bytes")
+        return base64.b64decode(encoded)
+
+    async with get_http_client().stream("GET", image_url) as response:
+        response.raise_for_status()
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(f"Image exceeds {MAX_IMAGE_BYTES} bytes")
+        buffer = bytearray()
+        async for chunk in response.aiter_bytes():
+            buffer.extend(chunk)
+            if len(buffer) > MAX_IMAGE_BYTES:
+                raise ImageTooLargeError(f"Image exceeds {MAX_IMAGE_BYTES} bytes")
+        return bytes(buffer)
+
+def _downscale(raw: bytes, content_hash: str) -> PreparedImage:
+    with Image.open(BytesIO(raw)) as img:
+        img.draft("RGB", (MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))  # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+        out = BytesIO()
+        img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return PreparedImage(content_hash, out.getvalue(), img.width, img.height)
+
+async def prepare_image(image_url: str) -> PreparedImage:
+    """Fetches, dedupes and downscales an image for the vision models."""
+    raw = await fetch_image_bytes(image_url)
+    content_hash = hashlib.sha256(raw).hexdigest()
+
+    prepared = _prepared.get(content_hash)
+    if prepared is not None:
+        _prepared.move_to_end(content_hash)
+        return prepared
+
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(_get_executor(), _downscale, raw, content_hash)
+    _prepared[content_hash] = prepared
+    while len(_prepared) > _PREPARED_CACHE_SIZE:
+        _prepared.popitem(last=False)
+    return prepared
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
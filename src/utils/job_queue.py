@@ -0,0 +1,199 @@
+"""
+In-process background job queue
+
+Slow, optional work (outfit image generation) runs here instead of inside the
+chat request: submit() returns a Job with an ID straight away, a fixed pool of
+worker tasks runs jobs in arrival order, and callers look jobs up by ID or
+await them.
+
+- Workers start lazily on the first submit (they need a running event loop)
+- A token bucket caps job starts per minute, independently of chat traffic
+- Submissions beyond the queue bound are rejected (JobQueueFull) rather than
+  queued behind work that would never start in time
+- Finished jobs are kept for a TTL so status lookups and late SSE
+  subscribers still find them
+- `listeners` are called with the job whenever its status changes (e.g. to
+  mirror status to a shared store for other workers)
+- Each job runs in a copy of the submitter's context: its `job.<kind>` span
+  nests under the span that submitted it (so its work shows up in the
+  originating request's trace) and its model calls are charged to the
+  submitting session's usage
+"""
+
+import asyncio
+import contextvars
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.utils.prometheus_metrics import background_jobs, job_queue_depth, job_wait_time
+from src.utils.tracing import span
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class JobQueueFull(RuntimeError):
+    pass
+
+class Job:
+    __slots__ = ("id", "kind", "payload", "status", "result", "error", "created", "started", "finished",
+                 "_on_done", "_done", "_context")
+
+    def __init__(self, kind: str, payload: Any, on_done: Optional[Callable[["Job"], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.status = QUEUED
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._on_done = on_done
+        self._done = asyncio.Event()
+        self._context = contextvars.copy_context()
+
+    def to_dict(self) -> Dict:
+        return {"job_id": self.id, "kind": self.kind, "status": self.status, "result": self.result,
+                "error": self.error, "created": self.created, "started": self.started, "finished": self.finished}
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the job finishes (or `timeout` passes); True if it has finished."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self._done.is_set()
+
+class RateLimiter:
+    """Token bucket allowing `per_minute` starts, with bursts of up to a tenth of that."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, per_minute / 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class JobQueue:
+    def __init__(self, kind: str, handler: Callable[[Any], Awaitable[Dict]], workers: int = 2,
+                 per_minute: float = 0, max_queued: int = 100, timeout: Optional[float] = None,
+                 ttl: float = 3600):
+        self.kind = kind
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.ttl = ttl
+        self._limiter = RateLimiter(per_minute)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.listeners: List[Callable[[Job], None]] = []
+
+    def _notify(self, job: Job):
+        for listener in self.listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"JobQueue {self.kind}: listener failed: {e!r}")
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            # Workers outlive the request that happened to start them, so they don't inherit its context
+            self._tasks = [contextvars.Context().run(asyncio.create_task, self._worker()) for _ in range(self.workers)]
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        # Jobs are ordered by submission, so the oldest finished ones come first
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.finished is None or job.finished > cutoff:
+                break
+            self._jobs.popitem(last=False)
+
+    def submit(self, payload: Any, on_done: Optional[Callable[[Job], None]] = None) -> Job:
+        """Queues a job and returns it immediately; raises JobQueueFull past `max_queued` waiting jobs."""
+        self._start()
+        self._prune()
+        if self._queue.qsize() >= self.max_queued:
+            background_jobs.labels(kind=self.kind, outcome="rejected").inc()
+            raise JobQueueFull(f"{self.kind}: {self._queue.qsize()} jobs already waiting")
+        job = Job(self.kind, payload, on_done)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        job_queue_depth.labels(kind=self.kind).set(self._queue.qsize())
+        self._notify(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a job that hasn't started yet; running jobs finish normally."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != QUEUED:
+            return False
+        self._finish(job, FAILED, error="cancelled")
+        return True
+
+    def _finish(self, job: Job, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        job.status, job.result, job.error = status, result, error
+        job.finished = time.time()
+        job._done.set()
+        background_jobs.labels(kind=self.kind, outcome=status).inc()
+        self._notify(job)
+        if job._on_done:
+            try:
+                job._on_done(job)
+            except Exception as e:
+                print(f"JobQueue {self.kind}: completion callback failed: {e!r}")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job_queue_depth.labels(kind=self.kind).set(self._queue.qsize())
+            if job.status != QUEUED:
+                continue
+            await self._limiter.acquire()
+            if job.status != QUEUED:
+                continue
+            job.status = RUNNING
+            job.started = time.time()
+            job_wait_time.labels(kind=self.kind).observe(job.started - job.created)
+            self._notify(job)
+            try:
+                result = await asyncio.create_task(self._run(job), context=job._context)
+            except asyncio.CancelledError:
+                self._finish(job, FAILED, error="cancelled")
+                raise
+            except asyncio.TimeoutError:
+                self._finish(job, FAILED, error="timed out")
+            except Exception as e:
+                print(f"JobQueue {self.kind}: job {job.id} failed: {e!r}")
+                self._finish(job, FAILED, error=str(e) or type(e).__name__)
+            else:
+                self._finish(job, DONE, result)
+
+    async def _run(self, job: Job) -> Dict:
+        with span(f"job.{self.kind}", job_id=job.id, wait_ms=round((job.started - job.created) * 1e3, 2)):
+            return await asyncio.wait_for(self.handler(job.payload), self.timeout)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
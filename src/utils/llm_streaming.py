@@ -0,0 +1,61 @@
+"""
+Streaming helpers for Retail Odyssey agents
+
+Agents that accept an `on_delta` callback request streaming responses and
+forward each text chunk as it arrives, then return the full text so the
+usual post-processing (competitor filter, citations) still runs once.
+The first chunk is reported as time-to-first-token and usage from the final
+chunks as token counts (src/providers/telemetry.py); OpenAI streams only
+carry usage when requested with `stream_options={"include_usage": True}`.
+`on_end`, when given, is called once the stream has finished (e.g. to flush
+text a filter held back).
+"""
+
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.providers.telemetry import record_first_token, record_usage
+
+async def collect_gemini_stream(stream, on_delta: Callable[[str], None],
+                                on_end: Optional[Callable[[], None]] = None) -> Tuple[str, List[Any]]:
+    """Forwards every text chunk of a Gemini stream; returns (full text, all chunks)."""
+    parts = []
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk)
+        try:
+            delta = chunk.text
+        except (ValueError, AttributeError):
+            # Chunks without text parts (e.g. final grounding metadata) raise in the old SDK
+            delta = None
+        if delta:
+            if not parts:
+                record_first_token()
+            parts.append(delta)
+            on_delta(delta)
+    if on_end is not None:
+        on_end()
+    # Every chunk may carry running usage; the last one has the totals
+    usage_chunk = next((c for c in reversed(chunks) if getattr(c, "usage_metadata", None)), None)
+    if usage_chunk is not None:
+        record_usage(usage_chunk)
+    return "".join(parts), chunks
+
+async def collect_openai_stream(stream, on_delta: Callable[[str], None],
+                                on_end: Optional[Callable[[], None]] = None) -> str:
+    """Forwards every content delta of an OpenAI chat completion stream; returns the full text."""
+    parts = []
+    async for chunk in stream:
+        if not chunk.choices:
+            # The usage chunk (include_usage) comes last, with no choices
+            if getattr(chunk, "usage", None):
+                record_usage(chunk)
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if not parts:
+                record_first_token()
+            parts.append(delta)
+            on_delta(delta)
+    if on_end is not None:
+        on_end()
+    return "".join(parts)
@@ -3,24 +3,60 @@ Prometheus Metrics for Retail Odyssey
 
 Tracks system performance and business metrics:
 - Agent call counts and response times
+- Provider latency, queueing, time to first token, token usage and fallbacks per model
+- Token totals, estimated spend and budget downgrades per agent and model
+- Model tier selections, latency and reply quality per agent (tier A/B tests)
 - Total requests and user sessions
 - Brand mentions and competitor blocks
 - Product recommendations and pricing
+
+With several workers, set PROMETHEUS_MULTIPROC_DIR (an empty directory, cleared
+on start) before launch: each worker writes its samples there and /metrics
+aggregates them. Gauges declare how worker values combine.
 """
 
+import os
+
 from prometheus_client import Counter, Histogram, Gauge, generate_latest
 
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
 # System Performance Metrics
 agent_calls = Counter('retail_odyssey_agent_calls', 'Agent call count', ['agent_name'])
 total_requests = Counter('retail_odyssey_total_requests', 'Total requests')
 response_time = Histogram('retail_odyssey_response_time', 'Response time in seconds', ['agent_name'])
+conversation_summaries = Counter('retail_odyssey_conversation_summaries', 'Rolling session summary updates by tier (llm, extractive)', ['tier'])
+prompt_tokens = Histogram('retail_odyssey_prompt_tokens', 'Prompt tokens sent per model call', ['agent_name'], buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192))
+cache_requests = Counter('retail_odyssey_cache_requests', 'Response cache lookups by result (hit, similar_hit, miss)', ['agent_name', 'result'])
+cache_latency_saved = Counter('retail_odyssey_cache_latency_saved_seconds', 'Model latency avoided by response cache hits', ['agent_name'])
+provider_calls = Counter('retail_odyssey_provider_calls', 'Provider attempts by outcome (ok, error, timeout, cancelled)', ['agent_name', 'provider', 'outcome'])
+hedged_requests = Counter('retail_odyssey_hedged_requests', 'Hedged second provider requests started', ['agent_name'])
+circuit_open = Gauge('retail_odyssey_circuit_open', '1 while a provider circuit breaker is open', ['provider'], multiprocess_mode='livemax')
+coalesced_requests = Counter('retail_odyssey_coalesced_requests', 'Agent calls that joined an identical in-flight call (joined) or ran alone at the waiter limit (overflow)', ['agent_name', 'result'])
+background_jobs = Counter('retail_odyssey_background_jobs', 'Background jobs by kind and outcome (done, failed, rejected)', ['kind', 'outcome'])
+job_queue_depth = Gauge('retail_odyssey_job_queue_depth', 'Background jobs waiting for a worker', ['kind'], multiprocess_mode='livesum')
+job_wait_time = Histogram('retail_odyssey_job_wait_seconds', 'Time background jobs wait before a worker starts them', ['kind'])
+intent_classifications = Counter('retail_odyssey_intent_classifications', 'Intent classifications by tier (rules, local_model, llm, keyword)', ['tier'])
+provider_latency = Histogram('retail_odyssey_provider_latency_seconds', 'Successful provider call latency per agent and model', ['agent_name', 'provider', 'model'], buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64))
+provider_queue_time = Histogram('retail_odyssey_provider_queue_seconds', 'Time calls wait for a provider concurrency slot', ['provider'], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+time_to_first_token = Histogram('retail_odyssey_time_to_first_token_seconds', 'Time from sending a streamed request to its first text chunk', ['agent_name', 'provider', 'model'], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16))
+model_tokens = Histogram('retail_odyssey_model_tokens', 'Prompt and completion tokens per model call, from provider usage metadata', ['agent_name', 'provider', 'model', 'kind'], buckets=(16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384))
+provider_fallbacks = Counter('retail_odyssey_provider_fallbacks', 'Failed or timed-out model calls by what answered instead (next_route, default)', ['agent_name', 'provider', 'model', 'to'])
+token_usage = Counter('retail_odyssey_tokens', 'Prompt and completion tokens billed per agent and model', ['agent_name', 'provider', 'model', 'kind'])
+model_cost = Counter('retail_odyssey_model_cost_usd', 'Estimated model spend in USD per agent and model, from config/model_pricing.json', ['agent_name', 'provider', 'model'])
+tier_selections = Counter('retail_odyssey_tier_selections', 'Model tier picked per agent call and provider route by reason (policy, complex, slo, ab)', ['agent_name', 'provider', 'tier', 'reason'])
+tier_latency = Histogram('retail_odyssey_tier_latency_seconds', 'Successful call latency per agent and model tier', ['agent_name', 'tier', 'model'], buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32))
+tier_quality = Histogram('retail_odyssey_tier_quality', 'Reply quality score (0-1) per agent and model tier', ['agent_name', 'tier', 'model'], buckets=(0, 0.25, 0.5, 0.75, 1))
+budget_downgrades = Counter('retail_odyssey_budget_downgrades', 'Model calls switched to a cheaper model because the session was over its budget', ['agent_name', 'model'])
 
 # Business metrics
 brand_mentions = Counter('retail_odyssey_brand_mentions', 'Brand mention count', ['brand_name'])
 competitor_blocks = Counter('retail_odyssey_competitor_blocks', 'Competitor mentions blocked')
 product_recommendations = Counter('retail_odyssey_product_recommendations', 'Products recommended')
-average_outfit_price = Gauge('retail_odyssey_avg_outfit_price', 'Average outfit price in GBP')
+average_outfit_price = Gauge('retail_odyssey_avg_outfit_price', 'Average outfit price in GBP', multiprocess_mode='mostrecent')
 user_sessions = Counter('retail_odyssey_user_sessions', 'Total user sessions')
+active_sessions = Gauge('retail_odyssey_active_sessions', 'Sessions currently held in memory', multiprocess_mode='livesum')
 messages_per_session = Histogram('retail_odyssey_messages_per_session', 'Messages per session')
 
 def export_metrics():
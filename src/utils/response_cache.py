@@ -0,0 +1,214 @@
+"""
+Response Cache for Retail Odyssey agents
+
+Sits in front of IntentAgent, RecommendationAgent and ConversationAgent so
+identical (or near-identical) requests skip the model call entirely.
+
+- Exact-match keys: SHA-256 of the normalized key parts (e.g. request + occasion + style)
+- Optional similarity lookup: the first key part is embedded and compared against
+  cached entries sharing the remaining parts (RESPONSE_CACHE_SEMANTIC_THRESHOLD)
+- TTL and size-based LRU eviction
+- Backends: in-memory (default) or local SQLite file (RESPONSE_CACHE_BACKEND=sqlite)
+
+Configuration:
+- RESPONSE_CACHE_BACKEND: memory | sqlite | off (default memory)
+- RESPONSE_CACHE_PATH: SQLite file (default .cache/responses.sqlite3)
+- RESPONSE_CACHE_TTL_SECONDS: entry lifetime (default 3600)
+- RESPONSE_CACHE_MAX_ENTRIES: entries kept per agent (default 2000)
+- RESPONSE_CACHE_SEMANTIC_THRESHOLD: cosine similarity for near matches (unset = exact only)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.utils.prometheus_metrics import cache_requests, cache_latency_saved
+from src.utils.text_embedding import embed_sparse, cosine_sparse
+from src.utils.tracing import span
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(value: Any) -> str:
+    return _WHITESPACE.sub(" ", str(value or "")).strip().lower().rstrip("?!.")
+
+class MemoryCacheBackend:
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, cost = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value, cost
+
+    def set(self, key: str, value: Any, cost: float, ttl: float):
+        self._entries[key] = (time.time() + ttl, value, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class SQLiteCacheBackend:
+    """One table per agent namespace; values stored as JSON."""
+    blocking = True
+
+    def __init__(self, path: str, namespace: str, max_entries: int):
+        self.max_entries = max_entries
+        self.table = f"cache_{re.sub(r'[^a-z0-9_]', '_', namespace.lower())}"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, cost REAL NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_lru ON {self.table} (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, cost, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, cost: float, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, cost, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), cost, now + ttl, now),
+            )
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+class ResponseCache:
+    def __init__(self, agent: str, backend, ttl: float, semantic_threshold: Optional[float] = None):
+        self.agent = agent
+        self.backend = backend
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        # bucket (hash of the non-text key parts) -> OrderedDict[key, embedding]
+        self._semantic: Dict[str, "OrderedDict[str, Dict[int, float]]"] = {}
+
+    def key(self, *parts) -> Tuple[str, str, str]:
+        """Returns (exact key, similarity bucket, normalized text) for the given key parts."""
+        normalized = [normalize_text(p) for p in parts]
+        exact = hashlib.sha256("\x1f".join([self.agent, *normalized]).encode("utf-8")).hexdigest()
+        bucket = hashlib.sha256("\x1f".join(normalized[1:]).encode("utf-8")).hexdigest()
+        return exact, bucket, normalized[0] if normalized else ""
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get(self, key: Tuple[str, str, str]) -> Optional[Any]:
+        with span("cache.get", agent=self.agent) as lookup:
+            hit, result = await self._lookup(key)
+            lookup.set(result=result)
+        cache_requests.labels(agent_name=self.agent, result=result).inc()
+        if hit is None:
+            return None
+        cache_latency_saved.labels(agent_name=self.agent).inc(hit[1])
+        return hit[0]
+
+    async def _lookup(self, key: Tuple[str, str, str]) -> Tuple[Optional[Tuple[Any, float]], str]:
+        exact, bucket, text = key
+        hit = await self._call(self.backend.get, exact)
+        if hit is not None:
+            return hit, "hit"
+
+        if self.semantic_threshold and text and bucket in self._semantic:
+            query = embed_sparse(text)
+            best_key, best_score = None, self.semantic_threshold
+            for candidate, embedding in self._semantic[bucket].items():
+                score = cosine_sparse(query, embedding)
+                if score >= best_score:
+                    best_key, best_score = candidate, score
+            if best_key is not None:
+                hit = await self._call(self.backend.get, best_key)
+                if hit is not None:
+                    return hit, "similar_hit"
+                del self._semantic[bucket][best_key]
+
+        return None, "miss"
+
+    async def set(self, key: Tuple[str, str, str], value: Any, cost: float):
+        """Stores a successful response; `cost` is the seconds it took to produce."""
+        exact, bucket, text = key
+        await self._call(self.backend.set, exact, value, cost, self.ttl)
+        if self.semantic_threshold and text:
+            entries = self._semantic.setdefault(bucket, OrderedDict())
+            entries[exact] = embed_sparse(text)
+            entries.move_to_end(exact)
+            while len(entries) > self.backend.max_entries:
+                entries.popitem(last=False)
+
+class _DisabledCache:
+    def key(self, *parts):
+        return None
+
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value, cost):
+        pass
+
+_caches: Dict[str, Any] = {}
+
+def get_cache(agent: str):
+    """Returns the shared cache for an agent, built from the environment on first use."""
+    cache = _caches.get(agent)
+    if cache is not None:
+        return cache
+
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    threshold = os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD")
+
+    if backend_name == "off":
+        cache = _DisabledCache()
+    else:
+        if backend_name == "sqlite":
+            path = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3")
+            backend = SQLiteCacheBackend(path, agent, max_entries)
+        else:
+            backend = MemoryCacheBackend(max_entries)
+        cache = ResponseCache(agent, backend, ttl, float(threshold) if threshold else None)
+    _caches[agent] = cache
+    return cache
@@ -0,0 +1,105 @@
+"""
+Single-flight request coalescing for Retail Odyssey agents
+
+When many shoppers send the same prompt at once ("what to wear to
+Wimbledon"), only the first call goes upstream; identical calls that arrive
+while it is in flight await the same result instead of starting their own.
+
+- Keys are the agent's normalized inputs (same normalization as the response cache)
+- The shared call runs in its own task, so a leader whose client disconnects
+  doesn't cancel the answer other waiters are waiting for
+- Streaming: followers get the text streamed so far replayed, then live deltas;
+  if the leader isn't streaming, followers that want deltas get the final text
+  (the result, or its "text" field for structured replies) as one chunk
+- SINGLE_FLIGHT_MAX_WAITERS (default 256) caps waiters per key; further callers
+  run on their own. 0 disables coalescing
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.utils.prometheus_metrics import coalesced_requests
+from src.utils.response_cache import normalize_text
+
+DeltaCallback = Callable[[str], None]
+
+class _Flight:
+    __slots__ = ("task", "waiters", "streaming", "parts", "listeners")
+
+    def __init__(self, streaming: bool):
+        self.task: Optional[asyncio.Future] = None
+        self.waiters = 0
+        self.streaming = streaming
+        self.parts: List[str] = []
+        self.listeners: List[DeltaCallback] = []
+
+    def broadcast(self, delta: str):
+        self.parts.append(delta)
+        for listener in list(self.listeners):
+            listener(delta)
+
+class SingleFlight:
+    def __init__(self, agent: str, max_waiters: int):
+        self.agent = agent
+        self.max_waiters = max_waiters
+        self._flights: Dict[Tuple[str, ...], _Flight] = {}
+
+    async def do(self, key_parts: tuple, fn: Callable[[Optional[DeltaCallback]], Awaitable[Any]],
+                 on_delta: Optional[DeltaCallback] = None) -> Any:
+        """
+        Runs `fn(on_delta)` once per set of identical in-flight `key_parts`.
+        `fn` receives the delta callback to stream through (None when not streaming).
+        """
+        if self.max_waiters <= 0:
+            return await fn(on_delta)
+        key = tuple(normalize_text(part) for part in key_parts)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            if flight.waiters >= self.max_waiters:
+                coalesced_requests.labels(agent_name=self.agent, result="overflow").inc()
+                return await fn(on_delta)
+            coalesced_requests.labels(agent_name=self.agent, result="joined").inc()
+            return await self._wait(flight, on_delta, replay=True)
+
+        flight = _Flight(streaming=on_delta is not None)
+        self._flights[key] = flight
+        flight.task = asyncio.ensure_future(fn(flight.broadcast if flight.streaming else None))
+
+        def release(task):
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            # Every waiter may have been cancelled before the call failed; retrieve its
+            # exception here so asyncio doesn't log "Task exception was never retrieved"
+            if not task.cancelled():
+                task.exception()
+        flight.task.add_done_callback(release)
+        return await self._wait(flight, on_delta, replay=False)
+
+    async def _wait(self, flight: _Flight, on_delta: Optional[DeltaCallback], replay: bool) -> Any:
+        flight.waiters += 1
+        subscribed = on_delta is not None and flight.streaming
+        if subscribed:
+            if replay and flight.parts:
+                on_delta("".join(flight.parts))
+            flight.listeners.append(on_delta)
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if subscribed:
+                flight.listeners.remove(on_delta)
+        if on_delta is not None and not flight.streaming:
+            text = result.get("text") if isinstance(result, dict) else result
+            if isinstance(text, str):
+                on_delta(text)
+        return result
+
+_flights: Dict[str, SingleFlight] = {}
+
+def get_single_flight(agent: str) -> SingleFlight:
+    flight = _flights.get(agent)
+    if flight is None:
+        flight = _flights[agent] = SingleFlight(agent, int(os.getenv("SINGLE_FLIGHT_MAX_WAITERS", "256")))
+    return flight
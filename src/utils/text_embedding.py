@@ -0,0 +1,43 @@
+"""
+Lightweight text embeddings for Retail Odyssey
+
+Hashed bag-of-words + character trigram vectors: no model download, no API
+call, deterministic across processes. Good enough to spot near-identical
+shopper requests ("smart casual outfit for a wedding" vs "smart-casual
+wedding outfit"); not a substitute for a semantic model.
+"""
+
+import math
+import re
+import zlib
+from typing import Dict
+
+EMBEDDING_DIM = 1024
+
+_WORD = re.compile(r"[a-z0-9£$€']+")
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes, unlike hash() on str
+    return zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIM
+
+def embed_sparse(text: str) -> Dict[int, float]:
+    """Returns an L2-normalized sparse vector {dimension: weight}."""
+    vector: Dict[int, float] = {}
+    words = _WORD.findall(text.lower())
+    for word in words:
+        index = _bucket("w:" + word)
+        vector[index] = vector.get(index, 0.0) + 1.0
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            index = _bucket("c:" + padded[i:i + 3])
+            vector[index] = vector.get(index, 0.0) + 0.5
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    if norm:
+        for index in vector:
+            vector[index] /= norm
+    return vector
+
+def cosine_sparse(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
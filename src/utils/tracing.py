@@ -0,0 +1,163 @@
+"""
+Request tracing for Retail Odyssey
+
+OpenTelemetry-style spans without the SDK: each API request opens a root span
+with a fresh 128-bit trace ID (returned to the client as `trace_id`), and
+every stage under it opens a child span: session lock and load, agent graph
+steps, prompt building, cache lookups, provider queueing and calls
+(including router fallbacks and hedges) and post-processing. The current span
+lives in a contextvar, so spans opened in asyncio tasks nest under the span
+that created the task.
+
+- TRACE_EXPORTER: off (default), console, file, or console,file
+- TRACE_FILE: JSON-lines file for the file exporter (default traces.jsonl)
+- TRACE_SAMPLE_RATE: share of traces exported (default 1.0); trace IDs are
+  issued for every request either way
+
+Exported records use OTLP field names (traceId, spanId, parentSpanId,
+startTimeUnixNano, ...) so they can be loaded into OpenTelemetry tooling.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+import orjson
+
+_current: ContextVar[Optional["Span"]] = ContextVar("retail_odyssey_span", default=None)
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status",
+                 "sampled")
+
+    def __init__(self, name: str, parent: Optional["Span"], sampled: bool, attributes: Dict[str, Any],
+                 trace_id: Optional[str] = None):
+        self.trace_id = parent.trace_id if parent else trace_id or new_trace_id()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.sampled = sampled
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration * 1e3, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class SpanExporter:
+    """Writes finished spans as JSON lines to stdout and/or a file."""
+
+    def __init__(self, console: bool, path: Optional[str]):
+        self.console = console
+        self._file = open(path, "ab") if path else None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = orjson.dumps(span.to_dict(), default=str)
+        if self.console:
+            print(line.decode())
+        if self._file is not None:
+            with self._lock:
+                self._file.write(line + b"\n")
+                # Flush once per trace rather than per span
+                if span.parent_id is None:
+                    self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+_exporter: Optional[SpanExporter] = None
+_configured = False
+
+def get_exporter() -> Optional[SpanExporter]:
+    global _exporter, _configured
+    if not _configured:
+        _configured = True
+        targets = {t.strip() for t in os.getenv("TRACE_EXPORTER", "off").lower().split(",")}
+        console, to_file = "console" in targets, "file" in targets
+        if console or to_file:
+            _exporter = SpanExporter(console, os.getenv("TRACE_FILE", "traces.jsonl") if to_file else None)
+    return _exporter
+
+def _sample() -> bool:
+    if get_exporter() is None:
+        return False
+    rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    return rate >= 1 or random.random() < rate
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace_id if span else None
+
+@contextmanager
+def span(name: str, parent: Optional[Span] = None, trace_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+    """
+    Opens a span under `parent` (default: the current span); without either it
+    starts a new trace (with `trace_id` if given). Exceptions mark the span as
+    failed and propagate.
+    """
+    parent = parent or _current.get()
+    current = Span(name, parent, parent.sampled if parent else _sample(), attributes, trace_id)
+    token = _current.set(current)
+    try:
+        yield current
+    except asyncio.CancelledError:
+        current.status = "cancelled"
+        raise
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = repr(e)[:300]
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current.reset(token)
+        exporter = get_exporter() if current.sampled else None
+        if exporter is not None:
+            exporter.export(current)
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+    """Opens the root span of a new trace, whatever span is current."""
+    token = _current.set(None)
+    try:
+        with span(name, trace_id=trace_id, **attributes) as root:
+            yield root
+    finally:
+        _current.reset(token)
+
+def close_tracing():
+    global _exporter, _configured
+    if _exporter is not None:
+        _exporter.close()
+    _exporter, _configured = None, False
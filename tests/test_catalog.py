@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import pytest
+
+from src.catalog import CatalogQuery, ProductCatalog, load_products, parse_price_range
+
+SAMPLE = Path(__file__).resolve().parent.parent / "data" / "catalog" / "frasers_sample.csv"
+
+@pytest.fixture(scope="module")
+def products():
+    return load_products(SAMPLE)
+
+@pytest.fixture(scope="module")
+def catalog(products):
+    return ProductCatalog(products)
+
+@pytest.mark.parametrize("text, expected", [
+    ("something under £50", (None, 50.0)),
+    ("up to 80 quid", (None, 80.0)),
+    ("budget of 100 pounds", (None, 100.0)),
+    ("over $30.50 is fine", (30.5, None)),
+    ("at least €40", (40.0, None)),
+    ("between £40 and £90", (40.0, 90.0)),
+    ("£90-40", (40.0, 90.0)),
+    ("50 to 80 quid", (50.0, 80.0)),
+    ("from £20 up to £60", (20.0, 60.0)),
+    ("a smart blazer", (None, None)),
+])
+def test_parse_price_range(text, expected):
+    assert parse_price_range(text) == expected
+
+@pytest.mark.parametrize("text", [
+    "dinner with up to 6 friends",
+    "party for over 18s",
+    "running from 5k to 10k",
+    "between 2 and 3 outfits",
+])
+def test_parse_price_range_needs_a_currency(text):
+    assert parse_price_range(text) == (None, None)
+
+def test_from_request_drops_unknown_facets():
+    query = CatalogQuery.from_request("a dress under £80", occasion="wedding", style="bold")
+    assert (query.occasion, query.style, query.min_price, query.max_price) == (None, "bold", None, 80.0)
+
+def test_load_sample_feed(products):
+    assert len(products) == 39
+    blazer = next(p for p in products if p.name == "Linen Blend Blazer")
+    assert blazer.store == "House of Fraser"
+    assert blazer.colours == ("stone", "navy")
+    # Untagged rows get occasions and styles inferred from the name and category
+    assert "business" in blazer.occasions
+    assert blazer.styles == ("minimalist",)
+
+def test_index_build(catalog, products):
+    assert len(catalog) == len(products)
+    assert len(catalog.prices) == len(products)
+    assert len(catalog.item_vectors) == len(products)
+    assert catalog.vector_index_bytes > 0
+
+def test_search_ranks_by_text(catalog):
+    results = catalog.search(CatalogQuery("leather chelsea boots"), k=3)
+    assert results[0].name == "Leather Chelsea Boots"
+
+def test_search_filters_by_occasion_and_style(catalog):
+    results = catalog.search(CatalogQuery("something to wear", occasion="workout"), k=3)
+    assert len(results) == 3
+    assert all("workout" in p.occasions for p in results)
+    results = catalog.search(CatalogQuery("dress", occasion="party", style="bold"), k=2)
+    assert all("party" in p.occasions and "bold" in p.styles for p in results)
+
+def test_search_relaxes_style_but_not_price(catalog):
+    # Too few bold business products: the style filter is dropped, the occasion kept
+    results = catalog.search(CatalogQuery("work outfit", occasion="business", style="bold"), k=4)
+    assert len(results) == 4
+    assert all("business" in p.occasions for p in results)
+    # Prices are never relaxed, even when that leaves fewer than k products
+    results = catalog.search(CatalogQuery.from_request("a suit over £300"), k=5)
+    assert [p.name for p in results] == ["Double Breasted Blazer"]
+
+def test_search_price_range(catalog):
+    query = CatalogQuery.from_request("trainers between £50 and £120")
+    results = catalog.search(query, k=5)
+    assert results
+    assert all(50 <= p.price <= 120 for p in results)
+    assert results[0].category == "trainers"
+
+def test_search_with_no_match(catalog):
+    assert catalog.search(CatalogQuery.from_request("anything under £5")) == []
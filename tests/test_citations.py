@@ -0,0 +1,104 @@
+from google.genai import types
+
+from src.catalog.products import Product
+from src.utils.citations import Citation, ProductLink, catalog_links, char_offsets, render_citations, store_for
+
+HOF = "https://www.houseoffraser.co.uk/men/blazers/navy-wool-blazer"
+FLANNELS = "https://www.flannels.com/men/trousers/cafe-creme-chinos"
+BLOG = "https://www.example-blog.com/best-blazers"
+
+def grounding(text, supports, urls=(HOF, FLANNELS, BLOG), titles=None):
+    """Grounding metadata citing `supports`: (segment, chunk indices) pairs, with byte offsets as Gemini sends them."""
+    titles = titles or [None] * len(urls)
+    chunks = [types.GroundingChunk(web=types.GroundingChunkWeb(uri=url, title=title)) for url, title in zip(urls, titles)]
+    grounding_supports = []
+    for segment, indices in supports:
+        start = len(text[:text.index(segment)].encode("utf-8"))
+        grounding_supports.append(types.GroundingSupport(
+            segment=types.Segment(start_index=start, end_index=start + len(segment.encode("utf-8")), text=segment),
+            grounding_chunk_indices=indices,
+        ))
+    return types.GroundingMetadata(grounding_chunks=chunks, grounding_supports=grounding_supports)
+
+def test_char_offsets_ascii():
+    assert char_offsets("plain text", [0, 5, 10, 99]) == {0: 0, 5: 5, 10: 10, 99: 10}
+
+def test_char_offsets_multibyte():
+    text = "Café at £25. Suède boots €90."
+    encoded = text.encode("utf-8")
+    offsets = [len(text[:i].encode("utf-8")) for i in range(len(text) + 1)]
+    assert char_offsets(text, offsets) == {offset: i for i, offset in enumerate(offsets)}
+    assert len(encoded) > len(text)
+
+def test_char_offsets_inside_a_character_snaps_back():
+    text = "£25"
+    # Byte 1 is the second byte of "£"
+    assert char_offsets(text, [1, 2, 4]) == {1: 0, 2: 1, 4: 3}
+
+def test_store_for_hosts_and_titles():
+    assert store_for(HOF) == "House of Fraser"
+    assert store_for("https://SportsDirect.com/mens") == "Sports Direct"
+    assert store_for("https://shop.usc.co.uk:443/jeans?size=32") == "USC"
+    # Grounding redirect URLs carry the domain in the title
+    assert store_for("https://vertexaisearch.cloud.google.com/grounding-api-redirect/abc", "jackwills.com") == "Jack Wills"
+
+def test_store_for_rejects_lookalikes():
+    assert store_for(BLOG) is None
+    assert store_for("https://evil.com/houseoffraser.co.uk") is None
+    assert store_for("https://notflannels.com/") is None
+    assert store_for("https://sportsdirect.com.evil.io/") is None
+    assert store_for("https://example.com", "Sports Direct") is None
+    assert store_for(None) is None
+
+def test_render_places_links_after_multibyte_segments():
+    text = "Try the Navy Wool Blazer from House of Fraser at £149.99. Pair it with the Café Crème Chinos at £45.00. Enjoy!"
+    first = "Try the Navy Wool Blazer from House of Fraser at £149.99."
+    second = "Pair it with the Café Crème Chinos at £45.00."
+    rendered = render_citations(text, grounding(text, [(first, [0]), (second, [1, 2])]))
+    assert rendered.text == f"{first} [Link]({HOF}) {second} [Link]({FLANNELS}) Enjoy!"
+    assert rendered.frasers_links
+    assert rendered.citations == [
+        Citation(HOF, "House of Fraser", None, first, 0, len(first)),
+        Citation(FLANNELS, "Flannels", None, second, len(first) + 1, len(first) + 1 + len(second)),
+    ]
+
+def test_render_extracts_products():
+    text = "For the evening, go for the **Navy Wool Blazer** (£120.00). The Suède Chelsea Boots - £65 finish it."
+    first = "For the evening, go for the **Navy Wool Blazer** (£120.00)."
+    second = "The Suède Chelsea Boots - £65 finish it."
+    rendered = render_citations(text, grounding(text, [(first, [0]), (second, [1])]))
+    assert rendered.products == [
+        ProductLink("Navy Wool Blazer", "£120.00", "House of Fraser", HOF),
+        ProductLink("Suède Chelsea Boots", "£65", "Flannels", FLANNELS),
+    ]
+
+def test_render_dedupes_links_and_products():
+    text = "Try the Navy Wool Blazer at £149.99. It comes in navy."
+    segment = "Try the Navy Wool Blazer at £149.99."
+    # The same page twice in one support, and the same segment cited by two supports
+    rendered = render_citations(text, grounding(text, [(segment, [0, 0]), (segment, [0])], urls=(HOF, HOF)))
+    assert rendered.text.count(f"[Link]({HOF})") == 2
+    assert rendered.text.startswith(f"{segment} [Link]({HOF}) [Link]({HOF})")
+    assert rendered.products == [ProductLink("Navy Wool Blazer", "£149.99", "House of Fraser", HOF)]
+    assert len(rendered.citations) == 2
+
+def test_render_skips_non_frasers_pages():
+    text = "Blazers are in this season. Try a navy one at £99."
+    rendered = render_citations(text, grounding(text, [("Try a navy one at £99.", [2])]))
+    assert rendered == (text, [], [], True)
+    only_blog = render_citations(text, grounding(text, [("Try a navy one at £99.", [0])], urls=(BLOG,)))
+    assert only_blog == (text, [], [], False)
+
+def test_render_without_grounding():
+    assert render_citations("No search was needed.", None) == ("No search was needed.", [], [], False)
+
+def test_catalog_links():
+    products = [
+        Product(id="1", name="Navy Wool Blazer", brand="Howick", price=120.0, category="blazers", url=HOF,
+                colours=("navy",), occasions=("formal",), styles=("classic",), store="House of Fraser"),
+        Product(id="2", name="Café Crème Chinos", brand="Flannels", price=45.5, category="trousers", url=FLANNELS,
+                colours=("beige",), occasions=("casual",), styles=("classic",), store="Flannels"),
+    ]
+    text = f"Try the [Navy Wool Blazer]({HOF})."
+    assert catalog_links(text, products) == [ProductLink("Navy Wool Blazer", "£120.00", "House of Fraser", HOF, "Howick")]
+    assert catalog_links("Nothing linked.", products) == []
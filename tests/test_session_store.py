@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from src.agents.group_chat_orchestrator import GroupChatOrchestrator, Message
+from src.api.session_store import RedisSessionStore, Session, decode_session, encode_session
+from src.utils.job_queue import Job
+
+SESSION_ID = "session-0001"
+
+def run(coro):
+    return asyncio.run(coro)
+
+def make_store() -> RedisSessionStore:
+    return RedisSessionStore(GroupChatOrchestrator, ttl_seconds=60, client=fakeredis.FakeAsyncRedis())
+
+async def stored(store: RedisSessionStore, session_id: str = SESSION_ID):
+    return await store._load(session_id)
+
+def conversation(turns: int = 3) -> Session:
+    session = Session(GroupChatOrchestrator())
+    for i in range(turns):
+        session.orchestrator._append(Message("user", f"Looking for a blazer, take {i}"))
+        session.orchestrator._append(Message("ConversationAgent", "Try the Navy Wool Blazer at £149.99 – Café Crème chinos go well."))
+    session.message_count = turns
+    session.orchestrator.summary = "Wants a navy blazer for work."
+    session.orchestrator.summarized_seq = 2
+    session.orchestrator.summary_pending = [4, 1700000000.25]
+    return session
+
+@pytest.mark.parametrize("compress_bytes", [1 << 20, 0])
+def test_encode_decode_round_trip(compress_bytes):
+    session = conversation()
+    data = encode_session(session, compress_bytes)
+    assert (data[:1] == b"{") == (compress_bytes > 0)
+    restored = decode_session(data, GroupChatOrchestrator)
+    assert restored.message_count == session.message_count
+    assert restored.usage.to_dict() == session.usage.to_dict()
+    assert restored.orchestrator.export_state() == session.orchestrator.export_state()
+    assert restored.orchestrator.get_conversation_history() == session.orchestrator.get_conversation_history()
+
+def test_turns_on_one_session_are_serialized():
+    async def main():
+        store = make_store()
+        events = []
+
+        async def turn(name):
+            async with store.open(SESSION_ID) as session:
+                events.append(f"{name} start")
+                await asyncio.sleep(0.05)
+                session.message_count += 1
+                events.append(f"{name} end")
+
+        await asyncio.gather(turn("a"), turn("b"))
+        session = await stored(store)
+        await store.close()
+        return events, session
+
+    events, session = run(main())
+    assert events in (["a start", "a end", "b start", "b end"], ["b start", "b end", "a start", "a end"])
+    # Each turn loaded what the other saved
+    assert session.message_count == 2
+
+def test_end_racing_a_background_update():
+    async def main():
+        store = make_store()
+        async with store.open(SESSION_ID) as session:
+            session.orchestrator._append(Message("user", "hi"))
+
+        def update(orchestrator):
+            orchestrator._append(Message("ImageGenAgent", "Here's how the outfit could look."))
+
+        await asyncio.gather(store._apply(SESSION_ID, update), store.end(SESSION_ID))
+        await asyncio.gather(store.end(SESSION_ID), store._apply(SESSION_ID, update))
+        session = await stored(store)
+        await store.close()
+        return session
+
+    # Whichever runs first, the update never brings the ended session back
+    assert run(main()) is None
+
+def test_stale_summary_does_not_reach_a_new_session():
+    async def main():
+        store = make_store()
+        async with store.open(SESSION_ID) as session:
+            for i in range(4):
+                session.orchestrator._append(Message("user", f"old conversation {i}"))
+            session.orchestrator.summary_pending = marker = [3, time.time()]
+        await store.end(SESSION_ID)
+        # The shopper carries on under the same ID while the old summary is still running
+        async with store.open(SESSION_ID) as session:
+            session.orchestrator._append(Message("user", "new conversation"))
+        await store._apply(SESSION_ID, lambda orchestrator: orchestrator._set_summary("Old conversation.", marker))
+        session = await stored(store)
+        await store.close()
+        return session
+
+    orchestrator = run(main()).orchestrator
+    assert orchestrator.summary == ""
+    assert orchestrator.summarized_seq == 0
+    assert orchestrator._history() == [{"role": "user", "content": "new conversation"}]
+
+def test_summary_is_applied_to_the_stored_session():
+    async def main():
+        store = make_store()
+        async with store.open(SESSION_ID) as session:
+            for i in range(4):
+                session.orchestrator._append(Message("user", f"turn {i}"))
+            session.orchestrator.summary_pending = marker = [3, time.time()]
+        # Reaches the session through the store, as a summary finishing after the turn does
+        session.orchestrator._apply_background(lambda orchestrator: orchestrator._set_summary("Turns 0-2.", marker))
+        await asyncio.gather(*store._background)
+        session = await stored(store)
+        await store.close()
+        return session
+
+    orchestrator = run(main()).orchestrator
+    assert (orchestrator.summary, orchestrator.summarized_seq, orchestrator.summary_pending) == ("Turns 0-2.", 3, None)
+    assert orchestrator._history()[1:] == [{"role": "user", "content": "turn 3"}]
+
+def test_job_status_is_mirrored():
+    async def main():
+        store = make_store()
+        job = Job("image", "navy blazer outfit")
+        store.record_job(job)
+        await asyncio.gather(*store._background)
+        job.status, job.result = "done", {"image_ref": "/api/images/abc"}
+        store.record_job(job)
+        await asyncio.gather(*store._background)
+        loaded, missing = await store.load_job(job.id), await store.load_job("unknown")
+        await store.close()
+        return job, loaded, missing
+
+    job, loaded, missing = run(main())
+    assert loaded == job.to_dict()
+    assert missing is None